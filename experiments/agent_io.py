@@ -0,0 +1,275 @@
+"""エージェント応答の送受信に関する共通処理。"""
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Tuple
+
+import orjson
+from orjson import JSONDecodeError
+from langchain_core.messages import HumanMessage
+
+from experiments.profiling import timed
+from experiments.runner import strip_code_fence
+from experiments.timeouts import is_timeout_error
+
+MAX_RETRIES = 3
+EMPTY_HISTORY_TEXT = "まだ発言はありません。"
+NO_NEW_SPEECH_TEXT = "前回の応答以降、新しい発言はありません。"
+THREAD_FALLBACK_INSTRUCTION = "システムプロンプトで指定されたJSON形式で次の応答を生成してください。"
+FULLWIDTH_QUOTES = "\u201c\u201d\uff02"
+FULLWIDTH_PUNCTUATION = {"\uff1a": ":", "\uff0c": ","}
+_CONTROL_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+
+
+@dataclass
+class InvocationStats:
+    """1ターン分の呼び出し統計（試行回数・所要時間・トークン使用量）。"""
+
+    attempts: int = 0
+    elapsed_seconds: float = 0.0
+    errors: List[str] = field(default_factory=list)
+    usage: Dict[str, Any] | None = None
+    prefill_seconds: float | None = None
+    timeouts: int = 0
+    repairs: List[str] = field(default_factory=list)
+    served_by: str | None = None
+
+    def as_record(self) -> Dict[str, Any]:
+        """ターンログへ埋め込む形式に変換する。"""
+
+        record: Dict[str, Any] = {
+            "latency_seconds": round(self.elapsed_seconds, 4),
+            "attempts": self.attempts,
+        }
+        if self.usage:
+            record["usage"] = self.usage
+        if self.prefill_seconds is not None:
+            record["prefill_seconds"] = round(self.prefill_seconds, 4)
+        if self.timeouts:
+            record["timeouts"] = self.timeouts
+        if self.repairs:
+            record["json_repairs"] = self.repairs
+        if self.served_by:
+            record["served_by"] = self.served_by
+        return record
+
+
+def format_history(history: List[Dict[str, str]]) -> str:
+    """プレイヤー共有の会話履歴（speechのみ）を文字列化。"""
+
+    if not history:
+        return EMPTY_HISTORY_TEXT
+    lines = [f"{entry['agent']}: {entry['speech']}" for entry in history]
+    return "\n".join(lines)
+
+
+def build_user_prompt(template: str, history_text: str) -> str:
+    """会話履歴プレースホルダを埋め込む。"""
+
+    base_template = template.rstrip()
+    if "{conversation_history}" in base_template:
+        return base_template.replace("{conversation_history}", history_text)
+    return (
+        f"{base_template}\n\n---\n【現在の会話履歴】\n{history_text}\n---\n"
+    )
+
+
+def build_thread_update(template: str, new_history: str) -> str:
+    """thread モードの2回目以降のユーザー発話（前回以降の発言と、履歴より後ろの指示だけ）。"""
+
+    _, found, tail = template.rstrip().partition("{conversation_history}")
+    instruction = tail.strip().removeprefix("---").strip() if found else ""
+    return (
+        f"【前回以降の発言】\n{new_history or NO_NEW_SPEECH_TEXT}\n---\n"
+        f"{instruction or THREAD_FALLBACK_INSTRUCTION}"
+    )
+
+
+def prefill_seconds_of(response: Any) -> float | None:
+    """応答メタデータからプロンプト処理（prefill）の所要時間を取り出す（Ollama のみ報告する）。"""
+
+    duration = (getattr(response, "response_metadata", None) or {}).get("prompt_eval_duration")
+    return duration / 1e9 if duration else None
+
+
+def repair_json_text(text: str) -> Tuple[str, List[str]]:
+    """壊れたJSON応答をよくある崩れ方の範囲で直し、(修復後の文字列, 適用した修復名) を返す。
+
+    最初の `{` から対応する `}` までを取り出し（前後の説明文を捨てる）、文字列の外の
+    末尾カンマを除き、全角の引用符・コロン・カンマを半角にし、文字列中の生の改行を
+    エスケープする。`}` が閉じないまま途切れた応答は直さない。
+    """
+
+    start = text.find("{")
+    if start < 0:
+        return text, []
+    repairs: List[str] = []
+    out: List[str] = []
+    depth = 0
+    closing: str | None = None  # 文字列の中なら閉じる引用符（全角で開いたら FULLWIDTH_QUOTES）
+    escaped = False
+    end = len(text)
+
+    def note(name: str) -> None:
+        if name not in repairs:
+            repairs.append(name)
+
+    for index in range(start, len(text)):
+        char = text[index]
+        if closing is not None:
+            if escaped:
+                escaped = False
+                out.append(char)
+            elif char == "\\":
+                escaped = True
+                out.append(char)
+            elif char in closing:
+                closing = None
+                out.append('"')
+            elif char == '"':
+                out.append('\\"')
+            elif char in _CONTROL_ESCAPES:
+                note("control_chars")
+                out.append(_CONTROL_ESCAPES[char])
+            else:
+                out.append(char)
+            continue
+        if char == '"':
+            closing = '"'
+        elif char in FULLWIDTH_QUOTES:
+            note("fullwidth_quotes")
+            closing = FULLWIDTH_QUOTES
+            char = '"'
+        elif char in FULLWIDTH_PUNCTUATION:
+            note("fullwidth_punctuation")
+            char = FULLWIDTH_PUNCTUATION[char]
+        elif char in "{[":
+            depth += 1
+        elif char in "}]":
+            position = len(out) - 1
+            while position >= 0 and out[position].isspace():
+                position -= 1
+            if position >= 0 and out[position] == ",":
+                note("trailing_comma")
+                del out[position]
+            depth -= 1
+        out.append(char)
+        if depth == 0:
+            end = index + 1
+            break
+    if depth != 0:
+        return text, []
+    if text[:start].strip() or text[end:].strip():
+        repairs.insert(0, "extract_object")
+    return "".join(out), repairs
+
+
+def parse_agent_output(
+    raw_content: str, *, require_vote: bool = False, repairs: List[str] | None = None
+) -> Dict[str, str]:
+    """エージェントのJSON出力を辞書化する。
+
+    そのままでは読めない応答は `repair_json_text` で直してから読み、`repairs` を渡すと
+    適用した修復名を追加する（再生成を待たずに済む）。
+    """
+
+    sanitized = strip_code_fence(raw_content)
+    try:
+        data = orjson.loads(sanitized)
+    except JSONDecodeError:
+        repaired, applied = repair_json_text(sanitized)
+        if not applied:
+            raise
+        data = orjson.loads(repaired)
+        if repairs is not None:
+            repairs.extend(applied)
+    if not isinstance(data, dict):
+        raise ValueError("応答のJSONがオブジェクトではありません。")
+    thought = str(data.get("thought", "")).strip()
+    speech = str(data.get("speech", "")).strip()
+    if not speech:
+        raise ValueError("JSONに'speech'が含まれていません。")
+    vote = str(data.get("vote", "")).strip()
+    if require_vote and not vote:
+        raise ValueError("投票フェーズなのに'vote'が指定されていません。")
+    return {"thought": thought, "speech": speech, "vote": vote}
+
+
+def invoke_with_retries(
+    client,
+    messages: List[HumanMessage],
+    *,
+    require_vote: bool,
+    max_retries: int,
+    agent_id: str,
+    model_alias: str,
+    stats: InvocationStats | None = None,
+    seed: int | None = None,
+) -> Tuple[Dict[str, str] | None, str | None, Exception | None]:
+    """LLM呼び出しとJSONパースを指定回数まで再試行する。
+
+    `stats` を渡すと試行回数・合計所要時間・最後の応答のトークン使用量を書き込む。
+    タイムアウトは他の呼び出しエラーと分けて `stats.timeouts` に数える。
+    JSON を修復して読めた場合は、その修復名を `stats.repairs` に残す。
+    `seed` は試合の乱数シードで、対応するプロバイダ（Ollama・OpenAI 互換）へそのまま渡す。
+    """
+
+    stats = stats if stats is not None else InvocationStats()
+    invoke_kwargs = {"seed": seed} if seed is not None else {}
+    started = time.perf_counter()
+    last_exc: Exception | None = None
+    for attempt in range(1, max_retries + 1):
+        stats.attempts = attempt
+        try:
+            with timed("llm_wait"):
+                response = client.invoke(messages, **invoke_kwargs)
+            stats.usage = getattr(response, "usage_metadata", None) or stats.usage
+            stats.prefill_seconds = prefill_seconds_of(response)
+            stats.served_by = (getattr(response, "response_metadata", None) or {}).get("served_by")
+            content = getattr(response, "content", str(response))
+            repairs: List[str] = []
+            with timed("parse"):
+                parsed = parse_agent_output(content, require_vote=require_vote, repairs=repairs)
+            stats.repairs = repairs
+            stats.elapsed_seconds = time.perf_counter() - started
+            return parsed, content, None
+        except (ValueError, JSONDecodeError) as exc:
+            last_exc = exc
+            stats.errors.append(f"parse: {exc}")
+            print(
+                f"Retryable parse error (attempt {attempt}/{max_retries}): {exc}"
+            )
+        except Exception as exc:
+            last_exc = exc
+            if is_timeout_error(exc):
+                stats.timeouts += 1
+                stats.errors.append(f"timeout: {exc}")
+                print(f"Retryable timeout (attempt {attempt}/{max_retries}): {model_alias}: {exc}")
+                continue
+            stats.errors.append(f"invoke: {exc}")
+            print(
+                f"Retryable invocation error (attempt {attempt}/{max_retries}): {exc}"
+            )
+            if "getaddrinfo failed" in str(exc).lower():
+                print(
+                    f"HINT: モデル '{model_alias}' の接続先を解決できません。"
+                    " config/models.yaml の base_url を確認してください。"
+                )
+    stats.elapsed_seconds = time.perf_counter() - started
+    return None, None, last_exc
+
+
+__all__ = [
+    "MAX_RETRIES",
+    "EMPTY_HISTORY_TEXT",
+    "NO_NEW_SPEECH_TEXT",
+    "InvocationStats",
+    "format_history",
+    "build_user_prompt",
+    "build_thread_update",
+    "prefill_seconds_of",
+    "repair_json_text",
+    "parse_agent_output",
+    "invoke_with_retries",
+]
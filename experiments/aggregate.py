@@ -0,0 +1,320 @@
+"""複数のログファイルを横断して集計する CLI / ライブラリ。
+
+ログはチャンク単位でストリーミングし、各チャンクを pandas の列演算で部分集計してから
+累積結果へ足し込むため、メモリ使用量はチャンクサイズと (ファイル, run) → モデル割り当ての
+対応表だけで決まる。集計する内容は次の通り。
+
+- models: モデルごとの出場数・ターン数・失敗率・再試行率・得票数・最多得票で追放された回数（生存率）
+- agents: (モデル, エージェント) ごとのターン数と発言文字数（平均・最大）
+- votes: 投票者モデル × 投票先モデルの投票数行列
+
+`LiveThroughput` は書き込み中のログの試合/分と平均ターン時間を追記分から更新する（ビューアのライブ表示用）。
+
+```bash
+python -m experiments.aggregate experiments/template_4player/logs --output summary/
+```
+"""
+from __future__ import annotations
+
+import argparse
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from experiments.logio import MATCH_LOG_BASES, iter_log_records, list_log_files
+
+DEFAULT_CHUNK_ROWS = 50_000
+
+
+def resolve_log_files(paths: Iterable[Path]) -> List[Path]:
+    """ディレクトリは試合ログ（logfile_*/sweep_NNN、平文・圧縮）に展開し、ファイルはそのまま使う。"""
+
+    files: List[Path] = []
+    for path in paths:
+        if path.is_dir():
+            files.extend(list_log_files(path, MATCH_LOG_BASES))
+        elif path.exists():
+            files.append(path)
+        else:
+            raise FileNotFoundError(f"ログが見つかりません: {path}")
+    return list(dict.fromkeys(files))
+
+
+def _add(total: pd.DataFrame | None, part: pd.DataFrame) -> pd.DataFrame:
+    if total is None:
+        return part
+    return total.add(part, fill_value=0)
+
+
+@dataclass
+class LogAggregator:
+    """チャンクごとの部分集計を累積する。"""
+
+    chunk_rows: int = DEFAULT_CHUNK_ROWS
+    files: int = 0
+    matches: int = 0
+    _turns: Dict[str, List[Any]] = field(default_factory=lambda: {k: [] for k in ("model", "agent", "speech_len", "attempts", "failed")})
+    _votes: Dict[str, List[Any]] = field(default_factory=lambda: {k: [] for k in ("voter_model", "target_model", "target_agent")})
+    _appearances: List[str] = field(default_factory=list)
+    _eliminations: List[str] = field(default_factory=list)
+    _model_stats: pd.DataFrame | None = None
+    _agent_stats: pd.DataFrame | None = None
+    _speech_max: pd.Series | None = None
+    _vote_matrix: pd.DataFrame | None = None
+
+    def add_file(self, path: Path) -> None:
+        """1ファイル分を取り込む。"""
+
+        self.files += 1
+        assignments: Dict[Any, Dict[str, str]] = {}
+        pending = 0
+        for record in iter_log_records(path):
+            run = record.get("run")
+            phase = record.get("phase") or ""
+            if phase.endswith("_summary"):
+                self._add_summary(record, assignments.get(run, {}))
+            elif "agent" in record and "model_name" in record:
+                agent = record["agent"]
+                model = record["model_name"]
+                assignments.setdefault(run, {})[agent] = model
+                failed = "error" in record and "speech" not in record
+                self._turns["model"].append(model)
+                self._turns["agent"].append(agent)
+                self._turns["speech_len"].append(len(record.get("speech") or "") if not failed else np.nan)
+                attempts = record.get("attempts")
+                self._turns["attempts"].append(attempts if isinstance(attempts, (int, float)) else np.nan)
+                self._turns["failed"].append(failed)
+            else:
+                continue
+            pending += 1
+            if pending >= self.chunk_rows:
+                self.flush()
+                pending = 0
+        self.matches += len(assignments)
+        for seats in assignments.values():
+            self._appearances.extend(seats.values())
+        self.flush()
+
+    def _add_summary(self, record: Dict[str, Any], seats: Dict[str, str]) -> None:
+        for vote in record.get("votes") or []:
+            target = vote.get("vote")
+            self._votes["voter_model"].append(seats.get(vote.get("agent"), "?"))
+            self._votes["target_model"].append(seats.get(target, "?"))
+            self._votes["target_agent"].append(target)
+        tally = record.get("tally") or {}
+        if tally:
+            top = max(tally.values())
+            leaders = [agent for agent, count in tally.items() if count == top]
+            if len(leaders) == 1 and leaders[0] in seats:
+                self._eliminations.append(seats[leaders[0]])
+
+    def flush(self) -> None:
+        """溜まっている行を列演算で部分集計し、累積結果へ加算する。"""
+
+        if self._turns["model"]:
+            turns = pd.DataFrame(self._turns)
+            turns["model"] = turns["model"].astype("category")
+            turns["agent"] = turns["agent"].astype("category")
+            turns["with_attempts"] = turns["attempts"].notna()
+            grouped = turns.groupby("model", observed=True)
+            part = pd.DataFrame(
+                {
+                    "turns": grouped.size(),
+                    "failures": grouped["failed"].sum(),
+                    "attempts": grouped["attempts"].sum(),
+                    "turns_with_attempts": grouped["with_attempts"].sum(),
+                }
+            )
+            self._model_stats = _add(self._model_stats, part)
+            by_agent = turns.groupby(["model", "agent"], observed=True)["speech_len"]
+            agent_part = pd.DataFrame(
+                {"turns": by_agent.size(), "speeches": by_agent.count(), "speech_chars": by_agent.sum()}
+            )
+            self._agent_stats = _add(self._agent_stats, agent_part)
+            maxima = by_agent.max()
+            if self._speech_max is not None:
+                maxima = pd.concat([self._speech_max, maxima]).groupby(level=[0, 1], observed=True).max()
+            self._speech_max = maxima
+            for values in self._turns.values():
+                values.clear()
+
+        if self._votes["voter_model"]:
+            votes = pd.DataFrame(self._votes)
+            matrix = pd.crosstab(votes["voter_model"], votes["target_model"])
+            self._vote_matrix = _add(self._vote_matrix, matrix)
+            received = votes.groupby("target_model").size().rename("votes_received").to_frame()
+            self._model_stats = _add(self._model_stats, received)
+            by_target = votes.groupby(["target_model", "target_agent"]).size().rename("votes_received").to_frame()
+            by_target.index.names = ["model", "agent"]
+            self._agent_stats = _add(self._agent_stats, by_target)
+            for values in self._votes.values():
+                values.clear()
+
+        if self._appearances or self._eliminations:
+            part = pd.DataFrame(
+                {
+                    "appearances": pd.Series(self._appearances, dtype="object").value_counts(),
+                    "eliminated": pd.Series(self._eliminations, dtype="object").value_counts(),
+                }
+            ).fillna(0)
+            self._model_stats = _add(self._model_stats, part)
+            self._appearances.clear()
+            self._eliminations.clear()
+
+    # --- 結果 ---------------------------------------------------------------------
+
+    def models(self) -> pd.DataFrame:
+        columns = ["appearances", "turns", "failures", "attempts", "turns_with_attempts", "votes_received", "eliminated"]
+        stats = (self._model_stats if self._model_stats is not None else pd.DataFrame()).reindex(columns=columns).fillna(0)
+        table = stats[["appearances", "turns", "failures", "votes_received", "eliminated"]].astype("int64")
+        with np.errstate(divide="ignore", invalid="ignore"):
+            table["failure_rate"] = stats["failures"] / stats["turns"]
+            table["retry_rate"] = (stats["attempts"] - stats["turns_with_attempts"]) / stats["attempts"]
+            table["survival_rate"] = 1 - stats["eliminated"] / stats["appearances"]
+        table.index.name = "model"
+        return table.sort_index()
+
+    def agents(self) -> pd.DataFrame:
+        columns = ["turns", "speeches", "speech_chars", "votes_received"]
+        if self._agent_stats is None:
+            return pd.DataFrame(columns=["turns", "votes_received", "mean_speech_chars", "max_speech_chars"])
+        stats = self._agent_stats.reindex(columns=columns).fillna(0)
+        maxima = self._speech_max if self._speech_max is not None else pd.Series(dtype="float64")
+        table = pd.DataFrame(
+            {
+                "turns": stats["turns"].astype("int64"),
+                "votes_received": stats["votes_received"].astype("int64"),
+                "mean_speech_chars": stats["speech_chars"] / stats["speeches"].replace(0, np.nan),
+                "max_speech_chars": maxima.reindex(stats.index),
+            }
+        )
+        table.index.names = ["model", "agent"]
+        return table.sort_index()
+
+    def vote_matrix(self) -> pd.DataFrame:
+        if self._vote_matrix is None:
+            return pd.DataFrame()
+        matrix = self._vote_matrix.fillna(0).astype("int64")
+        matrix.index.name = "voter_model"
+        matrix.columns.name = "target_model"
+        return matrix.sort_index().sort_index(axis=1)
+
+
+@dataclass
+class LiveThroughput:
+    """書き込み中のログの処理速度（試合/分・平均ターン時間）を追記分から逐次求める。
+
+    投票サマリーか中断（エラー）の記録が出た run を終了した試合として数える。
+    """
+
+    finished_runs: set = field(default_factory=set)
+    turns: int = 0
+    latency_total: float = 0.0
+    latency_count: int = 0
+    first_timestamp: datetime | None = None
+    last_timestamp: datetime | None = None
+
+    def update(self, records: Iterable[Dict[str, Any]]) -> None:
+        for record in records:
+            stamp = _parse_timestamp(record.get("timestamp"))
+            if stamp is not None:
+                if self.first_timestamp is None or stamp < self.first_timestamp:
+                    self.first_timestamp = stamp
+                if self.last_timestamp is None or stamp > self.last_timestamp:
+                    self.last_timestamp = stamp
+            phase = record.get("phase") or ""
+            if phase.endswith("_summary") or ("error" in record and "speech" not in record):
+                self.finished_runs.add(record.get("run"))
+            if "agent" in record and "model_name" in record:
+                self.turns += 1
+                latency = record.get("latency_seconds")
+                if isinstance(latency, (int, float)):
+                    self.latency_total += latency
+                    self.latency_count += 1
+
+    @property
+    def matches_per_minute(self) -> float | None:
+        if self.first_timestamp is None or self.last_timestamp is None:
+            return None
+        minutes = (self.last_timestamp - self.first_timestamp).total_seconds() / 60
+        return len(self.finished_runs) / minutes if minutes > 0 else None
+
+    @property
+    def mean_turn_latency(self) -> float | None:
+        return self.latency_total / self.latency_count if self.latency_count else None
+
+
+def _parse_timestamp(value: Any) -> datetime | None:
+    if not isinstance(value, str):
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def aggregate_logs(paths: Sequence[Path], *, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> LogAggregator:
+    """ファイル／ディレクトリ群を集計した LogAggregator を返す。"""
+
+    aggregator = LogAggregator(chunk_rows=chunk_rows)
+    for path in resolve_log_files(paths):
+        aggregator.add_file(path)
+    return aggregator
+
+
+def write_summary(aggregator: LogAggregator, output_dir: Path) -> List[Path]:
+    """models / agents / votes の各表を CSV で書き出す。"""
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    written = []
+    for name, table in (
+        ("models", aggregator.models()),
+        ("agents", aggregator.agents()),
+        ("votes", aggregator.vote_matrix()),
+    ):
+        path = output_dir / f"{name}.csv"
+        table.to_csv(path)
+        written.append(path)
+    return written
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Aggregate vote, failure and speech statistics across match logs")
+    parser.add_argument("paths", nargs="+", type=Path, help="ログファイルまたは logs ディレクトリ")
+    parser.add_argument("--output", type=Path, default=None, help="集計表（CSV）の出力先ディレクトリ")
+    parser.add_argument(
+        "--chunk-rows",
+        type=int,
+        default=DEFAULT_CHUNK_ROWS,
+        help="部分集計する行数の単位（メモリ使用量の上限を決める, default: %(default)s）",
+    )
+    args = parser.parse_args()
+
+    aggregator = aggregate_logs(args.paths, chunk_rows=args.chunk_rows)
+    with pd.option_context("display.width", 160, "display.max_columns", 20, "display.float_format", "{:.3f}".format):
+        print(f"=== {aggregator.files} files, {aggregator.matches} matches ===")
+        print(aggregator.models())
+        print()
+        print(aggregator.agents())
+        print()
+        print(aggregator.vote_matrix())
+    if args.output is not None:
+        for path in write_summary(aggregator, args.output):
+            print(f"saved: {path}")
+
+
+__all__ = [
+    "LogAggregator",
+    "LiveThroughput",
+    "resolve_log_files",
+    "aggregate_logs",
+    "write_summary",
+]
+
+
+if __name__ == "__main__":
+    main()
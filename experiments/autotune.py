@@ -0,0 +1,289 @@
+"""過去ログの実プロンプトを再生し、モデルのチューニングプロファイルを選ぶ自動チューナー。
+
+`config/models.yaml` のモデルに定義した `profiles`（と、プロファイルを当てない素の設定）を
+候補とし、ログから抜き出した同じプロンプト群を候補ごとに送って所要時間と
+JSON 応答の妥当性を測る。妥当な応答の割合が `--min-valid` 以上の候補のうち、
+平均所要時間が最も短いものを推奨する。
+
+Ollama は `num_ctx` などが変わるとモデルを読み込み直すため、候補は交互にせず
+1つずつまとめて測り、各候補の最初に計測しない呼び出しを1回挟む。
+
+```bash
+python -m experiments.autotune ollama_gemma3:27b --logs experiments/template_4player/logs --samples 20
+python -m experiments.autotune openai_gpt-oss-20b --logs experiments/*/logs --profiles fast short
+```
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Sequence
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+from experiments.agent_io import parse_agent_output
+from experiments.logio import MATCH_LOG_BASES, iter_log_records, list_log_files
+from experiments.runner import append_jsonl_record
+from src.config import create_client_from_model_name, get_model_config
+from src.config.models import PROFILE_SEPARATOR, split_model_name
+
+AUTOTUNE_LOG_FILENAME = "autotune.jsonl"
+BASE_PROFILE = "(base)"
+DEFAULT_SAMPLES = 12
+
+
+@dataclass
+class PromptSample:
+    """ログから抜き出した1ターン分のプロンプト。"""
+
+    system_prompt: str
+    user_prompt: str
+    require_vote: bool
+    source: str
+
+    def messages(self) -> List[BaseMessage]:
+        return [SystemMessage(content=self.system_prompt), HumanMessage(content=self.user_prompt)]
+
+
+@dataclass
+class CandidateResult:
+    """1候補分の計測結果。"""
+
+    profile: str
+    options: Dict[str, Any]
+    requests: int = 0
+    valid: int = 0
+    latencies: List[float] = field(default_factory=list)
+    output_tokens: List[int] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def valid_rate(self) -> float:
+        return self.valid / self.requests if self.requests else 0.0
+
+    @property
+    def mean_latency(self) -> float | None:
+        return sum(self.latencies) / len(self.latencies) if self.latencies else None
+
+    @property
+    def p50_latency(self) -> float | None:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[len(ordered) // 2]
+
+    def to_record(self) -> Dict[str, Any]:
+        record = asdict(self)
+        record.pop("latencies")
+        record.pop("output_tokens")
+        record["errors"] = self.errors[:5]
+        record.update(
+            valid_rate=round(self.valid_rate, 4),
+            mean_latency_seconds=self.mean_latency,
+            p50_latency_seconds=self.p50_latency,
+            mean_output_tokens=(
+                sum(self.output_tokens) / len(self.output_tokens) if self.output_tokens else None
+            ),
+        )
+        return record
+
+
+def iter_log_paths(paths: Iterable[Path]) -> List[Path]:
+    """ディレクトリを試合ログに展開する（ファイルはそのまま）。"""
+
+    files: List[Path] = []
+    for path in paths:
+        files.extend(list_log_files(path, MATCH_LOG_BASES) if path.is_dir() else [path])
+    return files
+
+
+def sample_prompts(paths: Iterable[Path], count: int, *, seed: int | None = None) -> List[PromptSample]:
+    """成功したターンのプロンプトを最大 count 件、無作為に抜き出す。
+
+    thread モードの行は差分だけのプロンプトなので単体では再生できず、対象から外す。
+    """
+
+    pool: List[PromptSample] = []
+    for path in iter_log_paths(paths):
+        for row in iter_log_records(path):
+            if "speech" not in row or not row.get("user_prompt") or row.get("context", "inline") != "inline":
+                continue
+            pool.append(
+                PromptSample(
+                    system_prompt=row.get("system_prompt") or "",
+                    user_prompt=row["user_prompt"],
+                    require_vote=bool(row.get("vote")),
+                    source=path.name,
+                )
+            )
+    rng = random.Random(seed)
+    return rng.sample(pool, count) if len(pool) > count else pool
+
+
+def candidate_profiles(model_alias: str, names: Sequence[str] | None = None) -> List[str]:
+    """計測する候補を返す。既定は素の設定と models.yaml の全プロファイル。"""
+
+    model_config = get_model_config(model_alias)
+    if names:
+        unknown = [name for name in names if name != BASE_PROFILE and name not in model_config.profiles]
+        if unknown:
+            raise KeyError(f"{model_alias} に未定義のプロファイルです: {', '.join(unknown)}")
+        return list(names)
+    return [BASE_PROFILE, *model_config.profiles]
+
+
+def measure_candidate(
+    client: Any,
+    profile: str,
+    options: Dict[str, Any],
+    samples: Sequence[PromptSample],
+    *,
+    warmup: bool = True,
+) -> CandidateResult:
+    """候補1つでサンプルを順に送り、所要時間と JSON の妥当性を測る。"""
+
+    result = CandidateResult(profile=profile, options=options)
+    if warmup and samples:
+        try:
+            client.invoke(samples[0].messages())
+        except Exception as exc:
+            result.errors.append(f"warmup: {exc}")
+    for sample in samples:
+        result.requests += 1
+        started = time.perf_counter()
+        try:
+            response = client.invoke(sample.messages())
+        except Exception as exc:
+            result.errors.append(f"invoke: {exc}")
+            continue
+        result.latencies.append(time.perf_counter() - started)
+        usage = getattr(response, "usage_metadata", None) or {}
+        if usage.get("output_tokens") is not None:
+            result.output_tokens.append(usage["output_tokens"])
+        try:
+            parse_agent_output(str(response.content), require_vote=sample.require_vote)
+        except ValueError as exc:
+            result.errors.append(f"parse: {exc}")
+            continue
+        result.valid += 1
+    return result
+
+
+def pick_best(results: Sequence[CandidateResult], *, min_valid: float) -> CandidateResult | None:
+    """妥当率が min_valid 以上の候補のうち平均所要時間が最短のものを返す。"""
+
+    eligible = [item for item in results if item.valid_rate >= min_valid and item.mean_latency is not None]
+    return min(eligible, key=lambda item: item.mean_latency) if eligible else None
+
+
+def run_autotune(
+    model_alias: str,
+    samples: Sequence[PromptSample],
+    *,
+    profiles: Sequence[str],
+    client_factory: Callable[[str], Any] = create_client_from_model_name,
+    warmup: bool = True,
+) -> List[CandidateResult]:
+    """候補を1つずつ計測する。"""
+
+    model_config = get_model_config(model_alias)
+    results = []
+    for profile in profiles:
+        name = model_alias if profile == BASE_PROFILE else f"{model_alias}{PROFILE_SEPARATOR}{profile}"
+        options = {} if profile == BASE_PROFILE else dict(model_config.profiles[profile])
+        print(f"[autotune] {profile}: {len(samples)} prompts {options or ''}")
+        results.append(measure_candidate(client_factory(name), profile, options, samples, warmup=warmup))
+    return results
+
+
+def print_results(results: Sequence[CandidateResult], best: CandidateResult | None, *, min_valid: float) -> None:
+    """候補ごとの結果と推奨プロファイルを表示する。"""
+
+    print(f"{'profile':<16} {'valid':>7} {'mean':>8} {'p50':>8} {'out_tok':>8}")
+    for item in results:
+        mean = "-" if item.mean_latency is None else f"{item.mean_latency:.2f}s"
+        p50 = "-" if item.p50_latency is None else f"{item.p50_latency:.2f}s"
+        out = "-" if not item.output_tokens else f"{sum(item.output_tokens) / len(item.output_tokens):.0f}"
+        marker = " *" if item is best else ""
+        print(f"{item.profile:<16} {item.valid_rate:>7.0%} {mean:>8} {p50:>8} {out:>8}{marker}")
+    if best is None:
+        print(f"妥当な JSON の割合が {min_valid:.0%} 以上の候補がありません。")
+    elif best.profile == BASE_PROFILE:
+        print("素の設定が最速でした（profile の指定は不要です）。")
+    else:
+        print(f"推奨: models.yaml のこのモデルに `profile: {best.profile}` を設定してください。")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Pick the fastest tuning profile that still yields valid JSON")
+    parser.add_argument("model", help="config/models.yaml のモデル名")
+    parser.add_argument(
+        "--logs",
+        nargs="+",
+        type=Path,
+        required=True,
+        help="プロンプトを抜き出す試合ログ（ファイルまたは logs ディレクトリ）",
+    )
+    parser.add_argument("--samples", type=int, default=DEFAULT_SAMPLES, help="再生するプロンプト数（default: %(default)s）")
+    parser.add_argument("--profiles", nargs="+", default=None, help=f"候補のプロファイル名（{BASE_PROFILE} は素の設定）")
+    parser.add_argument(
+        "--min-valid",
+        type=float,
+        default=1.0,
+        help="推奨する候補に求める妥当な JSON 応答の割合（default: %(default)s）",
+    )
+    parser.add_argument("--seed", type=int, default=None, help="プロンプト抽出の乱数シード")
+    parser.add_argument("--no-warmup", dest="warmup", action="store_false", help="候補ごとの計測しない初回呼び出しを省く")
+    args = parser.parse_args()
+    if args.samples < 1:
+        parser.error("--samples must be >= 1")
+    if split_model_name(args.model)[1] is not None:
+        parser.error("model にはプロファイルを付けずに指定してください")
+
+    samples = sample_prompts(args.logs, args.samples, seed=args.seed)
+    if not samples:
+        parser.error("ログに再生できるプロンプトがありません")
+    results = run_autotune(
+        args.model,
+        samples,
+        profiles=candidate_profiles(args.model, args.profiles),
+        warmup=args.warmup,
+    )
+    best = pick_best(results, min_valid=args.min_valid)
+    print_results(results, best, min_valid=args.min_valid)
+
+    log_dir = args.logs[0] if args.logs[0].is_dir() else args.logs[0].parent
+    append_jsonl_record(
+        log_dir / AUTOTUNE_LOG_FILENAME,
+        {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "model": args.model,
+            "samples": len(samples),
+            "min_valid": args.min_valid,
+            "best": best.profile if best else None,
+            "candidates": [item.to_record() for item in results],
+        },
+    )
+    print(f"(saved to {log_dir / AUTOTUNE_LOG_FILENAME})")
+
+
+__all__ = [
+    "AUTOTUNE_LOG_FILENAME",
+    "BASE_PROFILE",
+    "PromptSample",
+    "CandidateResult",
+    "sample_prompts",
+    "candidate_profiles",
+    "measure_candidate",
+    "pick_best",
+    "run_autotune",
+    "print_results",
+]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,380 @@
+"""複数試合のリクエストをフェーズ単位でまとめて処理するオフラインバッチ実行。
+
+各ステップで全試合の「送信待ちリクエスト」を OpenAI Batch 形式の JSONL に書き出し、
+実行器（ローカルのスタンドイン / vLLM `run_batch` などの外部コマンド / OpenAI Batch API）
+に処理させた結果を取り込んで、全試合をまとめて次のターンへ進める。
+"""
+from __future__ import annotations
+
+import re
+import shlex
+import subprocess
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+import orjson
+from langchain_core.messages import convert_to_messages, convert_to_openai_messages
+
+from experiments.agent_io import parse_agent_output
+from experiments.logio import log_stem
+from experiments.match import MatchSession, PendingTurn
+from experiments.profiling import timed
+from experiments.runner import append_jsonl_record
+from experiments.telemetry import Telemetry
+from src.config import create_client_from_model_name, get_model_config
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+OPENAI_TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+@dataclass
+class BatchResult:
+    """バッチ出力1行分の結果。"""
+
+    custom_id: str
+    content: str | None
+    error: str | None
+
+
+def build_batch_request(custom_id: str, turn: PendingTurn, *, seed: int | None = None) -> Dict[str, Any]:
+    """PendingTurn を OpenAI Batch 入力の1行へ変換する（`seed` は試合の乱数シード）。"""
+
+    model_config = get_model_config(turn.model_alias)
+    body: Dict[str, Any] = {
+        "model": model_config.model,
+        "messages": convert_to_openai_messages(turn.messages),
+    }
+    if model_config.temperature is not None:
+        body["temperature"] = model_config.temperature
+    if model_config.top_p is not None:
+        body["top_p"] = model_config.top_p
+    max_tokens = model_config.max_tokens or model_config.max_output_tokens
+    if max_tokens is not None:
+        body["max_tokens"] = max_tokens
+    if seed is not None:
+        body["seed"] = seed
+    extra_body = getattr(model_config, "extra_body", None)
+    if extra_body:
+        body.update(extra_body)
+    return {"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": body}
+
+
+def write_batch_file(path: Path, requests: Sequence[Dict[str, Any]]) -> None:
+    """バッチ入力 JSONL を書き出す（既存ファイルは上書き）。"""
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("wb") as fh:
+        for request in requests:
+            fh.write(orjson.dumps(request) + b"\n")
+
+
+def read_batch_results(path: Path) -> Dict[str, BatchResult]:
+    """OpenAI Batch 形式の出力 JSONL を custom_id → 結果の辞書に変換する。"""
+
+    results: Dict[str, BatchResult] = {}
+    if not path.exists():
+        return results
+    with path.open("rb") as fh:
+        for line in fh:
+            if not line.strip():
+                continue
+            row = orjson.loads(line)
+            custom_id = row.get("custom_id", "")
+            error = row.get("error")
+            response = row.get("response") or {}
+            body = response.get("body") or {}
+            content: str | None = None
+            if not error:
+                status = response.get("status_code", 200)
+                choices = body.get("choices") or []
+                if status != 200:
+                    error = body.get("error") or f"status_code={status}"
+                elif not choices:
+                    error = "choices が空です。"
+                else:
+                    content = (choices[0].get("message") or {}).get("content")
+            results[custom_id] = BatchResult(
+                custom_id=custom_id,
+                content=content,
+                error=None if not error else (error if isinstance(error, str) else orjson.dumps(error).decode("utf-8")),
+            )
+    return results
+
+
+class BatchExecutor(ABC):
+    """バッチ入力ファイルを処理して出力ファイルを生成する実行器。"""
+
+    @abstractmethod
+    def execute(self, input_path: Path, output_path: Path, model_alias: str) -> None:
+        """input_path を処理し、OpenAI Batch 形式の結果を output_path に書き出す。"""
+        raise NotImplementedError
+
+
+class LocalBatchExecutor(BatchExecutor):
+    """バッチAPIをファイル入出力だけで模倣するスタンドイン。
+
+    入力行ごとに `LLMClient.invoke` を呼び出して出力行を書くため、オフライン検証時は
+    `client_factory` に LangChain のフェイクモデルを返す関数を渡せばよい。
+    """
+
+    def __init__(self, client_factory: Callable[[str], Any] = create_client_from_model_name) -> None:
+        self._client_factory = client_factory
+        self._clients: Dict[str, Any] = {}
+
+    def execute(self, input_path: Path, output_path: Path, model_alias: str) -> None:
+        if model_alias not in self._clients:
+            self._clients[model_alias] = self._client_factory(model_alias)
+        client = self._clients[model_alias]
+
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with input_path.open("rb") as src, output_path.open("wb") as dst:
+            for index, line in enumerate(src):
+                if not line.strip():
+                    continue
+                request = orjson.loads(line)
+                row: Dict[str, Any] = {"id": f"local-{index}", "custom_id": request["custom_id"]}
+                try:
+                    messages = convert_to_messages(request["body"]["messages"])
+                    seed = request["body"].get("seed")
+                    reply = client.invoke(messages, **({"seed": seed} if seed is not None else {}))
+                    content = getattr(reply, "content", str(reply))
+                    row["response"] = {
+                        "status_code": 200,
+                        "body": {"choices": [{"index": 0, "message": {"role": "assistant", "content": content}}]},
+                    }
+                    row["error"] = None
+                except Exception as exc:
+                    row["response"] = None
+                    row["error"] = {"message": str(exc)}
+                dst.write(orjson.dumps(row) + b"\n")
+
+
+class CommandBatchExecutor(BatchExecutor):
+    """外部コマンド（例: vLLM のオフラインバッチランナー）で入力ファイルを処理する。
+
+    例: `python -m vllm.entrypoints.openai.run_batch -i {input} -o {output} --model {model}`
+    """
+
+    def __init__(self, command_template: str) -> None:
+        self.command_template = command_template
+
+    def execute(self, input_path: Path, output_path: Path, model_alias: str) -> None:
+        model_name = get_model_config(model_alias).model
+        command = self.command_template.format(
+            input=shlex.quote(str(input_path)),
+            output=shlex.quote(str(output_path)),
+            model=shlex.quote(model_name),
+        )
+        subprocess.run(shlex.split(command), check=True)
+
+
+class OpenAIBatchExecutor(BatchExecutor):
+    """OpenAI Batch API（およびその互換API）へアップロードして完了を待つ。"""
+
+    def __init__(self, *, poll_interval: float = 30.0, completion_window: str = "24h") -> None:
+        self.poll_interval = poll_interval
+        self.completion_window = completion_window
+
+    def execute(self, input_path: Path, output_path: Path, model_alias: str) -> None:
+        from openai import OpenAI
+
+        model_config = get_model_config(model_alias)
+        if model_config.provider != "openai":
+            raise ValueError(f"OpenAI Batch API は openai プロバイダのみ対応です: {model_alias}")
+        client = OpenAI(api_key=model_config.api_key, base_url=model_config.base_url)
+
+        with input_path.open("rb") as fh:
+            uploaded = client.files.create(file=fh, purpose="batch")
+        batch = client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=self.completion_window,
+        )
+        print(f"Submitted batch {batch.id} ({model_alias}, {input_path.name})")
+        while batch.status not in OPENAI_TERMINAL_STATUSES:
+            time.sleep(self.poll_interval)
+            batch = client.batches.retrieve(batch.id)
+
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with output_path.open("wb") as fh:
+            for file_id in (batch.output_file_id, batch.error_file_id):
+                if file_id:
+                    fh.write(client.files.content(file_id).read())
+        if batch.status != "completed":
+            print(f"WARNING: batch {batch.id} ended with status={batch.status}")
+
+
+def create_batch_executor(kind: str, *, command: str | None = None) -> BatchExecutor:
+    """CLI の `--batch` 指定から実行器を生成する。"""
+
+    if kind == "local":
+        return LocalBatchExecutor()
+    if kind == "command":
+        if not command:
+            raise ValueError("command 実行器にはコマンドテンプレートが必要です。")
+        return CommandBatchExecutor(command)
+    if kind == "openai":
+        return OpenAIBatchExecutor()
+    raise ValueError(f"未対応のバッチ実行器: {kind}")
+
+
+def _safe_name(alias: str) -> str:
+    return re.sub(r"[^0-9A-Za-z._-]+", "_", alias)
+
+
+def run_batch_matches(
+    sessions: Sequence[MatchSession],
+    executor: BatchExecutor,
+    work_dir: Path,
+    *,
+    max_retries: int,
+    parse_output: Callable[..., Dict[str, str]] = parse_agent_output,
+    telemetry: Telemetry | None = None,
+) -> List[bool]:
+    """全試合をステップ同期で進め、各試合の成否を返す。
+
+    1ステップ = 全試合の送信待ちリクエストをモデル別のバッチファイルにまとめて1回実行。
+    パースに失敗したリクエストは次ステップで再送し、`max_retries` 回失敗したら
+    逐次実行時と同じ形式で失敗ログを残してその試合を打ち切る。
+    `parse_output` には `repairs` リストも渡し、JSON を修復して読めたターンはログに `json_repairs` を残す。
+    `telemetry` にはバッチ全体を1トレース、各バッチファイルの実行を子スパンとして記録する
+    （リクエストのレイテンシはそのバッチファイルの処理時間）。
+    """
+
+    telemetry = telemetry or Telemetry()
+    with telemetry.span("batch_run", matches=len(sessions), work_dir=work_dir.name):
+        outcomes = _run_batch_steps(sessions, executor, work_dir, max_retries, parse_output, telemetry)
+    for session in sessions:
+        telemetry.observe_match(session.status)
+    return outcomes
+
+
+def _session_key(session: MatchSession) -> Tuple[str, int]:
+    return log_stem(session.log_path), session.run_index
+
+
+def _run_batch_steps(
+    sessions: Sequence[MatchSession],
+    executor: BatchExecutor,
+    work_dir: Path,
+    max_retries: int,
+    parse_output: Callable[..., Dict[str, str]],
+    telemetry: Telemetry,
+) -> List[bool]:
+    work_dir.mkdir(parents=True, exist_ok=True)
+    # --resume では別のログファイルの試合が混ざり run 番号が重なるため、(ログ名, run 番号) で区別する
+    attempts: Dict[Tuple[str, int, int, str], int] = defaultdict(int)
+    # (ログ名, run_index) -> agent_id -> ("ok", parsed, content, metrics) / ("failed", content, error)
+    ready: Dict[Tuple[str, int], Dict[str, Tuple[Any, ...]]] = defaultdict(dict)
+    step = 0
+
+    while True:
+        active = [session for session in sessions if session.active]
+        if not active:
+            break
+        step += 1
+
+        outstanding: List[Tuple[Tuple[str, int], PendingTurn, str]] = []
+        by_model: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for session in active:
+            session_key = _session_key(session)
+            for turn in session.pending_turns():
+                if turn.agent_id in ready[session_key]:
+                    continue
+                key = (*session_key, turn.round_index, turn.agent_id)
+                custom_id = (
+                    f"{_safe_name(session_key[0])}-run{turn.run_index:04d}-r{turn.round_index}-"
+                    f"{turn.agent_id}-try{attempts[key] + 1}"
+                )
+                outstanding.append((session_key, turn, custom_id))
+                by_model[turn.model_alias].append(build_batch_request(custom_id, turn, seed=session.seed))
+
+        results: Dict[str, BatchResult] = {}
+        step_seconds: Dict[str, float] = {}
+        for model_alias, requests in by_model.items():
+            stem = f"step{step:03d}_{_safe_name(model_alias)}"
+            input_path = work_dir / f"{stem}.input.jsonl"
+            output_path = work_dir / f"{stem}.output.jsonl"
+            with timed("log_io"):
+                write_batch_file(input_path, requests)
+            print(f"[batch] step {step}: {len(requests)} requests -> {model_alias}")
+            started = time.perf_counter()
+            with telemetry.span("batch_step", step=step, model=model_alias, requests=len(requests)):
+                with telemetry.in_flight(model_alias, len(requests)):
+                    with timed("llm_wait"):
+                        executor.execute(input_path, output_path, model_alias)
+            step_seconds[model_alias] = time.perf_counter() - started
+            with timed("log_io"):
+                results.update(read_batch_results(output_path))
+
+        for session_key, turn, custom_id in outstanding:
+            key = (*session_key, turn.round_index, turn.agent_id)
+            attempts[key] += 1
+            result = results.get(custom_id)
+            content = result.content if result else None
+            error: Exception
+            if result is None:
+                error = RuntimeError(f"バッチ出力に {custom_id} がありません。")
+            elif result.error is not None or content is None:
+                error = RuntimeError(result.error or "応答が空です。")
+            else:
+                try:
+                    repairs: List[str] = []
+                    with timed("parse"):
+                        parsed = parse_output(content, require_vote=turn.require_vote, repairs=repairs)
+                    metrics = {"json_repairs": repairs} if repairs else None
+                    ready[session_key][turn.agent_id] = ("ok", parsed, content, metrics)
+                    telemetry.observe_request(
+                        turn.model_alias, seconds=step_seconds[turn.model_alias], attempts=1, ok=True
+                    )
+                    continue
+                except ValueError as exc:
+                    error = exc
+            telemetry.observe_request(
+                turn.model_alias, seconds=step_seconds[turn.model_alias], attempts=1, ok=False
+            )
+            print(f"Retryable batch error (attempt {attempts[key]}/{max_retries}) {custom_id}: {error}")
+            if attempts[key] >= max_retries:
+                ready[session_key][turn.agent_id] = ("failed", content, error)
+
+        # 試合ごとにプレイヤー順を守って結果を反映する
+        for session in active:
+            pending = ready[_session_key(session)]
+            for turn in session.pending_turns():
+                entry = pending.pop(turn.agent_id, None)
+                if entry is None:
+                    break
+                if entry[0] == "failed":
+                    session.record_failure(turn, entry[1], entry[2])
+                    break
+                session.record_success(turn, entry[1], entry[2], metrics=entry[3])
+            if not session.active:
+                pending.clear()
+
+    summary = {
+        "steps": step,
+        "matches": len(sessions),
+        "succeeded": sum(1 for session in sessions if session.finished),
+        "failed": sum(1 for session in sessions if session.failed),
+    }
+    append_jsonl_record(work_dir / "batch_summary.jsonl", summary)
+    return [session.finished for session in sessions]
+
+
+__all__ = [
+    "BATCH_ENDPOINT",
+    "BatchResult",
+    "BatchExecutor",
+    "LocalBatchExecutor",
+    "CommandBatchExecutor",
+    "OpenAIBatchExecutor",
+    "build_batch_request",
+    "write_batch_file",
+    "read_batch_results",
+    "create_batch_executor",
+    "run_batch_matches",
+]
@@ -0,0 +1,361 @@
+"""ログから抜き出した実プロンプトでモデルの速さと JSON の妥当性を比べるベンチマーク。
+
+1. `corpus` でログから `system_prompt` / `user_prompt` の組を抜き出し、固定のコーパス（JSONL）にする。
+2. `run` でコーパスを `config/models.yaml` の任意のモデルへ送り、モデルごとに最初のトークンまでの時間（TTFT）、
+   出力トークン/秒、応答までの所要時間の分位点、妥当な JSON の割合を表と JSON で出す。
+
+応答はストリーミングで受け取り、TTFT は本文の最初の断片が届くまでの時間とする。
+Ollama の複数モデルが同じホストにあると交互に送るたびに読み込み直しになるため、
+モデルごとにまとめて送り、各モデルの最初に計測しない呼び出しを1回挟む。
+
+`--record` で応答と計測値をカセット（JSONL）に保存し、`--replay` でモデルを呼ばずにカセットから
+同じ表を作る。JSON の妥当性は再生時にも現在のパーサで判定し直すため、CI でパーサの変更を確かめられる。
+
+```bash
+python -m experiments.benchmark corpus --logs experiments/template_4player/logs --samples 30 --out bench/corpus.jsonl
+python -m experiments.benchmark run bench/corpus.jsonl --models ollama_gemma3:27b openai_gpt-oss-20b --record bench/cassette.jsonl
+python -m experiments.benchmark run bench/corpus.jsonl --replay bench/cassette.jsonl --json
+```
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+
+import orjson
+
+from experiments.agent_io import parse_agent_output
+from experiments.autotune import PromptSample, sample_prompts
+from experiments.latency import quantile
+from experiments.logio import iter_log_records
+from experiments.runner import append_jsonl_record
+from src.config import create_client_from_model_name
+
+BENCHMARK_LOG_FILENAME = "benchmark.jsonl"
+DEFAULT_SAMPLES = 30
+PERCENTILES = (50, 90, 99)
+
+
+@dataclass
+class CorpusEntry:
+    """コーパスの1プロンプト。`prompt_id` はプロンプト本文のハッシュ。"""
+
+    prompt_id: str
+    system_prompt: str
+    user_prompt: str
+    require_vote: bool
+    source: str
+
+    @classmethod
+    def from_sample(cls, sample: PromptSample) -> "CorpusEntry":
+        digest = hashlib.sha1(f"{sample.system_prompt}\0{sample.user_prompt}".encode("utf-8")).hexdigest()[:12]
+        return cls(digest, sample.system_prompt, sample.user_prompt, sample.require_vote, sample.source)
+
+    def messages(self) -> List[Any]:
+        return PromptSample(self.system_prompt, self.user_prompt, self.require_vote, self.source).messages()
+
+
+@dataclass
+class Measurement:
+    """1回の呼び出しの計測値（カセットの1行）。"""
+
+    model: str
+    prompt_id: str
+    repeat: int
+    content: str | None
+    ttft_seconds: float | None
+    latency_seconds: float | None
+    input_tokens: int | None = None
+    output_tokens: int | None = None
+    error: str | None = None
+
+    @property
+    def tokens_per_second(self) -> float | None:
+        # 生成速度なので、最初のトークン以降の時間で割る
+        if not self.output_tokens or self.latency_seconds is None or self.ttft_seconds is None:
+            return None
+        generating = self.latency_seconds - self.ttft_seconds
+        return self.output_tokens / generating if generating > 0 else None
+
+
+@dataclass
+class ModelSummary:
+    """モデル1つ分の集計。"""
+
+    model: str
+    requests: int = 0
+    errors: int = 0
+    valid: int = 0
+    repaired: int = 0
+    ttft: List[float] = field(default_factory=list)
+    latency: List[float] = field(default_factory=list)
+    tokens_per_second: List[float] = field(default_factory=list)
+    error_samples: List[str] = field(default_factory=list)
+
+    @property
+    def valid_rate(self) -> float:
+        return self.valid / self.requests if self.requests else 0.0
+
+    def add(self, measurement: Measurement, *, require_vote: bool) -> None:
+        self.requests += 1
+        if measurement.error is not None or measurement.content is None:
+            self.errors += 1
+            if len(self.error_samples) < 5:
+                self.error_samples.append(measurement.error or "empty response")
+            return
+        if measurement.ttft_seconds is not None:
+            self.ttft.append(measurement.ttft_seconds)
+        if measurement.latency_seconds is not None:
+            self.latency.append(measurement.latency_seconds)
+        if measurement.tokens_per_second is not None:
+            self.tokens_per_second.append(measurement.tokens_per_second)
+        repairs: List[str] = []
+        try:
+            parse_agent_output(measurement.content, require_vote=require_vote, repairs=repairs)
+        except ValueError:
+            return
+        self.valid += 1
+        self.repaired += bool(repairs)
+
+    def to_record(self) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "requests": self.requests,
+            "errors": self.errors,
+            "valid_rate": round(self.valid_rate, 4),
+            "repaired": self.repaired,
+            **{f"ttft_p{p}_seconds": _round(quantile(self.ttft, p)) for p in PERCENTILES},
+            **{f"latency_p{p}_seconds": _round(quantile(self.latency, p)) for p in PERCENTILES},
+            "mean_tokens_per_second": _round(_mean(self.tokens_per_second)),
+            "error_samples": self.error_samples,
+        }
+
+
+def _mean(values: Sequence[float]) -> float | None:
+    return sum(values) / len(values) if values else None
+
+
+def _round(value: float | None) -> float | None:
+    return None if value is None else round(value, 4)
+
+
+def build_corpus(paths: Iterable[Path], count: int, *, seed: int | None = 0) -> List[CorpusEntry]:
+    """ログからプロンプトを抜き出し、重複を除いたコーパスを作る。"""
+
+    entries = [CorpusEntry.from_sample(sample) for sample in sample_prompts(paths, count, seed=seed)]
+    return list({entry.prompt_id: entry for entry in entries}.values())
+
+
+def save_corpus(entries: Sequence[CorpusEntry], path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"".join(orjson.dumps(asdict(entry)) + b"\n" for entry in entries))
+
+
+def load_corpus(path: Path) -> List[CorpusEntry]:
+    return [CorpusEntry(**row) for row in iter_log_records(path)]
+
+
+def measure_stream(client: Any, model_alias: str, entry: CorpusEntry, repeat: int) -> Measurement:
+    """1プロンプトをストリーミングで送り、TTFT・所要時間・トークン数を測る。"""
+
+    chat_model = client.chat_model
+    # OpenAI 互換 API はこれを付けないとストリームでトークン数を返さない
+    kwargs = {"stream_usage": True} if "stream_usage" in type(chat_model).model_fields else {}
+    started = time.perf_counter()
+    first: float | None = None
+    message = None
+    try:
+        for chunk in chat_model.stream(entry.messages(), **kwargs):
+            if first is None and chunk.content:
+                first = time.perf_counter() - started
+            message = chunk if message is None else message + chunk
+    except Exception as exc:
+        return Measurement(model_alias, entry.prompt_id, repeat, None, first, None, error=f"{type(exc).__name__}: {exc}")
+    elapsed = time.perf_counter() - started
+    usage = getattr(message, "usage_metadata", None) or {}
+    return Measurement(
+        model_alias,
+        entry.prompt_id,
+        repeat,
+        None if message is None else str(message.content),
+        first,
+        elapsed,
+        input_tokens=usage.get("input_tokens"),
+        output_tokens=usage.get("output_tokens"),
+    )
+
+
+def run_live(
+    corpus: Sequence[CorpusEntry],
+    models: Sequence[str],
+    *,
+    repeats: int = 1,
+    warmup: bool = True,
+    client_factory: Callable[[str], Any] = create_client_from_model_name,
+) -> List[Measurement]:
+    """モデルごとにコーパス全体を順に送る。"""
+
+    measurements: List[Measurement] = []
+    for alias in models:
+        client = client_factory(alias)
+        print(f"[benchmark] {alias}: {len(corpus)} prompts x {repeats}", file=sys.stderr)
+        if warmup and corpus:
+            measure_stream(client, alias, corpus[0], 0)
+        for repeat in range(1, repeats + 1):
+            measurements.extend(measure_stream(client, alias, entry, repeat) for entry in corpus)
+    return measurements
+
+
+def load_cassette(path: Path) -> Dict[Tuple[str, str, int], Measurement]:
+    return {
+        (row["model"], row["prompt_id"], row["repeat"]): Measurement(**row) for row in iter_log_records(path)
+    }
+
+
+def replay(
+    corpus: Sequence[CorpusEntry],
+    cassette: Dict[Tuple[str, str, int], Measurement],
+    models: Sequence[str] | None = None,
+    *,
+    repeats: int = 1,
+) -> List[Measurement]:
+    """カセットの計測値を取り出す。記録されていない組は error として返す。"""
+
+    aliases = list(models) if models else sorted({model for model, _, _ in cassette})
+    measurements: List[Measurement] = []
+    for alias in aliases:
+        for repeat in range(1, repeats + 1):
+            for entry in corpus:
+                recorded = cassette.get((alias, entry.prompt_id, repeat))
+                measurements.append(
+                    recorded
+                    or Measurement(alias, entry.prompt_id, repeat, None, None, None, error="not recorded in cassette")
+                )
+    return measurements
+
+
+def summarize(corpus: Sequence[CorpusEntry], measurements: Iterable[Measurement]) -> List[ModelSummary]:
+    """計測値をモデル別に集計する（JSON の妥当性はここで判定する）。"""
+
+    require_vote = {entry.prompt_id: entry.require_vote for entry in corpus}
+    summaries: Dict[str, ModelSummary] = {}
+    for item in measurements:
+        summary = summaries.setdefault(item.model, ModelSummary(item.model))
+        summary.add(item, require_vote=require_vote.get(item.prompt_id, False))
+    return list(summaries.values())
+
+
+def _fmt(value: float | None, spec: str) -> str:
+    return "-" if value is None else format(value, spec)
+
+
+def print_table(summaries: Sequence[ModelSummary]) -> None:
+    print(
+        f"{'model':<28} {'n':>4} {'err':>4} {'valid':>6} {'ttft p50':>9} {'tok/s':>7} "
+        f"{'p50':>7} {'p90':>7} {'p99':>7}"
+    )
+    for item in summaries:
+        record = item.to_record()
+        print(
+            f"{item.model:<28} {item.requests:>4} {item.errors:>4} {item.valid_rate:>6.0%} "
+            f"{_fmt(record['ttft_p50_seconds'], '.2f'):>9} {_fmt(record['mean_tokens_per_second'], '.1f'):>7} "
+            f"{_fmt(record['latency_p50_seconds'], '.2f'):>7} {_fmt(record['latency_p90_seconds'], '.2f'):>7} "
+            f"{_fmt(record['latency_p99_seconds'], '.2f'):>7}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark models on a fixed corpus of real game prompts")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    corpus_parser = sub.add_parser("corpus", help="ログからプロンプトのコーパスを作る")
+    corpus_parser.add_argument("--logs", nargs="+", type=Path, required=True, help="試合ログ（ファイルまたは logs ディレクトリ）")
+    corpus_parser.add_argument("--samples", type=int, default=DEFAULT_SAMPLES, help="プロンプト数（default: %(default)s）")
+    corpus_parser.add_argument("--seed", type=int, default=0, help="抽出の乱数シード（default: %(default)s）")
+    corpus_parser.add_argument("--out", type=Path, required=True, help="コーパスの保存先（JSONL）")
+
+    run_parser = sub.add_parser("run", help="コーパスをモデルに送って計測する")
+    run_parser.add_argument("corpus", type=Path, help="corpus で作ったコーパス")
+    run_parser.add_argument("--models", nargs="+", default=None, help="config/models.yaml のモデル名（--replay では省略可）")
+    run_parser.add_argument("--repeats", type=int, default=1, help="コーパスを送る回数（default: %(default)s）")
+    run_parser.add_argument("--record", type=Path, default=None, help="応答と計測値をこのカセットに保存する")
+    run_parser.add_argument("--replay", type=Path, default=None, help="モデルを呼ばずにこのカセットから集計する")
+    run_parser.add_argument("--no-warmup", dest="warmup", action="store_false", help="モデルごとの計測しない初回呼び出しを省く")
+    run_parser.add_argument("--json", action="store_true", help="表の代わりに結果を JSON で標準出力へ書く")
+    run_parser.add_argument(
+        "--results",
+        type=Path,
+        default=None,
+        help=f"結果を追記する JSONL（既定: コーパスと同じディレクトリの {BENCHMARK_LOG_FILENAME}）",
+    )
+    args = parser.parse_args()
+
+    if args.command == "corpus":
+        if args.samples < 1:
+            parser.error("--samples must be >= 1")
+        entries = build_corpus(args.logs, args.samples, seed=args.seed)
+        if not entries:
+            parser.error("ログに再生できるプロンプトがありません")
+        save_corpus(entries, args.out)
+        print(f"{len(entries)} prompts -> {args.out}")
+        return
+
+    if args.record and args.replay:
+        parser.error("--record and --replay cannot be combined")
+    if not args.replay and not args.models:
+        parser.error("--models is required unless --replay is given")
+    if args.repeats < 1:
+        parser.error("--repeats must be >= 1")
+    corpus = load_corpus(args.corpus)
+    if args.replay:
+        measurements = replay(corpus, load_cassette(args.replay), args.models, repeats=args.repeats)
+    else:
+        measurements = run_live(corpus, args.models, repeats=args.repeats, warmup=args.warmup)
+        if args.record:
+            args.record.parent.mkdir(parents=True, exist_ok=True)
+            args.record.write_bytes(b"".join(orjson.dumps(asdict(item)) + b"\n" for item in measurements))
+    summaries = summarize(corpus, measurements)
+
+    record = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "corpus": args.corpus.name,
+        "prompts": len(corpus),
+        "repeats": args.repeats,
+        "mode": "replay" if args.replay else "live",
+        "models": [item.to_record() for item in summaries],
+    }
+    if args.json:
+        print(orjson.dumps(record, option=orjson.OPT_INDENT_2).decode("utf-8"))
+
+    results = args.results or args.corpus.parent / BENCHMARK_LOG_FILENAME
+    append_jsonl_record(results, record)
+    if not args.json:
+        print_table(summaries)
+        print(f"(saved to {results})")
+
+
+__all__ = [
+    "BENCHMARK_LOG_FILENAME",
+    "CorpusEntry",
+    "Measurement",
+    "ModelSummary",
+    "build_corpus",
+    "save_corpus",
+    "load_corpus",
+    "measure_stream",
+    "run_live",
+    "load_cassette",
+    "replay",
+    "summarize",
+    "print_table",
+]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""長いスイープ向けのライブ進捗表示（`--live`）。
+
+`Telemetry` の累計値を一定間隔で読み、完了・失敗試合数、試合/分、出力トークン/秒、
+エンドポイント別の実行中リクエスト数、再試行・タイムアウト数、完了までの見込み時間を1行で表示する。
+端末で `--quiet`（発言の表示なし）と組み合わせると同じ行を上書きし、それ以外は1行ずつ追記する。
+
+```
+[live] 12/40 done (1 failed) | 2.4 match/min | 38.5 tok/s | retries 3 timeouts 1 | in-flight box-a:1 | ETA 11m40s
+```
+"""
+from __future__ import annotations
+
+import sys
+import threading
+import time
+from typing import TextIO
+from urllib.parse import urlparse
+
+from experiments.telemetry import Telemetry, TelemetrySnapshot
+
+DEFAULT_INTERVAL = 2.0
+APPEND_INTERVAL = 30.0
+
+
+def format_duration(seconds: float | None) -> str:
+    """ETA 用の短い表記（1h02m / 3m05s / 42s）。"""
+
+    if seconds is None:
+        return "-"
+    seconds = int(round(seconds))
+    hours, remainder = divmod(seconds, 3600)
+    minutes, secs = divmod(remainder, 60)
+    if hours:
+        return f"{hours}h{minutes:02d}m"
+    if minutes:
+        return f"{minutes}m{secs:02d}s"
+    return f"{secs}s"
+
+
+def _endpoint_label(endpoint: str) -> str:
+    # トンネル URL は長いので、ホスト名の先頭だけを出す
+    host = urlparse(endpoint).hostname
+    return host.split(".")[0] if host else endpoint
+
+
+def render_status(snapshot: TelemetrySnapshot, *, total_matches: int, elapsed: float) -> str:
+    """スナップショット1つを表示用の1行にする。"""
+
+    failed = snapshot.matches.get("failed", 0)
+    done = snapshot.matches.get("finished", 0) + failed
+    minutes = elapsed / 60
+    rate = done / minutes if minutes > 0 else 0.0
+    eta = (total_matches - done) / rate * 60 if rate > 0 and done < total_matches else None
+    in_flight = " ".join(
+        f"{_endpoint_label(endpoint)}:{count}" for endpoint, count in sorted(snapshot.in_flight.items()) if count
+    )
+    return (
+        f"[live] {done}/{total_matches} done ({failed} failed) | {rate:.1f} match/min | "
+        f"{snapshot.output_tokens / elapsed if elapsed > 0 else 0.0:.1f} tok/s | "
+        f"retries {snapshot.retries} timeouts {snapshot.timeouts} | in-flight {in_flight or '-'} | "
+        f"ETA {format_duration(eta) if done < total_matches else 'done'}"
+    )
+
+
+class LiveConsole:
+    """バックグラウンドスレッドで進捗行を書き出す。`with` で開始・終了する。"""
+
+    def __init__(
+        self,
+        telemetry: Telemetry,
+        total_matches: int,
+        *,
+        overwrite: bool | None = None,
+        interval: float | None = None,
+        stream: TextIO | None = None,
+    ) -> None:
+        self.telemetry = telemetry
+        self.total_matches = total_matches
+        self.stream = stream or sys.stderr
+        self.overwrite = self.stream.isatty() if overwrite is None else overwrite
+        self.interval = interval or (DEFAULT_INTERVAL if self.overwrite else APPEND_INTERVAL)
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._started = 0.0
+
+    def __enter__(self) -> "LiveConsole":
+        self._started = time.monotonic()
+        self._thread = threading.Thread(target=self._loop, name="live-console", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._write(final=True)
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._write()
+
+    def _write(self, *, final: bool = False) -> None:
+        line = render_status(
+            self.telemetry.snapshot(),
+            total_matches=self.total_matches,
+            elapsed=time.monotonic() - self._started,
+        )
+        if self.overwrite:
+            self.stream.write(f"\r\x1b[K{line}" + ("\n" if final else ""))
+        else:
+            self.stream.write(line + "\n")
+        self.stream.flush()
+
+
+__all__ = [
+    "LiveConsole",
+    "render_status",
+    "format_duration",
+]
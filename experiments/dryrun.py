@@ -0,0 +1,328 @@
+"""LLM を呼ばずにプロンプトだけを組み立て、トークン量と所要時間を見積もるドライラン。
+
+試合は実際の `GameEngine.create_session` から作った本物のセッションで進めるため、
+送信されるプロンプト（履歴の伸び方・可視範囲・画像添付を含む）は `run()` と同一になる。
+応答の代わりには過去ログから (モデル, フェーズ) ごとに抽出した実際の応答を差し込み、
+過去ログが無い場合は既定長のプレースホルダを使う。所要時間は過去ログの
+`latency_seconds`（モデル別平均）から1試合のクリティカルパスを求め、
+ワーカー数ぶんの並列実行を仮定して全体の壁時計時間を見積もる。
+"""
+from __future__ import annotations
+
+import heapq
+import os
+import random
+from collections import defaultdict
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+import orjson
+from langchain_core.messages import BaseMessage
+
+from experiments.logio import MATCH_LOG_BASES, iter_log_records, list_log_files
+from experiments.runner import append_jsonl_record
+from src.config import get_model_config
+
+DRYRUN_LOG_FILENAME = "dryrun.jsonl"
+TOKENIZER_ENCODING = "cl100k_base"
+MESSAGE_OVERHEAD_TOKENS = 4
+IMAGE_TOKEN_ESTIMATE = 765
+PLACEHOLDER_THOUGHT_CHARS = 200
+PLACEHOLDER_SPEECH_CHARS = 120
+
+_encoder: Any = None
+_encoder_loaded = False
+
+
+def _load_encoder() -> Any:
+    global _encoder, _encoder_loaded
+    if not _encoder_loaded:
+        _encoder_loaded = True
+        try:
+            import tiktoken
+
+            _encoder = tiktoken.get_encoding(TOKENIZER_ENCODING)
+        except Exception as exc:  # オフライン環境ではエンコーディングを取得できない
+            print(f"WARNING: tiktoken を利用できないため文字数からトークン数を概算します ({type(exc).__name__})")
+            _encoder = None
+    return _encoder
+
+
+def count_tokens(text: str) -> int:
+    """テキストのトークン数を返す（tiktoken が使えなければ ASCII 4文字=1、非ASCII 1文字=1 で概算）。"""
+
+    if not text:
+        return 0
+    encoder = _load_encoder()
+    if encoder is not None:
+        return len(encoder.encode(text, disallowed_special=()))
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+
+def count_message_tokens(messages: Sequence[BaseMessage]) -> int:
+    """チャットメッセージ列の入力トークン数を見積もる（画像は1枚あたり固定値）。"""
+
+    total = 0
+    for message in messages:
+        total += MESSAGE_OVERHEAD_TOKENS
+        content = message.content
+        if isinstance(content, str):
+            total += count_tokens(content)
+            continue
+        for part in content:
+            if isinstance(part, str):
+                total += count_tokens(part)
+            elif part.get("type") == "text":
+                total += count_tokens(part.get("text", ""))
+            else:
+                total += IMAGE_TOKEN_ESTIMATE
+    return total
+
+
+@dataclass
+class SampledResponse:
+    """プレースホルダとして差し込む応答1件分。"""
+
+    thought: str
+    speech: str
+    vote: str
+    raw: str
+
+
+class ResponseSampler:
+    """過去ログのターン記録から応答と所要時間をサンプリングする。"""
+
+    def __init__(self, log_paths: Iterable[Path] = (), *, seed: int | None = None) -> None:
+        self.rng = random.Random(seed)
+        self._responses: Dict[Tuple[str, str], List[SampledResponse]] = defaultdict(list)
+        self._latencies: Dict[str, List[float]] = defaultdict(list)
+        for path in log_paths:
+            self._ingest(path)
+
+    @classmethod
+    def from_logs_dir(cls, logs_dir: Path, *, seed: int | None = None) -> "ResponseSampler":
+        return cls(list_log_files(logs_dir, MATCH_LOG_BASES), seed=seed)
+
+    def _ingest(self, path: Path) -> None:
+        for row in iter_log_records(path):
+            model = row.get("model_name")
+            if not model or "speech" not in row:
+                continue
+            speech = row.get("speech") or ""
+            thought = row.get("thought") or ""
+            self._responses[(model, row.get("phase", ""))].append(
+                SampledResponse(
+                    thought=thought,
+                    speech=speech,
+                    vote=row.get("vote") or "",
+                    raw=row.get("raw_response") or orjson.dumps({"thought": thought, "speech": speech}).decode("utf-8"),
+                )
+            )
+            if isinstance(row.get("latency_seconds"), (int, float)):
+                self._latencies[model].append(float(row["latency_seconds"]))
+
+    @property
+    def sample_count(self) -> int:
+        return sum(len(items) for items in self._responses.values())
+
+    def mean_latency(self, model_alias: str) -> float | None:
+        values = self._latencies.get(model_alias)
+        return sum(values) / len(values) if values else None
+
+    def sample(self, model_alias: str, phase: str, players: Sequence[str]) -> Tuple[Dict[str, str], str]:
+        """(パース済み応答, 生応答) を返す。投票先は常に試合内のプレイヤーから選ぶ。"""
+
+        vote = self.rng.choice(list(players))
+        candidates = self._responses.get((model_alias, phase))
+        if not candidates:
+            # 同じフェーズ名が無ければ同モデルの別フェーズ、次いで既定長のプレースホルダ
+            candidates = [item for (model, _), items in self._responses.items() if model == model_alias for item in items]
+        if candidates:
+            picked = self.rng.choice(candidates)
+            return {"thought": picked.thought, "speech": picked.speech, "vote": vote}, picked.raw
+        parsed = {
+            "thought": "x" * PLACEHOLDER_THOUGHT_CHARS,
+            "speech": "x" * PLACEHOLDER_SPEECH_CHARS,
+            "vote": vote,
+        }
+        return parsed, orjson.dumps(parsed).decode("utf-8")
+
+
+@dataclass
+class ModelEstimate:
+    """モデルエイリアス単位の集計。"""
+
+    model: str
+    provider: str
+    endpoint: str
+    requests: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    mean_latency_seconds: float | None = None
+
+
+@dataclass
+class DryRunReport:
+    """ドライラン全体の見積り結果。"""
+
+    matches: int
+    workers: int
+    models: Dict[str, ModelEstimate] = field(default_factory=dict)
+    match_seconds: List[float] = field(default_factory=list)
+    unknown_latency_models: List[str] = field(default_factory=list)
+    sampled_responses: int = 0
+
+    @property
+    def total_requests(self) -> int:
+        return sum(item.requests for item in self.models.values())
+
+    @property
+    def wall_seconds(self) -> float | None:
+        """試合を空いたワーカーへ順に割り当てた場合の完了時刻（レイテンシ履歴が無いモデルがあれば None）。"""
+
+        if self.unknown_latency_models:
+            return None
+        return project_wall_seconds(self.match_seconds, self.workers)
+
+    def by_endpoint(self) -> Dict[str, Dict[str, int]]:
+        totals: Dict[str, Dict[str, int]] = defaultdict(lambda: {"requests": 0, "input_tokens": 0, "output_tokens": 0})
+        for item in self.models.values():
+            bucket = totals[f"{item.provider} {item.endpoint}".strip()]
+            bucket["requests"] += item.requests
+            bucket["input_tokens"] += item.input_tokens
+            bucket["output_tokens"] += item.output_tokens
+        return dict(totals)
+
+    def to_record(self) -> Dict[str, Any]:
+        return {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "matches": self.matches,
+            "workers": self.workers,
+            "requests": self.total_requests,
+            "models": {alias: asdict(item) for alias, item in self.models.items()},
+            "endpoints": self.by_endpoint(),
+            "sampled_responses": self.sampled_responses,
+            "unknown_latency_models": self.unknown_latency_models,
+            "serial_seconds": round(sum(self.match_seconds), 2),
+            "wall_seconds": None if self.wall_seconds is None else round(self.wall_seconds, 2),
+        }
+
+
+def project_wall_seconds(match_seconds: Sequence[float], workers: int) -> float:
+    """各試合を空いたワーカーへ投入順に割り当てたときの全体所要時間。"""
+
+    if not match_seconds:
+        return 0.0
+    slots = [0.0] * max(1, min(workers, len(match_seconds)))
+    for seconds in match_seconds:
+        heapq.heapreplace(slots, slots[0] + seconds)
+    return max(slots)
+
+
+def estimate_matches(
+    engine: Any,
+    workloads: Iterable[Tuple[Dict[str, Any], Dict[str, Any], int]],
+    *,
+    workers: int = 1,
+    sampler: ResponseSampler | None = None,
+) -> DryRunReport:
+    """(config, prompts, 試合数) の列を `engine` のセッションで空回しして見積もる。
+
+    ログは破棄し、チェックポイントも保存しない。
+    """
+
+    sampler = sampler or ResponseSampler.from_logs_dir(engine.logs_dir)
+    report = DryRunReport(matches=0, workers=workers, sampled_responses=sampler.sample_count)
+    run_index = 0
+    for config, prompts, matches in workloads:
+        for _ in range(matches):
+            run_index += 1
+            session = engine.create_session(
+                config, prompts, Path(os.devnull), run_index, checkpoints=False, echo=False
+            )
+            seconds = 0.0
+            while session.active:
+                for turn in session.pending_turns():
+                    estimate = report.models.get(turn.model_alias)
+                    if estimate is None:
+                        model_config = get_model_config(turn.model_alias)
+                        estimate = ModelEstimate(
+                            model=turn.model_alias,
+                            provider=model_config.provider,
+                            endpoint=model_config.base_url or "",
+                            mean_latency_seconds=sampler.mean_latency(turn.model_alias),
+                        )
+                        report.models[turn.model_alias] = estimate
+                        if estimate.mean_latency_seconds is None:
+                            report.unknown_latency_models.append(turn.model_alias)
+                    parsed, content = sampler.sample(turn.model_alias, turn.phase, session.player_order)
+                    estimate.requests += 1
+                    estimate.input_tokens += count_message_tokens(turn.messages)
+                    estimate.output_tokens += count_tokens(content)
+                    seconds += estimate.mean_latency_seconds or 0.0
+                    session.record_success(turn, parsed, content)
+            report.match_seconds.append(seconds)
+            report.matches += 1
+    return report
+
+
+def _format_duration(seconds: float) -> str:
+    hours, rest = divmod(int(round(seconds)), 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{hours}h{minutes:02d}m{secs:02d}s"
+
+
+def print_report(report: DryRunReport) -> None:
+    """見積り結果を表形式で表示する。"""
+
+    print(f"=== Dry run: {report.matches} matches, {report.total_requests} requests ===")
+    print(f"{'model':<24} {'requests':>9} {'input_tok':>12} {'output_tok':>11} {'latency':>9}")
+    for item in report.models.values():
+        latency = "-" if item.mean_latency_seconds is None else f"{item.mean_latency_seconds:.2f}s"
+        print(f"{item.model:<24} {item.requests:>9} {item.input_tokens:>12} {item.output_tokens:>11} {latency:>9}")
+    print("--- per endpoint ---")
+    for endpoint, totals in report.by_endpoint().items():
+        print(
+            f"{endpoint}: requests={totals['requests']} "
+            f"input_tokens={totals['input_tokens']} output_tokens={totals['output_tokens']}"
+        )
+    if report.sampled_responses == 0:
+        print(
+            "NOTE: 過去ログに応答が無いため、出力トークンは既定長のプレースホルダで見積もっています。"
+        )
+    if report.wall_seconds is None:
+        print(
+            "NOTE: レイテンシ履歴が無いモデルがあるため所要時間は見積もれません: "
+            + ", ".join(report.unknown_latency_models)
+        )
+    else:
+        print(
+            f"Projected wall time with {report.workers} worker(s): {_format_duration(report.wall_seconds)} "
+            f"(serial {_format_duration(sum(report.match_seconds))})"
+        )
+
+
+def save_report(report: DryRunReport, logs_dir: Path) -> Path:
+    """見積り結果を logs/dryrun.jsonl に追記する。"""
+
+    logs_dir.mkdir(parents=True, exist_ok=True)
+    path = logs_dir / DRYRUN_LOG_FILENAME
+    append_jsonl_record(path, report.to_record())
+    return path
+
+
+__all__ = [
+    "DRYRUN_LOG_FILENAME",
+    "count_tokens",
+    "count_message_tokens",
+    "ResponseSampler",
+    "ModelEstimate",
+    "DryRunReport",
+    "project_wall_seconds",
+    "estimate_matches",
+    "print_report",
+    "save_report",
+]
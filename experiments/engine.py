@@ -0,0 +1,534 @@
+"""config.yaml の `game` 設定から試合を組み立てて実行する共通エンジン。
+
+プレイヤー数は `agents`、フェーズ構成・ラウンド数・モダリティは `game` セクションで指定する。
+
+```yaml
+game:
+  modality: text        # text / multimodal
+  image_dir: images     # multimodal のときに添付する画像ディレクトリ
+  context: inline       # inline（毎ターン履歴を埋め込み直す）/ thread（エージェントごとの会話スレッド）
+  phases:
+    - name: discussion
+      rounds: 2
+    - name: vote
+```
+"""
+from __future__ import annotations
+
+import sys
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+from experiments.agent_io import (
+    EMPTY_HISTORY_TEXT,
+    MAX_RETRIES,
+    NO_NEW_SPEECH_TEXT,
+    InvocationStats,
+    build_thread_update,
+    build_user_prompt,
+    invoke_with_retries,
+    parse_agent_output,
+)
+from experiments.batch import create_batch_executor, run_batch_matches
+from experiments.console import LiveConsole
+from experiments.dryrun import ResponseSampler, estimate_matches, print_report, save_report
+from experiments.hedging import HedgedClient, HedgePolicy, HedgeReport
+from experiments.latency import DEFAULT_WINDOW, LatencyWindow, latency_samples, load_latency_history
+from experiments.timeouts import DeadlineClient
+from experiments.logio import LogFormat, configure_log, log_stem
+from experiments.match import (
+    CONTEXT_MODES,
+    MatchSession,
+    PendingTurn,
+    PhaseSpec,
+    find_resumable_checkpoints,
+)
+from experiments.profiling import profile_match
+from experiments.telemetry import Telemetry
+from experiments.warmup import warm_up_models
+from experiments.runner import (
+    collect_image_paths,
+    collect_ollama_connection_errors,
+    load_image_base64,
+    load_yaml,
+    next_sequential_log_path,
+    parse_run_options,
+    resolve_worker_count,
+)
+from src.config import create_client_from_model_name, get_model_config
+
+DEFAULT_DISCUSSION_ROUNDS = 2
+MODALITIES = ("text", "multimodal")
+LOG_FILE_BASE = "logfile"
+THREAD_PHASE_HEADER = "【ここからフェーズが変わります。以下の指示に従ってください】"
+DEFAULT_TOTAL_MATCHES = 1
+
+
+@dataclass
+class GameSpec:
+    """`game` セクションを検証済みの形で保持する。"""
+
+    phases: List[PhaseSpec]
+    modality: str = "text"
+    image_dir: str = "images"
+    max_retries: int = MAX_RETRIES
+    context: str = "inline"
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "GameSpec":
+        raw = config.get("game") or {}
+        modality = raw.get("modality", "text")
+        if modality not in MODALITIES:
+            raise ValueError(f"未対応の modality です: {modality}（{', '.join(MODALITIES)}）")
+        context = raw.get("context", "inline")
+        if context not in CONTEXT_MODES:
+            raise ValueError(f"未対応の context です: {context}（{', '.join(CONTEXT_MODES)}）")
+        raw_phases = raw.get("phases") or [
+            {"name": "discussion", "rounds": DEFAULT_DISCUSSION_ROUNDS},
+            {"name": "vote"},
+        ]
+        return cls(
+            phases=[PhaseSpec.from_config(item) for item in raw_phases],
+            modality=modality,
+            image_dir=raw.get("image_dir", "images"),
+            max_retries=int(raw.get("max_retries", MAX_RETRIES)),
+            context=context,
+        )
+
+
+class GameMatchSession(MatchSession):
+    """GameSpec のモダリティに従ってプロンプトを組み立てる試合セッション。"""
+
+    def __init__(self, *args, image_parts: Sequence[Dict[str, Any]] = (), **kwargs) -> None:
+        self.image_parts = list(image_parts)
+        super().__init__(*args, **kwargs)
+
+    def render_turn(
+        self, agent_id: str, phase: str, history_text: str
+    ) -> Tuple[str, str, List[BaseMessage]]:
+        prompt_bundle = self.prompt_agents[agent_id][phase]
+        system_prompt = prompt_bundle["system_prompt"].strip()
+        user_prompt = build_user_prompt(prompt_bundle["user_prompt"], history_text)
+        messages: List[BaseMessage] = [
+            SystemMessage(content=system_prompt),
+            HumanMessage(content=[{"type": "text", "text": user_prompt.strip()}, *self.image_parts]),
+        ]
+        return system_prompt, user_prompt, messages
+
+    def render_thread_turn(
+        self, agent_id: str, phase: str, new_history: str, previous_phase: str | None
+    ) -> Tuple[str, str, List[BaseMessage]]:
+        prompt_bundle = self.prompt_agents[agent_id][phase]
+        system_prompt = prompt_bundle["system_prompt"].strip()
+        template = prompt_bundle["user_prompt"]
+        if previous_phase is None:
+            # 初回は inline と同じ内容（画像もここで1度だけ送る）
+            user_prompt = build_user_prompt(template, new_history or EMPTY_HISTORY_TEXT)
+            return system_prompt, user_prompt, [
+                SystemMessage(content=system_prompt),
+                HumanMessage(content=[{"type": "text", "text": user_prompt.strip()}, *self.image_parts]),
+            ]
+        if previous_phase == phase:
+            user_prompt = build_thread_update(template, new_history)
+        else:
+            # システムプロンプトは先頭から動かせないため、フェーズ固有の指示はユーザー発話で伝える
+            user_prompt = build_user_prompt(template, new_history or NO_NEW_SPEECH_TEXT)
+            if system_prompt != self.prompt_agents[agent_id][previous_phase]["system_prompt"].strip():
+                user_prompt = f"{THREAD_PHASE_HEADER}\n{system_prompt}\n\n{user_prompt}"
+        return system_prompt, user_prompt, [HumanMessage(content=user_prompt.strip())]
+
+
+@dataclass
+class GameEngine:
+    """テンプレートディレクトリ（config.yaml / prompts.yaml / logs/）単位の実行器。
+
+    モデルクライアントと画像の data URI はエンジン内でキャッシュし、試合をまたいで再利用する。
+    `telemetry` に出力先を設定すると、試合・ターンをスパンとして、リクエスト数などをメトリクスとして書き出す。
+    `hedge_policy` を設定すると、`replicas` を持つモデルのクライアントを `HedgedClient` で包む。
+    `quiet` にすると各エージェントの発言を表示しない（高並列では端末出力自体が無視できない負荷になる）。
+    `timeouts.adaptive` のモデル（`adaptive_timeouts` なら全モデル）は、エンドポイントごとのクライアントを
+    `DeadlineClient` で包む。ヘッジ先もそれぞれの期限で打ち切られる。
+    """
+
+    base_dir: Path
+    config_name: str = "config.yaml"
+    prompts_name: str = "prompts.yaml"
+    telemetry: Telemetry = field(default_factory=Telemetry)
+    profile: bool = False
+    hedge_policy: HedgePolicy | None = None
+    hedge_report: HedgeReport = field(default_factory=HedgeReport)
+    adaptive_timeouts: bool = False
+    quiet: bool = False
+    _base_clients: Dict[str, Any] = field(default_factory=dict, init=False, repr=False)
+    _clients: Dict[str, Any] = field(default_factory=dict, init=False, repr=False)
+    _image_parts: Dict[str, Tuple[List[str], List[Dict[str, Any]]]] = field(
+        default_factory=dict, init=False, repr=False
+    )
+    _latency_history: Dict[Tuple[str, str | None], List[float]] | None = field(default=None, init=False, repr=False)
+
+    @property
+    def config_path(self) -> Path:
+        return self.base_dir / self.config_name
+
+    @property
+    def prompts_path(self) -> Path:
+        return self.base_dir / self.prompts_name
+
+    @property
+    def logs_dir(self) -> Path:
+        return self.base_dir / "logs"
+
+    @property
+    def checkpoint_dir(self) -> Path:
+        return self.logs_dir / "checkpoints"
+
+    def load(self) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        # ログファイルは試合の開始時に `next_sequential_log_path` で確保するので、ここでは設定だけを読む
+        self.logs_dir.mkdir(parents=True, exist_ok=True)
+        return load_yaml(self.config_path), load_yaml(self.prompts_path)
+
+    def _base_client(self, model_alias: str):
+        if model_alias not in self._base_clients:
+            client = create_client_from_model_name(model_alias)
+            timeouts = get_model_config(model_alias).timeouts
+            if self.adaptive_timeouts or timeouts.adaptive:
+                window = LatencyWindow()
+                window.extend(self._latency_samples(model_alias))
+                client = DeadlineClient(model_alias, client, timeouts, window=window)
+            self._base_clients[model_alias] = client
+        return self._base_clients[model_alias]
+
+    def client_for(self, model_alias: str):
+        if model_alias not in self._clients:
+            client = self._base_client(model_alias)
+            replicas = get_model_config(model_alias).replicas if self.hedge_policy is not None else []
+            if replicas:
+                client = self._hedged(model_alias, client, replicas)
+            self._clients[model_alias] = client
+        return self._clients[model_alias]
+
+    def _hedged(self, model_alias: str, client: Any, replicas: Sequence[str]) -> HedgedClient:
+        policy = self.hedge_policy or HedgePolicy()
+        window = LatencyWindow(policy.window)
+        window.extend(self._latency_samples(model_alias))
+        return HedgedClient(
+            model_alias,
+            client,
+            [(replica, self._base_client(replica)) for replica in replicas],
+            policy=policy,
+            window=window,
+            stats=self.hedge_report.stats_for(model_alias),
+            on_hedge=lambda alias, won, saved: self.telemetry.observe_hedge(alias, won=won, saved_seconds=saved),
+        )
+
+    def _latency_samples(self, model_alias: str) -> List[float]:
+        # 過去ログの読み込みは全モデル分を1度だけ行い、モデル・エンドポイントごとに切り出す
+        if self._latency_history is None:
+            limit = max(DEFAULT_WINDOW, self.hedge_policy.window if self.hedge_policy is not None else 0)
+            self._latency_history = load_latency_history(self.logs_dir, limit=limit)
+        return latency_samples(self._latency_history, model_alias, self.telemetry.endpoint_for(model_alias))
+
+    def _images_for(self, spec: GameSpec) -> Tuple[List[str], List[Dict[str, Any]]]:
+        if spec.modality != "multimodal":
+            return [], []
+        if spec.image_dir not in self._image_parts:
+            paths = collect_image_paths(self.base_dir / spec.image_dir)
+            parts = [
+                {"type": "image_url", "image_url": {"url": load_image_base64(path)}}
+                for path in paths
+            ]
+            self._image_parts[spec.image_dir] = ([path.name for path in paths], parts)
+        return self._image_parts[spec.image_dir]
+
+    def create_session(
+        self,
+        config: Dict[str, Any],
+        prompts: Dict[str, Any],
+        log_path: Path,
+        run_index: int,
+        *,
+        checkpoints: bool = True,
+        echo: bool = True,
+        seed: int | None = None,
+        job: Dict[str, Any] | None = None,
+    ) -> GameMatchSession:
+        """1試合分のセッションを生成する（ドライランでは checkpoints/echo を切る）。
+
+        `seed` を省略すると config の `seed + run番号` を使う。`job` はチェックポイントに残す
+        ジョブ設定（スイープの再開に使う）。
+        """
+
+        spec = GameSpec.from_config(config)
+        image_names, image_parts = self._images_for(spec)
+        extra_fields: Dict[str, Any] = {}
+        if spec.modality == "multimodal":
+            extra_fields["images"] = image_names
+        if spec.context != "inline":
+            extra_fields["context"] = spec.context
+        if seed is None and config.get("seed") is not None:
+            seed = int(config["seed"]) + run_index
+        return GameMatchSession(
+            config,
+            prompts,
+            log_path,
+            run_index,
+            failure_log_dir=self.logs_dir,
+            phases=spec.phases,
+            extra_fields=extra_fields,
+            checkpoint_dir=self.checkpoint_dir if checkpoints else None,
+            seed=seed,
+            job=job,
+            echo=echo and not self.quiet,
+            context=spec.context,
+            image_parts=image_parts,
+        )
+
+    def resume_session(
+        self, config: Dict[str, Any], prompts: Dict[str, Any], state: Dict[str, Any]
+    ) -> GameMatchSession | None:
+        """チェックポイントを確保して試合を復元する。再開できなければ警告して None を返す。
+
+        他のプロセスが実行中の試合（ロックの持ち主が動いているもの）は再開しない。
+        """
+
+        label = f"{state.get('log_file')} run {state.get('run')}"
+        try:
+            session = self.create_session(config, prompts, self.logs_dir / state["log_file"], state["run"])
+        except (KeyError, ValueError) as exc:
+            print(f"WARNING: {label} は再開できないため飛ばします: {exc}")
+            return None
+        if not session.claim_checkpoint():
+            print(f"WARNING: {label} は別のプロセスが実行中のため飛ばします。")
+            return None
+        try:
+            session.restore(state)
+        except (KeyError, ValueError) as exc:
+            session.release_checkpoint()
+            print(f"WARNING: {label} は再開できないため飛ばします: {exc}")
+            return None
+        return session
+
+    def play_session(self, session: MatchSession, *, max_retries: int = MAX_RETRIES) -> bool:
+        """セッションを現在の位置から最後まで進める。成功ならTrue。
+
+        ターンごとにチェックポイントが保存されるため、失敗・中断した試合は
+        `--resume` で最後に成功したターンの次から再開できる。
+        """
+
+        if self.profile:
+            with profile_match(session.log_path, f"run{session.run_index:04d}"):
+                return self._play_session(session, max_retries=max_retries)
+        return self._play_session(session, max_retries=max_retries)
+
+    def _play_session(self, session: MatchSession, *, max_retries: int) -> bool:
+        session.save_checkpoint()
+        with self.telemetry.span("match", run=session.run_index, log_file=session.log_path.name) as span:
+            while session.active:
+                for turn in session.pending_turns():
+                    if not self._play_turn(session, turn, max_retries=max_retries):
+                        break
+            span.set(status=session.status, turns=session.turn_counter)
+            if session.failed:
+                span.error = "match aborted after exhausting retries"
+        self.telemetry.observe_match(session.status)
+        return session.finished
+
+    def _play_turn(self, session: MatchSession, turn: PendingTurn, *, max_retries: int) -> bool:
+        telemetry = self.telemetry
+        with telemetry.span(
+            "turn",
+            agent=turn.agent_id,
+            model=turn.model_alias,
+            phase=turn.phase,
+            round=turn.round_index,
+        ) as span:
+            stats = InvocationStats()
+            with telemetry.in_flight(turn.model_alias):
+                parsed, content, error = invoke_with_retries(
+                    self.client_for(turn.model_alias),
+                    turn.messages,
+                    require_vote=turn.require_vote,
+                    max_retries=max_retries,
+                    agent_id=turn.agent_id,
+                    model_alias=turn.model_alias,
+                    stats=stats,
+                    seed=session.seed,
+                )
+            usage = stats.usage or {}
+            telemetry.observe_request(
+                turn.model_alias,
+                seconds=stats.elapsed_seconds,
+                attempts=stats.attempts,
+                ok=parsed is not None,
+                timeouts=stats.timeouts,
+                input_tokens=usage.get("input_tokens"),
+                output_tokens=usage.get("output_tokens"),
+            )
+            span.set(
+                attempts=stats.attempts,
+                input_tokens=usage.get("input_tokens"),
+                output_tokens=usage.get("output_tokens"),
+            )
+            metrics = stats.as_record()
+            metrics["endpoint"] = telemetry.endpoint_for(stats.served_by or turn.model_alias)
+            if parsed is None:
+                span.error = str(error)
+                session.record_failure(turn, content, error, metrics=metrics)
+                return False
+            session.record_success(turn, parsed, content, metrics=metrics)
+            return True
+
+    def run(
+        self,
+        config: Dict[str, Any],
+        prompts: Dict[str, Any],
+        log_path: Path,
+        run_index: int,
+        *,
+        checkpoints: bool = True,
+        seed: int | None = None,
+        job: Dict[str, Any] | None = None,
+    ) -> bool:
+        """1試合分の進行を実行する。成功ならTrue。"""
+
+        spec = GameSpec.from_config(config)
+        session = self.create_session(
+            config, prompts, log_path, run_index, checkpoints=checkpoints, seed=seed, job=job
+        )
+        return self.play_session(session, max_retries=spec.max_retries)
+
+    def warm_up(self, model_aliases: Iterable[str], *, connect_only: Iterable[str] = ()) -> None:
+        """実行で使うクライアントキャッシュ経由でモデルと接続を事前に温める。"""
+
+        model_aliases = set(model_aliases)
+        if self.hedge_policy is not None:
+            # ヘッジ先も最初のヘッジで接続確立やロードを待たないよう温めておく
+            model_aliases |= {replica for alias in model_aliases for replica in get_model_config(alias).replicas}
+        warm_up_models(model_aliases, self._base_client, log_dir=self.logs_dir, connect_only=connect_only)
+
+    def dry_run(
+        self, config: Dict[str, Any], prompts: Dict[str, Any], *, matches: int, workers: int = 1
+    ) -> None:
+        """LLM を呼ばずに全プロンプトを組み立て、トークン量と所要時間の見積りを表示・保存する。"""
+
+        sampler = ResponseSampler.from_logs_dir(self.logs_dir, seed=config.get("seed"))
+        report = estimate_matches(self, [(config, prompts, matches)], workers=workers, sampler=sampler)
+        print_report(report)
+        path = save_report(report, self.logs_dir)
+        print(f"(saved to {path.name})")
+
+    def main(self, *, description: str, default_matches: int = DEFAULT_TOTAL_MATCHES) -> None:
+        """テンプレートの run.py から呼ばれる CLI エントリ。"""
+
+        options = parse_run_options(description=description, default=default_matches)
+        config, prompts = self.load()
+        if options.context is not None:
+            config["game"] = {**(config.get("game") or {}), "context": options.context}
+        spec = GameSpec.from_config(config)
+
+        agent_models = set(config.get("agents", {}).values())
+        if options.dry_run:
+            workers = resolve_worker_count(options.workers, agent_models, fallback=1)
+            self.dry_run(config, prompts, matches=options.matches, workers=workers)
+            return
+
+        ollama_failures = collect_ollama_connection_errors(agent_models)
+
+        if ollama_failures:
+            print("ERROR: Ollama エンドポイントへの接続確認に失敗しました。")
+            for alias, url, detail in ollama_failures:
+                print(f" - {alias}: base_url={url} -> {detail}")
+            print(
+                "config/models.yaml の base_url が最新のトンネル URL か、"
+                "証明書エラーが発生していないかを確認してください。"
+            )
+            return
+
+        if options.quiet:
+            self.quiet = True
+        if options.resume:
+            sessions = []
+            for state in find_resumable_checkpoints(self.checkpoint_dir, LOG_FILE_BASE):
+                session = self.resume_session(config, prompts, state)
+                if session is not None:
+                    sessions.append(session)
+            if not sessions:
+                print("再開できる試合はありません。")
+                return
+            print(f"=== Resuming {len(sessions)} runs from checkpoints ===")
+        else:
+            log_format = LogFormat(
+                compress=options.log_format == "zstd",
+                rotate_bytes=int(options.rotate_mb * 1024 * 1024) if options.rotate_mb else None,
+                rotate_runs=options.rotate_runs,
+            )
+            log_path = next_sequential_log_path(self.logs_dir, LOG_FILE_BASE, extension=log_format.suffix)
+            configure_log(log_path, log_format)
+            sessions = [
+                self.create_session(config, prompts, log_path, run_index)
+                for run_index in range(1, options.matches + 1)
+            ]
+
+        if options.hedge:
+            self.hedge_policy = HedgePolicy(percentile=options.hedge_percentile)
+        if options.adaptive_timeouts:
+            self.adaptive_timeouts = True
+        if options.warmup and options.batch != "openai":
+            self.warm_up(agent_models)
+
+        self.profile = options.profile
+        telemetry = Telemetry.for_log(self.logs_dir, log_stem(sessions[0].log_path), options.telemetry)
+        if telemetry is not None:
+            self.telemetry = telemetry
+        live = (
+            LiveConsole(self.telemetry, len(sessions), overwrite=self.quiet and sys.stderr.isatty())
+            if options.live
+            else nullcontext()
+        )
+        try:
+            with live:
+                self._run_sessions(sessions, options, spec)
+        finally:
+            self.telemetry.close()
+            if self.hedge_policy is not None:
+                self.hedge_report.print_summary()
+                self.hedge_report.save(self.logs_dir, sessions[0].log_path.name)
+
+    def _run_sessions(self, sessions: List[MatchSession], options: Any, spec: GameSpec) -> None:
+        if options.batch:
+            print(f"=== Starting {len(sessions)} runs in batch mode ===")
+            for session in sessions:
+                session.save_checkpoint()
+            with profile_match(sessions[0].log_path, "batch") if self.profile else nullcontext():
+                outcomes = run_batch_matches(
+                    sessions,
+                    create_batch_executor(options.batch, command=options.batch_command),
+                    self.logs_dir / "batches" / log_stem(sessions[0].log_path),
+                    max_retries=spec.max_retries,
+                    parse_output=parse_agent_output,
+                    telemetry=self.telemetry,
+                )
+            for session, success in zip(sessions, outcomes):
+                if not success:
+                    print(f"=== Run #{session.run_index} failed. ===")
+            return
+
+        for session in sessions:
+            if not self.quiet:
+                print(f"=== Starting run #{session.run_index} (log: {session.log_path.name}) ===")
+            success = self.play_session(session, max_retries=spec.max_retries)
+            if not success:
+                print(f"=== Run #{session.run_index} failed. Moving to next match. ===")
+
+
+__all__ = [
+    "DEFAULT_DISCUSSION_ROUNDS",
+    "MODALITIES",
+    "GameSpec",
+    "GameMatchSession",
+    "GameEngine",
+]
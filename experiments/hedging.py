@@ -0,0 +1,256 @@
+"""同じモデルを提供する別エンドポイントへの重複リクエスト（ヘッジ）でテールレイテンシを抑える。
+
+`config/models.yaml` のモデルに `replicas`（同じモデルを提供する別のモデル名）を書き、
+`run.py --hedge` で有効にする。リクエストがそのモデルの最近の p95 レイテンシを過ぎても
+返らなければレプリカへ同じリクエストを送り、先に成功した方を採用してもう一方は取り消す。
+
+取り消しを実際に接続を閉じる形で行うため、同期の `invoke` も常駐スレッドのイベントループ上で
+`ainvoke` を走らせる。p95 は primary のエンドポイントの直近のレイテンシ（過去ログで初期化。
+レプリカが応答したターンは `served_by` でレプリカ側に数える）から求め、
+サンプルが `min_samples` に満たない間はヘッジしない。
+
+取り消した側の本来の所要時間は分からないため、レプリカが勝った呼び出しのうち `probe_rate` の割合だけ
+primary を取り消さずに最後まで走らせ（結果は捨てる）、実際に短縮できた時間を測る。
+全体の短縮時間はその平均を勝ち数に掛けて見積もる。
+"""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+from experiments.latency import DEFAULT_WINDOW, LatencyWindow, run_on_background_loop
+from experiments.runner import append_jsonl_record
+
+HEDGING_LOG_FILENAME = "hedging.jsonl"
+DEFAULT_PERCENTILE = 95.0
+DEFAULT_MIN_SAMPLES = 20
+DEFAULT_PROBE_RATE = 0.1
+
+
+@dataclass(frozen=True)
+class HedgePolicy:
+    """ヘッジを出す条件。"""
+
+    percentile: float = DEFAULT_PERCENTILE
+    min_samples: int = DEFAULT_MIN_SAMPLES
+    min_delay: float = 0.5
+    window: int = DEFAULT_WINDOW
+    probe_rate: float = DEFAULT_PROBE_RATE
+
+
+@dataclass
+class HedgeStats:
+    """モデル1つ分のヘッジ集計。"""
+
+    requests: int = 0
+    hedged: int = 0
+    hedge_wins: int = 0
+    rescued: int = 0
+    probes: int = 0
+    probe_saved_seconds: float = 0.0
+    delays: List[float] = field(default_factory=list)
+
+    @property
+    def hedge_rate(self) -> float:
+        return self.hedged / self.requests if self.requests else 0.0
+
+    @property
+    def estimated_saved_seconds(self) -> float | None:
+        """計測できた勝ちの平均短縮時間を、primary が失敗していない勝ち全体へ広げた見積り。"""
+
+        if not self.probes:
+            return None
+        return self.probe_saved_seconds / self.probes * (self.hedge_wins - self.rescued)
+
+    def to_record(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "hedged": self.hedged,
+            "hedge_rate": round(self.hedge_rate, 4),
+            "hedge_wins": self.hedge_wins,
+            "rescued": self.rescued,
+            "probes": self.probes,
+            "probe_saved_seconds": round(self.probe_saved_seconds, 3),
+            "estimated_saved_seconds": (
+                None if self.estimated_saved_seconds is None else round(self.estimated_saved_seconds, 3)
+            ),
+            "mean_hedge_delay_seconds": round(sum(self.delays) / len(self.delays), 3) if self.delays else None,
+        }
+
+
+class HedgeReport:
+    """モデル別の HedgeStats をまとめ、表示・保存する。"""
+
+    def __init__(self) -> None:
+        self.models: Dict[str, HedgeStats] = {}
+        self._lock = threading.Lock()
+
+    def stats_for(self, model_alias: str) -> HedgeStats:
+        with self._lock:
+            return self.models.setdefault(model_alias, HedgeStats())
+
+    def print_summary(self) -> None:
+        if not self.models:
+            return
+        print(f"{'model':<28} {'requests':>9} {'hedged':>8} {'rate':>6} {'wins':>6} {'saved':>9}")
+        for alias, stats in self.models.items():
+            saved = stats.estimated_saved_seconds
+            print(
+                f"{alias:<28} {stats.requests:>9} {stats.hedged:>8} {stats.hedge_rate:>6.1%} "
+                f"{stats.hedge_wins:>6} {'-' if saved is None else f'{saved:.1f}s':>9}"
+            )
+
+    def save(self, logs_dir: Path, log_name: str) -> Path:
+        path = logs_dir / HEDGING_LOG_FILENAME
+        append_jsonl_record(
+            path,
+            {
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "log_file": log_name,
+                "models": {alias: stats.to_record() for alias, stats in self.models.items()},
+            },
+        )
+        return path
+
+
+class HedgedClient:
+    """primary を呼び、p95 を過ぎたらレプリカへ同じリクエストを重ねて送るクライアント。
+
+    `invoke` / `ainvoke` だけを持ち、ウォームアップなどのために `chat_model` は primary のものを返す。
+    `on_hedge(model_alias, won, saved_seconds)` はヘッジを出した呼び出しが決着するたびに呼ばれ、
+    `saved_seconds` は計測用に残した primary が終わったときだけ入る。
+    """
+
+    def __init__(
+        self,
+        model_alias: str,
+        primary: Any,
+        replicas: Sequence[Tuple[str, Any]],
+        *,
+        policy: HedgePolicy | None = None,
+        window: LatencyWindow | None = None,
+        stats: HedgeStats | None = None,
+        on_hedge: Callable[[str, bool, float], None] | None = None,
+    ) -> None:
+        if not replicas:
+            raise ValueError(f"{model_alias} にはヘッジ先のレプリカがありません。")
+        self.model_alias = model_alias
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.policy = policy or HedgePolicy()
+        self.window = window if window is not None else LatencyWindow(self.policy.window)
+        self.stats = stats or HedgeStats()
+        self.on_hedge = on_hedge
+        self._next_replica = itertools.cycle(range(len(self.replicas)))
+        self._rng = random.Random()
+
+    @property
+    def chat_model(self) -> Any:
+        return self.primary.chat_model
+
+    def hedge_delay(self) -> float | None:
+        """ヘッジを出すまでの待ち時間（サンプル不足なら None）。"""
+
+        if len(self.window) < self.policy.min_samples:
+            return None
+        quantile = self.window.quantile(self.policy.percentile)
+        return None if quantile is None else max(self.policy.min_delay, quantile)
+
+    def invoke(self, messages: Sequence[Any], **kwargs) -> Any:
+        return run_on_background_loop(self.ainvoke(messages, **kwargs))
+
+    async def ainvoke(self, messages: Sequence[Any], **kwargs) -> Any:
+        self.stats.requests += 1
+        started = time.perf_counter()
+        delay = self.hedge_delay()
+        primary = asyncio.ensure_future(self.primary.ainvoke(messages, **kwargs))
+        if delay is None:
+            result = await primary
+            self.window.add(time.perf_counter() - started)
+            return result
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            result = primary.result()
+            self.window.add(time.perf_counter() - started)
+            return result
+
+        replica_alias, replica = self.replicas[next(self._next_replica)]
+        self.stats.hedged += 1
+        self.stats.delays.append(delay)
+        hedge = asyncio.ensure_future(replica.ainvoke(messages, **kwargs))
+        keep_running: set = set()
+        try:
+            pending = {primary, hedge}
+            error: BaseException | None = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    elapsed = time.perf_counter() - started
+                    if task is primary:
+                        self.window.add(elapsed)
+                        self._report(won=False)
+                    elif primary.done():
+                        self.stats.hedge_wins += 1
+                        self.stats.rescued += 1
+                        self._report(won=True)
+                    else:
+                        self.stats.hedge_wins += 1
+                        if self._rng.random() < self.policy.probe_rate:
+                            keep_running.add(primary)
+                            primary.add_done_callback(lambda task: self._finish_probe(task, started, elapsed))
+                        else:
+                            # 取り消した primary は少なくとも elapsed かかっていた。入れないと遅い側が窓から消え p95 が下がり続ける
+                            self.window.add(elapsed)
+                            self._report(won=True)
+                    result = task.result()
+                    if task is hedge:
+                        _mark_served_by(result, replica_alias)
+                    return result
+            self._report(won=False)
+            assert error is not None
+            raise error
+        finally:
+            for task in (primary, hedge):
+                if not task.done() and task not in keep_running:
+                    task.cancel()
+
+    def _finish_probe(self, task: asyncio.Future, started: float, winner_elapsed: float) -> None:
+        # 計測のために残した primary が終わった時点で、ヘッジで短縮できた時間が確定する
+        saved: float | None = None
+        if not task.cancelled() and task.exception() is None:
+            elapsed = time.perf_counter() - started
+            self.window.add(elapsed)
+            saved = max(0.0, elapsed - winner_elapsed)
+            self.stats.probes += 1
+            self.stats.probe_saved_seconds += saved
+        self._report(won=True, saved=saved)
+
+    def _report(self, *, won: bool, saved: float | None = None) -> None:
+        if self.on_hedge is not None:
+            self.on_hedge(self.model_alias, won, saved)
+
+
+def _mark_served_by(result: Any, model_alias: str) -> None:
+    # レプリカが返したターンのレイテンシを primary の履歴に混ぜないよう、応答したモデルを残す
+    metadata = getattr(result, "response_metadata", None)
+    if isinstance(metadata, dict):
+        metadata["served_by"] = model_alias
+
+
+__all__ = [
+    "HEDGING_LOG_FILENAME",
+    "HedgePolicy",
+    "HedgeStats",
+    "HedgeReport",
+    "HedgedClient",
+]
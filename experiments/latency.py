@@ -0,0 +1,120 @@
+"""モデル・エンドポイント別のレイテンシ窓と、同期呼び出しから ainvoke を使うための常駐ループ。
+
+ヘッジ（`experiments.hedging`）と適応タイムアウト（`experiments.timeouts`）が共有する。
+どちらも負けた・期限切れのリクエストを接続ごと取り消すために、同期の `invoke` からも
+`run_on_background_loop` 経由で `ainvoke` を使う。
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+from collections import defaultdict, deque
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterable, List, Tuple
+
+from experiments.logio import MATCH_LOG_BASES, iter_log_records, list_log_files
+
+DEFAULT_WINDOW = 200
+
+
+def quantile(values: Iterable[float], percentile: float) -> float | None:
+    """最近傍順位法の分位点（値がなければ None）。"""
+
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, round(percentile / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class LatencyWindow:
+    """直近のレイテンシを保持し、分位点を返す。"""
+
+    def __init__(self, size: int = DEFAULT_WINDOW) -> None:
+        self._values: Deque[float] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._values.append(seconds)
+
+    def extend(self, values: Iterable[float]) -> None:
+        with self._lock:
+            self._values.extend(values)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def quantile(self, percentile: float) -> float | None:
+        with self._lock:
+            values = list(self._values)
+        return quantile(values, percentile)
+
+
+class _LoopThread:
+    """同期呼び出しからコルーチンを流すための常駐イベントループ。"""
+
+    _instance: "_LoopThread | None" = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=self.loop.run_forever, name="llm-call-loop", daemon=True)
+        thread.start()
+
+    @classmethod
+    def get(cls) -> "_LoopThread":
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    def run(self, coroutine) -> Any:
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+
+def run_on_background_loop(coroutine) -> Any:
+    """コルーチンを常駐ループで実行し、結果を同期的に返す。
+
+    クライアントの非同期接続プールは最初に使ったループに結びつくため、呼び出しごとに
+    `asyncio.run` で新しいループを作らず、同じループを使い続ける。
+    """
+
+    return _LoopThread.get().run(coroutine)
+
+
+def load_latency_history(logs_dir: Path, *, limit: int = DEFAULT_WINDOW) -> Dict[Tuple[str, str | None], List[float]]:
+    """過去の試合ログから、再試行なしで成功したターンのレイテンシを (モデル名, エンドポイント) 別に集める。
+
+    ヘッジでレプリカが応答したターンは `served_by` のモデルに数える。`endpoint` 列のない古い行は
+    エンドポイントを None として残し、`latency_samples` がどのエンドポイントにも使う。
+    """
+
+    history: Dict[Tuple[str, str | None], Deque[float]] = defaultdict(lambda: deque(maxlen=limit))
+    if not logs_dir.exists():
+        return {}
+    for path in list_log_files(logs_dir, MATCH_LOG_BASES):
+        for row in iter_log_records(path):
+            alias = row.get("served_by") or row.get("model_name")
+            latency = row.get("latency_seconds")
+            if alias and row.get("attempts") == 1 and isinstance(latency, (int, float)):
+                history[(alias, row.get("endpoint"))].append(float(latency))
+    return {key: list(values) for key, values in history.items()}
+
+
+def latency_samples(
+    history: Dict[Tuple[str, str | None], List[float]], model_alias: str, endpoint: str
+) -> List[float]:
+    """`load_latency_history` の結果から、モデル・エンドポイント1組分のサンプルを古い順に返す。"""
+
+    return [*history.get((model_alias, None), []), *history.get((model_alias, endpoint), [])]
+
+
+__all__ = [
+    "DEFAULT_WINDOW",
+    "quantile",
+    "LatencyWindow",
+    "run_on_background_loop",
+    "load_latency_history",
+    "latency_samples",
+]
@@ -0,0 +1,426 @@
+"""自前ホストのエンドポイントに並列数を上げながら負荷をかけ、推奨並列数を決める負荷試験。
+
+テンプレートの試合を LLM を呼ばずに進めて（`experiments.dryrun` と同じ空回し）本物のターンの
+プロンプトを作り、並列数 1, 2, 4, ... の各段で `c` 本の呼び出しを閉ループで送り続ける。
+段ごとにスループット（成功リクエスト/秒・出力トークン/秒）、レイテンシの p50/p90/p99、エラー率を測る。
+
+次のいずれかに当たった最初の段を飽和点とし、その1つ前の段を推奨並列数（knee）とする。
+
+- スループットの伸びが前の段の `--min-gain`（既定 10%）未満
+- p90 レイテンシの伸びがスループットの伸びを上回った（増やしたワーカーの大半がサーバ側の待ち行列に並んでいる）
+- p90 レイテンシが並列数 1 の `--latency-factor` 倍（既定 3 倍）を超えた
+- エラー率が `--max-error-rate`（既定 5%）を超えた
+
+最後の段まで飽和しなければ最大の段を推奨とし、`--max-concurrency` を上げるよう表示する。
+推奨値は `data/loadtest.json` にモデル別に保存され、`experiments.runner --concurrency auto` や
+run.py / sweep の `--workers auto` がそのまま読む。各段の計測値は `data/logs/loadtest.jsonl` に追記する。
+
+```bash
+python -m experiments.loadtest vllm_qwen3-32b --max-concurrency 32
+python -m experiments.loadtest --stub --stub-slots 4     # 同時4件まで処理するスタブで動作確認
+```
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Tuple
+
+import orjson
+
+from experiments.dryrun import ResponseSampler
+from experiments.engine import GameEngine
+from experiments.latency import quantile
+from experiments.runner import (
+    DEFAULT_LOG_DIR,
+    PROJECT_ROOT,
+    WORKER_RECOMMENDATIONS_PATH,
+    append_jsonl_record,
+    load_worker_recommendations,
+)
+from experiments.stub_server import STUB_MODEL, StubServer
+from src.api import LLMClient
+from src.config import create_client_from_model_name, get_model_config
+
+LOADTEST_LOG_FILENAME = "loadtest.jsonl"
+DEFAULT_TEMPLATE_DIR = PROJECT_ROOT / "experiments" / "template_4player"
+DEFAULT_MAX_CONCURRENCY = 32
+DEFAULT_ROUNDS = 4
+MIN_REQUESTS_PER_LEVEL = 16
+DEFAULT_TURNS = 50
+PERCENTILES = (50, 90, 99)
+
+
+@dataclass
+class LevelResult:
+    """並列数1段分の計測値。"""
+
+    concurrency: int
+    requests: int = 0
+    errors: int = 0
+    elapsed_seconds: float = 0.0
+    output_tokens: int = 0
+    latencies: List[float] = field(default_factory=list)
+    error_samples: List[str] = field(default_factory=list)
+
+    @property
+    def succeeded(self) -> int:
+        return self.requests - self.errors
+
+    @property
+    def error_rate(self) -> float:
+        return self.errors / self.requests if self.requests else 0.0
+
+    @property
+    def throughput(self) -> float:
+        """成功リクエスト/秒。"""
+
+        return self.succeeded / self.elapsed_seconds if self.elapsed_seconds > 0 else 0.0
+
+    @property
+    def tokens_per_second(self) -> float:
+        return self.output_tokens / self.elapsed_seconds if self.elapsed_seconds > 0 else 0.0
+
+    def latency(self, percentile: float) -> float | None:
+        return quantile(self.latencies, percentile)
+
+    def to_record(self) -> Dict[str, Any]:
+        return {
+            "concurrency": self.concurrency,
+            "requests": self.requests,
+            "errors": self.errors,
+            "error_rate": round(self.error_rate, 4),
+            "elapsed_seconds": round(self.elapsed_seconds, 4),
+            "requests_per_second": round(self.throughput, 4),
+            "output_tokens_per_second": round(self.tokens_per_second, 2),
+            **{f"latency_p{p}_seconds": _round(self.latency(p)) for p in PERCENTILES},
+            "error_samples": self.error_samples,
+        }
+
+
+@dataclass
+class KneeThresholds:
+    """飽和とみなす条件。"""
+
+    min_gain: float = 0.10
+    latency_factor: float = 3.0
+    max_error_rate: float = 0.05
+
+
+def _round(value: float | None) -> float | None:
+    return None if value is None else round(value, 4)
+
+
+def concurrency_levels(max_concurrency: int) -> List[int]:
+    """1 から倍々に max_concurrency まで（最後は max_concurrency ちょうど）。"""
+
+    levels = []
+    level = 1
+    while level < max_concurrency:
+        levels.append(level)
+        level *= 2
+    levels.append(max_concurrency)
+    return levels
+
+
+def synthetic_turns(template_dir: Path, count: int, *, seed: int | None = 0) -> List[List[Any]]:
+    """テンプレートの試合を空回しし、実際に送られるターンのメッセージ列を count 件集める。
+
+    応答には過去ログからサンプルしたもの（無ければプレースホルダ）を差し込むので、
+    履歴の伸び方は本番の試合と同じになる。
+    """
+
+    engine = GameEngine(template_dir, quiet=True)
+    config, prompts = engine.load()
+    sampler = ResponseSampler.from_logs_dir(engine.logs_dir, seed=seed)
+    turns: List[List[Any]] = []
+    run_index = 0
+    while len(turns) < count:
+        run_index += 1
+        session = engine.create_session(config, prompts, Path(os.devnull), run_index, checkpoints=False, echo=False)
+        while session.active and len(turns) < count:
+            for turn in session.pending_turns():
+                turns.append(turn.messages)
+                parsed, content = sampler.sample(turn.model_alias, turn.phase, session.player_order)
+                session.record_success(turn, parsed, content)
+    return turns
+
+
+async def run_level(client: Any, turns: Sequence[List[Any]], concurrency: int, requests: int) -> LevelResult:
+    """`concurrency` 本のワーカーで合計 `requests` 件を送る（1件終わるたびに次を送る閉ループ）。"""
+
+    result = LevelResult(concurrency)
+    issued = 0
+
+    async def worker() -> None:
+        nonlocal issued
+        while issued < requests:
+            messages = turns[issued % len(turns)]
+            issued += 1
+            started = time.perf_counter()
+            try:
+                response = await client.ainvoke(messages)
+            except Exception as exc:
+                result.requests += 1
+                result.errors += 1
+                if len(result.error_samples) < 5:
+                    result.error_samples.append(f"{type(exc).__name__}: {exc}")
+                continue
+            result.requests += 1
+            result.latencies.append(time.perf_counter() - started)
+            usage = getattr(response, "usage_metadata", None) or {}
+            result.output_tokens += usage.get("output_tokens") or 0
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result.elapsed_seconds = time.perf_counter() - started
+    return result
+
+
+def saturation_reason(
+    level: LevelResult, previous: LevelResult, baseline: LevelResult, thresholds: KneeThresholds
+) -> str | None:
+    """level が飽和していればその理由、まだ伸びていれば None。"""
+
+    if level.error_rate > thresholds.max_error_rate:
+        return f"error rate {level.error_rate:.0%}"
+    if level.throughput < previous.throughput * (1 + thresholds.min_gain):
+        return f"throughput gain below {thresholds.min_gain:.0%}"
+    base_p90, previous_p90, p90 = baseline.latency(90), previous.latency(90), level.latency(90)
+    # 並列数 = スループット × レイテンシ なので、レイテンシの方が伸びたら増分の半分以上は待ち時間
+    if previous_p90 and p90 is not None and p90 / previous_p90 > level.throughput / previous.throughput:
+        return "p90 latency grew faster than throughput"
+    if base_p90 is not None and p90 is not None and p90 > base_p90 * thresholds.latency_factor:
+        return f"p90 latency above {thresholds.latency_factor:g}x of concurrency 1"
+    return None
+
+
+def find_knee(
+    levels: Sequence[LevelResult], thresholds: KneeThresholds
+) -> Tuple[LevelResult | None, LevelResult | None, str | None]:
+    """(推奨する段, 飽和した段, 理由) を返す。飽和しなければ最後の段を推奨し、飽和した段は None。
+
+    並列数 1 から既にエラー率が上限を超えていれば推奨する段も None。
+    """
+
+    if not levels:
+        return None, None, None
+    baseline = levels[0]
+    if baseline.error_rate > thresholds.max_error_rate:
+        return None, baseline, f"error rate {baseline.error_rate:.0%}"
+    for previous, level in zip(levels, levels[1:]):
+        reason = saturation_reason(level, previous, baseline, thresholds)
+        if reason is not None:
+            return previous, level, reason
+    return levels[-1], None, None
+
+
+async def run_load_test(
+    client: Any,
+    turns: Sequence[List[Any]],
+    levels: Sequence[int],
+    *,
+    rounds: int = DEFAULT_ROUNDS,
+    thresholds: KneeThresholds | None = None,
+    stop_at_knee: bool = True,
+) -> List[LevelResult]:
+    """各段を順に計測する。`stop_at_knee` なら飽和した段で打ち切る。"""
+
+    thresholds = thresholds or KneeThresholds()
+    results: List[LevelResult] = []
+    for concurrency in levels:
+        # 低い段はリクエスト数が少なく基準がぶれるため、下限を設ける
+        requests = max(concurrency * rounds, MIN_REQUESTS_PER_LEVEL)
+        result = await run_level(client, turns, concurrency, requests)
+        results.append(result)
+        print(
+            f"[loadtest] c={concurrency}: {result.throughput:.2f} req/s, "
+            f"p90 {_fmt(result.latency(90), '.2f')}s, errors {result.errors}/{result.requests}",
+            file=sys.stderr,
+        )
+        if stop_at_knee and find_knee(results, thresholds)[1] is not None:
+            break
+    return results
+
+
+def save_recommendation(model_alias: str, record: Dict[str, Any], path: Path | None = None) -> Path:
+    """推奨値をモデル別に保存する（他のモデルの推奨値は残す）。"""
+
+    path = path or WORKER_RECOMMENDATIONS_PATH
+    recommendations = load_worker_recommendations(path)
+    recommendations[model_alias] = record
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # 読み手が書きかけのファイルを見ないよう、一時ファイルから置き換える
+    temporary = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    temporary.write_bytes(orjson.dumps(recommendations, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS))
+    os.replace(temporary, path)
+    return path
+
+
+def _fmt(value: float | None, spec: str) -> str:
+    return "-" if value is None else format(value, spec)
+
+
+def print_table(levels: Sequence[LevelResult], recommended: LevelResult | None, saturated: LevelResult | None) -> None:
+    print(f"{'conc':>5} {'n':>5} {'err':>5} {'req/s':>8} {'tok/s':>8} {'p50':>7} {'p90':>7} {'p99':>7}")
+    for level in levels:
+        marker = " *" if level is recommended else (" x" if level is saturated else "")
+        print(
+            f"{level.concurrency:>5} {level.requests:>5} {level.errors:>5} {level.throughput:>8.2f} "
+            f"{level.tokens_per_second:>8.1f} {_fmt(level.latency(50), '.2f'):>7} "
+            f"{_fmt(level.latency(90), '.2f'):>7} {_fmt(level.latency(99), '.2f'):>7}{marker}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Find the concurrency knee of a self-hosted endpoint and save a recommended worker count"
+    )
+    parser.add_argument("model", nargs="?", default=None, help="config/models.yaml のモデル名（--stub では省略）")
+    parser.add_argument("--stub", action="store_true", help="内部で起動したスタブサーバに負荷をかける")
+    parser.add_argument("--stub-slots", type=int, default=4, help="スタブが同時に処理するリクエスト数（default: %(default)s）")
+    parser.add_argument(
+        "--template",
+        type=Path,
+        default=DEFAULT_TEMPLATE_DIR,
+        help="ターンのプロンプトを作るテンプレートディレクトリ（default: template_4player）",
+    )
+    parser.add_argument("--turns", type=int, default=DEFAULT_TURNS, help="使い回すターンの数（default: %(default)s）")
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=DEFAULT_MAX_CONCURRENCY,
+        help="試す並列数の上限（1 から倍々に増やす, default: %(default)s）",
+    )
+    parser.add_argument(
+        "--rounds",
+        type=int,
+        default=DEFAULT_ROUNDS,
+        help=f"各段でワーカー1本あたりに送るリクエスト数（段ごとに最低 {MIN_REQUESTS_PER_LEVEL} 件, default: %(default)s）",
+    )
+    parser.add_argument("--min-gain", type=float, default=0.10, help="飽和とみなすスループットの伸び（default: %(default)s）")
+    parser.add_argument(
+        "--latency-factor",
+        type=float,
+        default=3.0,
+        help="飽和とみなす p90 レイテンシの並列数 1 に対する倍率（default: %(default)s）",
+    )
+    parser.add_argument("--max-error-rate", type=float, default=0.05, help="許容するエラー率（default: %(default)s）")
+    parser.add_argument("--full", action="store_true", help="飽和した後も --max-concurrency まで計測する")
+    parser.add_argument("--no-warmup", dest="warmup", action="store_false", help="計測しない初回呼び出しを省く")
+    parser.add_argument("--no-save", dest="save", action="store_false", help="推奨値を保存しない")
+    parser.add_argument(
+        "--recommendations",
+        type=Path,
+        default=None,
+        help=f"推奨値の保存先（既定: {WORKER_RECOMMENDATIONS_PATH.relative_to(PROJECT_ROOT)}）",
+    )
+    parser.add_argument(
+        "--results",
+        type=Path,
+        default=None,
+        help=f"各段の計測値を追記する JSONL（既定: {DEFAULT_LOG_DIR.relative_to(PROJECT_ROOT)}/{LOADTEST_LOG_FILENAME}）",
+    )
+    parser.add_argument("--json", action="store_true", help="表の代わりに結果を JSON で標準出力へ書く")
+    args = parser.parse_args()
+    if args.stub == (args.model is not None):
+        parser.error("give either a model name or --stub")
+    for name in ("stub_slots", "turns", "max_concurrency", "rounds"):
+        if getattr(args, name) < 1:
+            parser.error(f"--{name.replace('_', '-')} must be >= 1")
+    thresholds = KneeThresholds(args.min_gain, args.latency_factor, args.max_error_rate)
+
+    turns = synthetic_turns(args.template, args.turns)
+    with StubServer(slots=args.stub_slots) if args.stub else nullcontext() as stub:
+        if stub is not None:
+            alias, endpoint = STUB_MODEL, stub.base_url
+            client = LLMClient.from_openai_settings(model=STUB_MODEL, base_url=endpoint, api_key="stub")
+        else:
+            alias, endpoint = args.model, get_model_config(args.model).base_url or ""
+            client = create_client_from_model_name(args.model)
+        print(f"[loadtest] {alias} ({endpoint}): {len(turns)} turns from {args.template.name}", file=sys.stderr)
+
+        async def measure() -> List[LevelResult]:
+            if args.warmup:
+                await run_level(client, turns, 1, 1)
+            return await run_load_test(
+                client,
+                turns,
+                concurrency_levels(args.max_concurrency),
+                rounds=args.rounds,
+                thresholds=thresholds,
+                stop_at_knee=not args.full,
+            )
+
+        levels = asyncio.run(measure())
+
+    recommended, saturated, reason = find_knee(levels, thresholds)
+    record = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "model": alias,
+        "endpoint": endpoint,
+        "template": args.template.name,
+        "recommended_workers": None if recommended is None else recommended.concurrency,
+        "saturated_at": None if saturated is None else saturated.concurrency,
+        "reason": reason,
+        "levels": [level.to_record() for level in levels],
+    }
+    append_jsonl_record(args.results or DEFAULT_LOG_DIR / LOADTEST_LOG_FILENAME, record)
+    if args.json:
+        print(orjson.dumps(record, option=orjson.OPT_INDENT_2).decode("utf-8"))
+    else:
+        print_table(levels, recommended, saturated)
+
+    if recommended is None:
+        print(f"並列数 1 でもエラー率が上限を超えました（{reason}）。推奨値は保存しません。", file=sys.stderr)
+        raise SystemExit(1)
+    if saturated is None:
+        print(
+            f"並列数 {recommended.concurrency} まで飽和しませんでした。--max-concurrency を上げて再計測できます。",
+            file=sys.stderr,
+        )
+    else:
+        print(
+            f"並列数 {saturated.concurrency} で飽和（{reason}）。推奨並列数: {recommended.concurrency}",
+            file=sys.stderr,
+        )
+    if args.save:
+        path = save_recommendation(
+            alias,
+            {
+                "workers": recommended.concurrency,
+                "saturated": saturated is not None,
+                "requests_per_second": round(recommended.throughput, 4),
+                "latency_p90_seconds": _round(recommended.latency(90)),
+                "endpoint": endpoint,
+                "timestamp": record["timestamp"],
+            },
+            args.recommendations,
+        )
+        print(f"(saved to {path})", file=sys.stderr)
+
+
+__all__ = [
+    "LOADTEST_LOG_FILENAME",
+    "LevelResult",
+    "KneeThresholds",
+    "concurrency_levels",
+    "synthetic_turns",
+    "run_level",
+    "saturation_reason",
+    "find_knee",
+    "run_load_test",
+    "save_recommendation",
+    "print_table",
+]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,479 @@
+"""試合ログ（JSONL / zstd 圧縮 JSONL）の書き込みと読み出し。
+
+圧縮ログ（`*.jsonl.zst`）は run ごとに独立した zstd フレームとして追記する。
+同じ run の行は試合が終わるまで（または `frame_bytes` を超えるまで）メモリに溜めて
+1フレームにまとめるため、プロンプトや履歴の繰り返しがフレーム内でよく圧縮される。
+チェックポイントを書く試合は、まだ書き出していない行を `pending_lines` でチェックポイントにも
+保存し、再開時に `restore_pending_lines` でバッファへ戻す（強制終了しても 1 試合 1 フレームのまま失わない）。
+各フレームの位置は `<ログ>.idx`（1行1フレームの JSON: offset / length / run / records）
+に記録し、特定の run だけを伸長して読める。フレームは連結しても正しい zstd ストリームなので、
+インデックスが無くても `zstd -dc` や先頭からのストリーミング読み出しはできる。
+
+`rotate_bytes` / `rotate_runs` を指定すると、試合の切れ目で
+`logfile_001.p002.jsonl.zst` のような続きのセグメントへ切り替える。
+読み出し関数は論理ログ（先頭セグメントのパス）を受け取り、全セグメントを順に読む。
+平文の `*.jsonl` も同じ関数で読める。
+"""
+from __future__ import annotations
+
+import atexit
+import io
+import re
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Tuple
+
+import orjson
+
+from experiments.profiling import timed
+
+PLAIN_SUFFIX = ".jsonl"
+ZSTD_SUFFIX = ".jsonl.zst"
+INDEX_SUFFIX = ".idx"
+LOG_FORMATS = ("jsonl", "zstd")
+DEFAULT_COMPRESSION_LEVEL = 6
+DEFAULT_FRAME_BYTES = 4 * 1024 * 1024
+MATCH_LOG_BASES = ("logfile", "sweep")
+
+_LOG_NAME = re.compile(r"^(?P<stem>.+?)(?:\.p(?P<segment>\d{3}))?(?P<suffix>\.jsonl(?:\.zst)?)$")
+
+
+class EncodedRecord(NamedTuple):
+    """JSON へ変換済みの1レコード（`experiments.records.encode_record` が作る）。"""
+
+    run: Any
+    data: bytes
+
+
+def _encode(record: Dict[str, Any] | EncodedRecord) -> Tuple[Any, bytes]:
+    if isinstance(record, EncodedRecord):
+        return record.run, record.data + b"\n"
+    return record.get("run"), orjson.dumps(record) + b"\n"
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError as exc:  # pragma: no cover - requirements.txt に含まれている
+        raise RuntimeError("圧縮ログの読み書きには zstandard パッケージが必要です。") from exc
+    return zstandard
+
+
+@dataclass(frozen=True)
+class LogFormat:
+    """ログの書き込み形式。"""
+
+    compress: bool = False
+    level: int = DEFAULT_COMPRESSION_LEVEL
+    frame_bytes: int = DEFAULT_FRAME_BYTES
+    rotate_bytes: int | None = None
+    rotate_runs: int | None = None
+
+    @property
+    def suffix(self) -> str:
+        return ZSTD_SUFFIX if self.compress else PLAIN_SUFFIX
+
+
+def is_compressed(path: Path) -> bool:
+    return path.name.endswith(".zst")
+
+
+def _split_name(path: Path) -> Tuple[str, int, str]:
+    match = _LOG_NAME.match(path.name)
+    if match is None:
+        return path.name, 1, ""
+    return match["stem"], int(match["segment"] or 1), match["suffix"]
+
+
+def log_stem(path: Path) -> str:
+    """拡張子とセグメント番号を除いたログ名（`logfile_001.p002.jsonl.zst` → `logfile_001`）。"""
+
+    return _split_name(path)[0]
+
+
+def is_segment(path: Path) -> bool:
+    """2番目以降のセグメント（`.pNNN`）なら True。"""
+
+    return _split_name(path)[1] > 1
+
+
+def segment_path(path: Path, index: int) -> Path:
+    stem, _, suffix = _split_name(path)
+    if index <= 1:
+        return path.with_name(f"{stem}{suffix}")
+    return path.with_name(f"{stem}.p{index:03d}{suffix}")
+
+
+def index_path(path: Path) -> Path:
+    return path.with_name(path.name + INDEX_SUFFIX)
+
+
+def log_segments(path: Path) -> List[Path]:
+    """論理ログを構成する既存セグメントを順番に返す。"""
+
+    stem, _, suffix = _split_name(path)
+    first = segment_path(path, 1)
+    others = sorted(path.parent.glob(f"{stem}.p[0-9][0-9][0-9]{suffix}"))
+    return ([first] if first.exists() else []) + others
+
+
+def list_log_files(directory: Path, bases: Iterable[str] | None = None) -> List[Path]:
+    """ディレクトリ内の論理ログ（平文・圧縮、セグメントを除く）を返す。
+
+    `bases` を指定すると `<base>_NNN` という名前の試合ログだけに絞る。
+    """
+
+    pattern = None
+    if bases is not None:
+        pattern = re.compile(rf"^(?:{'|'.join(re.escape(base) for base in bases)})_\d+$")
+    files = []
+    for path in sorted(directory.glob("*.jsonl*")):
+        stem, segment, suffix = _split_name(path)
+        if not suffix or segment > 1:
+            continue
+        if pattern is not None and not pattern.match(stem):
+            continue
+        files.append(path)
+    return files
+
+
+# --- 書き込み -------------------------------------------------------------------
+
+
+class CompressedLogWriter:
+    """run ごとにバッファして zstd フレーム単位で追記する書き込み器。"""
+
+    def __init__(self, path: Path, log_format: LogFormat) -> None:
+        self.path = segment_path(path, 1)
+        self.format = log_format
+        self._compressor = _zstd().ZstdCompressor(level=log_format.level, write_checksum=True)
+        self._lock = threading.Lock()
+        self._buffers: Dict[Any, List[bytes]] = {}
+        self._buffer_bytes: Dict[Any, int] = {}
+        # フレームを書いたがまだ終わっていない run（セグメントの切り替えを待たせる）
+        self._open_runs: set = set()
+        # 終わっていない run ごとに書いたフレーム数（チェックポイントのバッファが書き出し済みかの判定に使う）
+        self._frames: Dict[Any, int] = {}
+        segments = log_segments(self.path)
+        self._segment = _split_name(segments[-1])[1] if segments else 1
+        self._runs_in_segment = len(
+            {entry.get("run") for entry in _read_index(segment_path(self.path, self._segment))}
+        )
+
+    @property
+    def current_segment(self) -> Path:
+        return segment_path(self.path, self._segment)
+
+    def append(self, record: Dict[str, Any] | EncodedRecord) -> None:
+        run, line = _encode(record)
+        with self._lock:
+            self._buffers.setdefault(run, []).append(line)
+            self._buffer_bytes[run] = self._buffer_bytes.get(run, 0) + len(line)
+            if run is None or self._buffer_bytes[run] >= self.format.frame_bytes:
+                self._write_frame(run)
+
+    def end_run(self, run: Any) -> None:
+        """試合の終了（完走・中断）時に呼ぶ。バッファを書き出し、必要ならセグメントを切り替える。"""
+
+        with self._lock:
+            self._write_frame(run)
+            self._frames.pop(run, None)
+            if run in self._open_runs:
+                self._open_runs.discard(run)
+                self._runs_in_segment += 1
+            self._maybe_rotate()
+
+    def pending(self, run: Any) -> Tuple[List[bytes], int]:
+        """run のまだ書き出していない行と、これまでにこの run で書いたフレーム数を返す。"""
+
+        with self._lock:
+            return list(self._buffers.get(run, ())), self._frames.get(run, 0)
+
+    def restore_pending(self, run: Any, lines: List[bytes], frames: int) -> None:
+        """`pending` で保存した行をバッファへ戻す（チェックポイントからの再開時）。
+
+        保存後にこの run のフレームが書かれていれば、その行はもうファイルにあるので戻さない。
+        """
+
+        with self._lock:
+            written = sum(
+                1 for segment in log_segments(self.path) for entry in _read_index(segment) if entry.get("run") == run
+            )
+            self._frames[run] = written
+            if written:
+                self._open_runs.add(run)
+            if written > frames or not lines:
+                return
+            self._buffers[run] = [*lines, *self._buffers.get(run, [])]
+            self._buffer_bytes[run] = sum(len(line) for line in self._buffers[run])
+
+    def flush(self) -> None:
+        with self._lock:
+            for run in list(self._buffers):
+                self._write_frame(run)
+
+    def _write_frame(self, run: Any) -> None:
+        lines = self._buffers.pop(run, None)
+        self._buffer_bytes.pop(run, None)
+        if not lines:
+            return
+        with timed("log_io"):
+            frame = self._compressor.compress(b"".join(lines))
+            segment = self.current_segment
+            segment.parent.mkdir(parents=True, exist_ok=True)
+            with segment.open("ab") as fh:
+                offset = fh.tell()
+                fh.write(frame)
+            entry = {"offset": offset, "length": len(frame), "run": run, "records": len(lines)}
+            with index_path(segment).open("ab") as fh:
+                fh.write(orjson.dumps(entry) + b"\n")
+        if run is not None:
+            self._open_runs.add(run)
+            self._frames[run] = self._frames.get(run, 0) + 1
+
+    def _maybe_rotate(self) -> None:
+        if self._open_runs or any(self._buffers.values()):
+            return
+        segment = self.current_segment
+        size = segment.stat().st_size if segment.exists() else 0
+        if (self.format.rotate_bytes and size >= self.format.rotate_bytes) or (
+            self.format.rotate_runs and self._runs_in_segment >= self.format.rotate_runs
+        ):
+            self._segment += 1
+            self._runs_in_segment = 0
+
+
+_writers: Dict[Path, CompressedLogWriter] = {}
+_writers_lock = threading.Lock()
+
+
+def configure_log(path: Path, log_format: LogFormat) -> None:
+    """圧縮ログの書き込み設定（レベル・ローテーション）を登録する。"""
+
+    if not log_format.compress:
+        return
+    with _writers_lock:
+        _writers[path] = CompressedLogWriter(path, log_format)
+
+
+def _writer_for(path: Path) -> CompressedLogWriter:
+    with _writers_lock:
+        writer = _writers.get(path)
+        if writer is None:
+            writer = _writers[path] = CompressedLogWriter(path, LogFormat(compress=True))
+        return writer
+
+
+def append_record(path: Path, record: Dict[str, Any] | EncodedRecord) -> None:
+    """拡張子に応じて平文または圧縮ログへ1レコード追記する。"""
+
+    if is_compressed(path):
+        _writer_for(path).append(record)
+        return
+    _, line = _encode(record)
+    with timed("log_io"), path.open("ab") as fh:
+        fh.write(line)
+
+
+def end_run(path: Path, run: Any) -> None:
+    """試合の終了を書き込み器へ伝える（平文ログでは何もしない）。"""
+
+    if is_compressed(path):
+        _writer_for(path).end_run(run)
+
+
+def pending_lines(path: Path, run: Any) -> Tuple[List[bytes], int]:
+    """run のまだ書き出していない行と書いたフレーム数（チェックポイントに保存する。平文ログでは空）。"""
+
+    if not is_compressed(path):
+        return [], 0
+    return _writer_for(path).pending(run)
+
+
+def restore_pending_lines(path: Path, run: Any, lines: List[bytes], frames: int) -> None:
+    """チェックポイントに保存した未書き出しの行を書き込み器のバッファへ戻す。"""
+
+    if is_compressed(path):
+        _writer_for(path).restore_pending(run, lines, frames)
+
+
+def flush_logs() -> None:
+    """バッファ中の圧縮ログをすべて書き出す（終了時にも自動で呼ばれる）。"""
+
+    with _writers_lock:
+        writers = list(_writers.values())
+    for writer in writers:
+        writer.flush()
+
+
+atexit.register(flush_logs)
+
+
+# --- 読み出し -------------------------------------------------------------------
+
+
+def _read_index(segment: Path) -> List[Dict[str, Any]]:
+    path = index_path(segment)
+    if not path.exists():
+        return []
+    entries = []
+    with path.open("rb") as fh:
+        for line in fh:
+            if line.strip():
+                entries.append(orjson.loads(line))
+    return entries
+
+
+def _iter_segment_lines(segment: Path) -> Iterator[bytes]:
+    with segment.open("rb") as fh:
+        if not is_compressed(segment):
+            yield from fh
+            return
+        reader = _zstd().ZstdDecompressor().stream_reader(fh, read_across_frames=True)
+        try:
+            yield from io.BufferedReader(reader)
+        except _zstd().ZstdError as exc:
+            # 書き込み途中で止まったフレームは読み飛ばす
+            print(f"WARNING: {segment.name} の末尾フレームを読めませんでした ({exc})")
+
+
+def _parse_lines(lines: Iterable[bytes]) -> Iterator[Dict[str, Any]]:
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            record = orjson.loads(line)
+        except orjson.JSONDecodeError:
+            continue
+        if isinstance(record, dict):
+            yield record
+
+
+def iter_log_records(path: Path) -> Iterator[Dict[str, Any]]:
+    """論理ログの全セグメントを先頭からストリーミングで読む（壊れた行は読み飛ばす）。"""
+
+    for segment in log_segments(path) or [path]:
+        yield from _parse_lines(_iter_segment_lines(segment))
+
+
+def read_run_records(path: Path, run: int) -> List[Dict[str, Any]]:
+    """指定 run の行だけを返す。圧縮ログはインデックスで該当フレームだけを伸長する。"""
+
+    records: List[Dict[str, Any]] = []
+    decompressor = None
+    for segment in log_segments(path):
+        entries = _read_index(segment) if is_compressed(segment) else []
+        if not entries:
+            records.extend(record for record in _parse_lines(_iter_segment_lines(segment)) if record.get("run") == run)
+            continue
+        decompressor = decompressor or _zstd().ZstdDecompressor()
+        with segment.open("rb") as fh:
+            for entry in entries:
+                if entry.get("run") != run:
+                    continue
+                fh.seek(entry["offset"])
+                data = decompressor.decompress(fh.read(entry["length"]))
+                records.extend(_parse_lines(data.splitlines()))
+    return records
+
+
+def read_appended_lines(path: Path, offset: int) -> Tuple[List[bytes], int]:
+    """1ファイル（セグメント）の offset 以降に追記された完全な行と、次回の開始位置を返す。
+
+    平文は改行で終わる行まで、圧縮ログはインデックスに載っている完全なフレームまでを読む。
+    """
+
+    if not is_compressed(path):
+        with path.open("rb") as fh:
+            fh.seek(offset)
+            data = fh.read()
+        end = data.rfind(b"\n")
+        if end < 0:
+            return [], offset
+        return data[: end + 1].splitlines(), offset + end + 1
+
+    lines: List[bytes] = []
+    next_offset = offset
+    decompressor = _zstd().ZstdDecompressor()
+    with path.open("rb") as fh:
+        for entry in _read_index(path):
+            if entry["offset"] < offset:
+                continue
+            fh.seek(entry["offset"])
+            lines.extend(decompressor.decompress(fh.read(entry["length"])).splitlines())
+            next_offset = entry["offset"] + entry["length"]
+    return lines, next_offset
+
+
+class LogTail:
+    """書き込み中の論理ログを追いかけ、前回の `poll()` 以降に追記された分だけを読む。
+
+    セグメントごとに読み込み済みの位置を覚えておく。途中で小さくなったセグメントがあれば
+    書き直されたとみなして先頭から読み直し、`rewound` を True にする。
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.rewound = False
+        self._offsets: Dict[Path, int] = {}
+
+    def poll(self) -> List[Dict[str, Any]]:
+        self.rewound = False
+        lines: List[bytes] = []
+        for segment in log_segments(self.path):
+            offset = self._offsets.get(segment, 0)
+            if segment.stat().st_size < offset:
+                self.rewound = True
+        if self.rewound:
+            self._offsets.clear()
+        for segment in log_segments(self.path):
+            new_lines, self._offsets[segment] = read_appended_lines(segment, self._offsets.get(segment, 0))
+            lines.extend(new_lines)
+        return list(_parse_lines(lines))
+
+
+def last_run_index(path: Path) -> int | None:
+    """ログ末尾の行の run 番号（圧縮ログはインデックスの最後のフレーム）を返す。"""
+
+    segments = log_segments(path)
+    if not segments:
+        return None
+    last = segments[-1]
+    if is_compressed(last):
+        entries = [entry for entry in _read_index(last) if entry.get("run") is not None]
+        if entries:
+            return int(entries[-1]["run"])
+    last_record = None
+    for record in _parse_lines(_iter_segment_lines(last)):
+        last_record = record
+    if last_record is None or last_record.get("run") is None:
+        return None
+    return int(last_record["run"])
+
+
+__all__ = [
+    "LOG_FORMATS",
+    "PLAIN_SUFFIX",
+    "ZSTD_SUFFIX",
+    "LogFormat",
+    "EncodedRecord",
+    "CompressedLogWriter",
+    "is_compressed",
+    "log_stem",
+    "is_segment",
+    "segment_path",
+    "log_segments",
+    "list_log_files",
+    "configure_log",
+    "append_record",
+    "end_run",
+    "pending_lines",
+    "restore_pending_lines",
+    "flush_logs",
+    "iter_log_records",
+    "read_run_records",
+    "read_appended_lines",
+    "LogTail",
+    "last_run_index",
+]
@@ -0,0 +1,149 @@
+"""プロセスごとの失敗ログのシャードを `failed_responses.jsonl` へ統合する。
+
+試合中の失敗ログは `failed_responses.<ホスト>-<pid>.jsonl` に書かれる（`append_failure_log`）。
+このツールはシャードを時刻順に並べて `failed_responses.jsonl` の末尾に追記し、シャードを消す。
+既存の行は書き換えないため、`experiments.store` の追記分だけの取り込みはそのまま使える。
+
+実行中のプロセスがあってもよい。統合するのは持ち主のプロセスが終了したシャードだけで、
+動いているプロセスのシャードは次回に回す。別ホストのシャードは生死を確かめられないため、
+`--other-hosts` を付けたときだけ統合する。同じディレクトリで同時に統合しないよう
+`failed_responses.jsonl.lock` を排他作成する。
+
+追記の前に、追記を始める位置・長さと対象のシャードを `failed_responses.jsonl.journal` に書く。
+追記後・シャード削除前に中断しても、次回はジャーナルを見て追記済みのシャードを消すだけにし、
+追記の途中で中断した場合は追記前の長さに戻してからやり直すので、同じ行が二重に入らない。
+
+```bash
+python -m experiments.logmerge experiments/template_4player/logs
+```
+"""
+from __future__ import annotations
+
+import argparse
+import os
+from pathlib import Path
+from typing import Any, Dict, List
+
+import orjson
+
+from experiments.runner import (
+    FAILURE_LOG_FILENAME,
+    create_exclusive,
+    list_failure_logs,
+    process_alive,
+    process_tag,
+)
+
+MERGING_SUFFIX = ".merging"
+JOURNAL_SUFFIX = ".journal"
+
+
+def shard_owner(shard: Path) -> str:
+    """シャード名 `failed_responses.<ホスト>-<pid>.jsonl[.merging]` の `<ホスト>-<pid>`。"""
+
+    return shard.name.removesuffix(MERGING_SUFFIX).removesuffix(".jsonl").split(".", 1)[1]
+
+
+def merge_failure_logs(log_dir: Path, *, other_hosts: bool = False) -> Dict[str, int]:
+    """log_dir のシャードを統合し、{"shards": 件数, "records": 行数, "skipped": 見送った件数} を返す。"""
+
+    main_log = log_dir / FAILURE_LOG_FILENAME
+    lock = main_log.with_name(main_log.name + ".lock")
+    journal = main_log.with_name(main_log.name + JOURNAL_SUFFIX)
+    if not create_exclusive(lock, process_tag()):
+        raise RuntimeError(f"{lock} があります。別の統合が実行中か、中断した統合のロックが残っています。")
+    try:
+        _recover(main_log, journal)
+        # 前回中断した統合の残りも拾う
+        pending = sorted(log_dir.glob(f"{main_log.stem}.*.jsonl{MERGING_SUFFIX}"))
+        skipped = 0
+        for shard in list_failure_logs(log_dir):
+            if shard == main_log:
+                continue
+            alive = process_alive(shard_owner(shard))
+            if alive or (alive is None and not other_hosts):
+                # 書き込み中かもしれないシャードは動かさない
+                skipped += 1
+                continue
+            target = shard.with_name(shard.name + MERGING_SUFFIX)
+            shard.rename(target)
+            pending.append(target)
+        lines: List[bytes] = []
+        for path in pending:
+            lines.extend(line.rstrip(b"\n") + b"\n" for line in path.read_bytes().splitlines() if line.strip())
+        if lines:
+            lines.sort(key=lambda line: _timestamp_of(line))
+            data = b"".join(lines)
+            offset = main_log.stat().st_size if main_log.exists() else 0
+            _write_journal(journal, {"offset": offset, "length": len(data), "shards": [path.name for path in pending]})
+            _append(main_log, data)
+        for path in pending:
+            path.unlink()
+        journal.unlink(missing_ok=True)
+        return {"shards": len(pending), "records": len(lines), "skipped": skipped}
+    finally:
+        lock.unlink(missing_ok=True)
+
+
+def _recover(main_log: Path, journal: Path) -> None:
+    # 前回の統合が追記を終えていればシャードを消すだけ、途中なら追記前に戻す（シャードは .merging のまま次で拾う）
+    if not journal.exists():
+        return
+    entry = orjson.loads(journal.read_bytes())
+    size = main_log.stat().st_size if main_log.exists() else 0
+    if size >= entry["offset"] + entry["length"]:
+        for name in entry["shards"]:
+            (main_log.parent / name).unlink(missing_ok=True)
+    elif size > entry["offset"]:
+        os.truncate(main_log, entry["offset"])
+    journal.unlink()
+
+
+def _write_journal(journal: Path, entry: Dict[str, Any]) -> None:
+    tmp_path = journal.with_name(journal.name + ".tmp")
+    with tmp_path.open("wb") as fh:
+        fh.write(orjson.dumps(entry))
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp_path, journal)
+
+
+def _append(main_log: Path, data: bytes) -> None:
+    with main_log.open("ab") as fh:
+        fh.write(data)
+        fh.flush()
+        os.fsync(fh.fileno())
+
+
+def _timestamp_of(line: bytes) -> str:
+    try:
+        return str(orjson.loads(line).get("timestamp") or "")
+    except (orjson.JSONDecodeError, AttributeError):
+        return ""
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Merge per-process failure log shards into failed_responses.jsonl")
+    parser.add_argument("log_dirs", nargs="+", type=Path, help="logs ディレクトリ")
+    parser.add_argument(
+        "--other-hosts",
+        action="store_true",
+        help="別ホストのシャードも統合する（そのホストのプロセスが終わっていることを確かめてから使う）",
+    )
+    args = parser.parse_args()
+    for log_dir in args.log_dirs:
+        result = merge_failure_logs(log_dir, other_hosts=args.other_hosts)
+        print(
+            f"{log_dir}: {result['shards']} shards, {result['records']} records -> {FAILURE_LOG_FILENAME}"
+            f" ({result['skipped']} shards of running or other-host processes skipped)"
+        )
+
+
+__all__ = [
+    "merge_failure_logs",
+    "shard_owner",
+]
+
+
+if __name__ == "__main__":
+    main()
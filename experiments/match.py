@@ -0,0 +1,709 @@
+"""1試合の進行をターン単位で前に進めるステップ型セッション。"""
+from __future__ import annotations
+
+import os
+import random
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Tuple
+
+import orjson
+from langchain_core.messages import AIMessage, BaseMessage, convert_to_messages
+
+from experiments.agent_io import EMPTY_HISTORY_TEXT
+from experiments.logio import end_run, is_compressed, log_stem, pending_lines, restore_pending_lines
+from experiments.profiling import timed
+from experiments.records import (
+    FailureRecord,
+    HistoryEntry,
+    TurnRecord,
+    Vote,
+    VoteSummaryRecord,
+    encode_record,
+    utc_now,
+)
+from experiments.runner import (
+    append_failure_log,
+    append_jsonl_record,
+    create_exclusive,
+    process_alive,
+    process_tag,
+    resolve_player_order,
+)
+
+CHECKPOINT_VERSION = 2
+CHECKPOINT_LOCK_SUFFIX = ".lock"
+PHASE_TYPES = ("discussion", "vote")
+CONTEXT_MODES = ("inline", "thread")
+_MESSAGE_ROLES = {"system": "system", "human": "user", "ai": "assistant"}
+
+
+@dataclass(frozen=True)
+class PhaseSpec:
+    """試合を構成するフェーズ1つ分の定義。
+
+    `name` は prompts.yaml のキーとログの `phase` 列に使われる。`type` が
+    discussion なら全員が順番に `rounds` 回発言し、vote なら確定した履歴を
+    元に全員が一斉に投票して `vote_summary` を残す。`visible_to` を指定した
+    議論フェーズの発言は、発言者と列挙したプレイヤーにだけ見える。
+    """
+
+    name: str
+    type: str
+    rounds: int = 1
+    visible_to: Tuple[str, ...] | None = None
+
+    @classmethod
+    def from_config(cls, raw: Dict[str, Any] | str) -> "PhaseSpec":
+        if isinstance(raw, str):
+            raw = {"name": raw}
+        name = raw.get("name")
+        if not name:
+            raise ValueError(f"phases の各要素には name が必要です: {raw}")
+        phase_type = raw.get("type", name)
+        if phase_type not in PHASE_TYPES:
+            raise ValueError(f"未対応のフェーズ種別です: {phase_type}（{', '.join(PHASE_TYPES)}）")
+        rounds = int(raw.get("rounds", 1))
+        if rounds < 1:
+            raise ValueError(f"フェーズ {name} の rounds は1以上にしてください。")
+        if phase_type == "vote" and rounds != 1:
+            raise ValueError(f"投票フェーズ {name} の rounds は1のみ対応しています。")
+        visible_to = raw.get("visible_to")
+        return cls(
+            name=name,
+            type=phase_type,
+            rounds=rounds,
+            visible_to=tuple(visible_to) if visible_to is not None else None,
+        )
+
+    def to_config(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {"name": self.name, "type": self.type, "rounds": self.rounds}
+        if self.visible_to is not None:
+            data["visible_to"] = list(self.visible_to)
+        return data
+
+
+@dataclass(frozen=True)
+class RoundStep:
+    """フェーズを展開した1ラウンド分（ログの `round` 列と1対1に対応）。"""
+
+    round_index: int
+    phase: PhaseSpec
+
+
+def expand_rounds(phases: Sequence[PhaseSpec]) -> List[RoundStep]:
+    """フェーズ列をラウンド単位の進行表に展開する。"""
+
+    steps: List[RoundStep] = []
+    for phase in phases:
+        for _ in range(phase.rounds):
+            steps.append(RoundStep(round_index=len(steps) + 1, phase=phase))
+    return steps
+
+
+class Transcript:
+    """会話履歴とプレイヤーごとの可視ビューを保持する。
+
+    発言は閲覧可能なプレイヤーの行リストへ追記するだけなので1件あたり
+    O(閲覧者数) で済み、履歴全体を毎ターン組み直す必要がない。
+    文字列化した結果はビューが伸びるまでキャッシュする。
+    各発言は追記時に一度だけ JSON にして持ち、チェックポイントはそれを連結して書く。
+    """
+
+    def __init__(self, players: Sequence[str]) -> None:
+        self.players = list(players)
+        self._encoded: List[orjson.Fragment] = []
+        self._lines: Dict[str, List[str]] = {player: [] for player in self.players}
+        self._rendered: Dict[str, Tuple[int, str]] = {}
+
+    def append(self, entry: HistoryEntry) -> None:
+        self._encoded.append(orjson.Fragment(orjson.dumps(entry)))
+        line = f"{entry.agent}: {entry.speech}"
+        visible_to = entry.visible_to
+        if visible_to is None:
+            viewers: Sequence[str] = self.players
+        else:
+            viewers = [player for player in self.players if player in visible_to or player == entry.agent]
+        for player in viewers:
+            self._lines[player].append(line)
+
+    @property
+    def encoded_entries(self) -> List[orjson.Fragment]:
+        """JSON 化済みの発言（`orjson.dumps` にそのまま渡せる）。"""
+
+        return self._encoded
+
+    @property
+    def entries(self) -> List[HistoryEntry]:
+        return [HistoryEntry.from_dict(orjson.loads(orjson.dumps(fragment))) for fragment in self._encoded]
+
+    def __len__(self) -> int:
+        return len(self._encoded)
+
+    def visible_count(self, viewer: str) -> int:
+        return len(self._lines[viewer])
+
+    def render_since(self, viewer: str, start: int) -> str:
+        """viewer に見える発言のうち start 件目以降だけを文字列化する（無ければ空文字）。"""
+
+        return "\n".join(self._lines[viewer][start:])
+
+    def render(self, viewer: str) -> str:
+        lines = self._lines[viewer]
+        cached = self._rendered.get(viewer)
+        if cached is not None and cached[0] == len(lines):
+            return cached[1]
+        text = "\n".join(lines) if lines else EMPTY_HISTORY_TEXT
+        self._rendered[viewer] = (len(lines), text)
+        return text
+
+    @classmethod
+    def from_entries(cls, players: Sequence[str], entries: Sequence[Dict[str, Any]]) -> "Transcript":
+        transcript = cls(players)
+        for entry in entries:
+            transcript.append(HistoryEntry.from_dict(entry))
+        return transcript
+
+
+class AgentThread:
+    """thread モードで1エージェントが送り続ける追記専用のメッセージ列。
+
+    リクエストは常に前回のリクエストと応答の後ろへ新しい発言を足したものになるため、
+    vLLM のプレフィックスキャッシュや Ollama のコンテキスト再利用がそのまま効く。
+    `cursor` はこのエージェントに見える発言のうち送信済みの件数。
+    メッセージは追記時に JSON 化して持ち、チェックポイントはそれを連結して書く。
+    """
+
+    __slots__ = ("messages", "phase", "cursor", "_encoded")
+
+    def __init__(self) -> None:
+        self.messages: List[BaseMessage] = []
+        self.phase: str | None = None
+        self.cursor = 0
+        self._encoded: List[orjson.Fragment] = []
+
+    def extend(self, messages: Sequence[BaseMessage], *, phase: str, cursor: int) -> None:
+        for message in messages:
+            self.messages.append(message)
+            role = _MESSAGE_ROLES[message.type]
+            self._encoded.append(orjson.Fragment(orjson.dumps({"role": role, "content": message.content})))
+        self.phase = phase
+        self.cursor = cursor
+
+    def to_checkpoint(self) -> Dict[str, Any]:
+        return {"phase": self.phase, "cursor": self.cursor, "messages": self._encoded}
+
+    @classmethod
+    def from_checkpoint(cls, raw: Dict[str, Any]) -> "AgentThread":
+        thread = cls()
+        thread.extend(convert_to_messages(raw["messages"]), phase=raw["phase"], cursor=int(raw["cursor"]))
+        return thread
+
+
+@dataclass(slots=True)
+class PendingTurn:
+    """LLMへ送信する直前の1ターン分のリクエスト。"""
+
+    run_index: int
+    agent_id: str
+    model_alias: str
+    phase: str
+    phase_type: str
+    round_index: int
+    system_prompt: str
+    user_prompt: str
+    messages: List[BaseMessage]
+    visible_history: str
+
+    @property
+    def require_vote(self) -> bool:
+        return self.phase_type == "vote"
+
+
+class MatchSession:
+    """設定されたフェーズ列に従って試合を進め、ログ出力までを受け持つ。
+
+    逐次実行 (`run()`) でもバッチ実行でも同じプロンプト構築・ログ形式を使えるよう、
+    「次に必要なリクエストを返す」「応答を受け取って状態を進める」の2操作に分解している。
+    プロンプトの組み立て方（テキストのみ／画像付きなど）はサブクラスの `render_turn` が決める。
+    `context="thread"` ではエージェントごとの `AgentThread` に差分だけを追記して送り、
+    その組み立ては `render_thread_turn` が決める。
+    `checkpoint_dir` を渡すと、ターンを記録するたびに試合状態を JSON で保存する。
+    `job` にはスイープのジョブ設定など、再開時に設定を組み立て直すための情報を渡す（チェックポイントに残る）。
+    チェックポイントは隣の `.lock` でこのプロセスが確保し、他のプロセスの `--resume` に拾わせない。
+    """
+
+    def __init__(
+        self,
+        config: Dict[str, Any],
+        prompts: Dict[str, Any],
+        log_path: Path,
+        run_index: int,
+        *,
+        failure_log_dir: Path,
+        phases: Sequence[PhaseSpec],
+        extra_fields: Dict[str, Any] | None = None,
+        checkpoint_dir: Path | None = None,
+        seed: int | None = None,
+        job: Dict[str, Any] | None = None,
+        echo: bool = True,
+        context: str = "inline",
+    ) -> None:
+        if context not in CONTEXT_MODES:
+            raise ValueError(f"未対応の context です: {context}（{', '.join(CONTEXT_MODES)}）")
+        self.config_agents: Dict[str, str] = config.get("agents", {})
+        self.prompt_agents: Dict[str, Any] = prompts.get("agents", {})
+        self.player_order = resolve_player_order(self.config_agents, self.prompt_agents)
+        self.log_path = log_path
+        self.run_index = run_index
+        self.failure_log_dir = failure_log_dir
+        self.phases = list(phases)
+        self.steps = expand_rounds(self.phases)
+        if not self.steps:
+            raise ValueError("phases が空です。")
+        self.extra_fields = dict(extra_fields or {})
+        self.checkpoint_dir = checkpoint_dir
+        self.seed = seed
+        self.job = job
+        self.rng = random.Random(seed)
+        self.echo = echo
+        self.context = context
+
+        self.transcript = Transcript(self.player_order)
+        self.threads: Dict[str, AgentThread] = {}
+        self.votes: List[Vote] = []
+        self.turn_counter = 0
+        self.step_index = 0
+        self.agent_position = 0
+        self.failed = False
+        self.finished = False
+        self._checkpoint_claimed = False
+
+    # --- テンプレートが実装するフック -------------------------------------------------
+
+    def render_turn(
+        self, agent_id: str, phase: str, history_text: str
+    ) -> Tuple[str, str, List[BaseMessage]]:
+        """(system_prompt, user_prompt, messages) を返す。"""
+        raise NotImplementedError
+
+    def render_thread_turn(
+        self, agent_id: str, phase: str, new_history: str, previous_phase: str | None
+    ) -> Tuple[str, str, List[BaseMessage]]:
+        """thread モードで (system_prompt, user_prompt, スレッドへ追記するメッセージ) を返す。
+
+        `new_history` は前回の送信以降に見えるようになった発言、`previous_phase` は
+        前回送信したときのフェーズ（初回は None）。
+        """
+        raise NotImplementedError
+
+    # --- 進行 ---------------------------------------------------------------------
+
+    @property
+    def current_step(self) -> RoundStep:
+        return self.steps[self.step_index]
+
+    @property
+    def round_index(self) -> int:
+        return self.current_step.round_index
+
+    @property
+    def history(self) -> List[HistoryEntry]:
+        return self.transcript.entries
+
+    @property
+    def active(self) -> bool:
+        return not (self.finished or self.failed)
+
+    def _build_turn(self, agent_id: str) -> PendingTurn:
+        step = self.current_step
+        with timed("render"):
+            history_text = self.transcript.render(agent_id)
+            if self.context == "thread":
+                thread = self.threads.get(agent_id) or AgentThread()
+                system_prompt, user_prompt, new_messages = self.render_thread_turn(
+                    agent_id,
+                    step.phase.name,
+                    self.transcript.render_since(agent_id, thread.cursor),
+                    thread.phase,
+                )
+                messages = [*thread.messages, *new_messages]
+            else:
+                system_prompt, user_prompt, messages = self.render_turn(agent_id, step.phase.name, history_text)
+        return PendingTurn(
+            run_index=self.run_index,
+            agent_id=agent_id,
+            model_alias=self.config_agents[agent_id],
+            phase=step.phase.name,
+            phase_type=step.phase.type,
+            round_index=step.round_index,
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+            messages=messages,
+            visible_history=history_text,
+        )
+
+    def pending_turns(self) -> List[PendingTurn]:
+        """現時点で送信可能なリクエストを返す。
+
+        議論フェーズは直前の発言に依存するため常に1件、投票フェーズは
+        会話履歴が確定しているため未投票の全員分をまとめて返す。
+        """
+
+        if not self.active:
+            return []
+        if self.current_step.phase.type == "discussion":
+            return [self._build_turn(self.player_order[self.agent_position])]
+        return [self._build_turn(agent_id) for agent_id in self.player_order[self.agent_position:]]
+
+    def record_success(
+        self,
+        turn: PendingTurn,
+        parsed: Dict[str, str],
+        content: str | None,
+        *,
+        metrics: Dict[str, Any] | None = None,
+    ) -> None:
+        """パース済み応答を履歴へ反映し、ターンログを書き出す。
+
+        `metrics`（所要時間・試行回数など）はそのままターンログに追加される。
+        """
+
+        expected = self.player_order[self.agent_position]
+        if turn.agent_id != expected or turn.round_index != self.round_index:
+            raise ValueError(
+                f"run {self.run_index}: 想定外のターン順序です "
+                f"(expected={expected}@{self.round_index}, got={turn.agent_id}@{turn.round_index})"
+            )
+
+        phase = self.current_step.phase
+        if phase.type == "discussion":
+            visible_to = list(phase.visible_to) if phase.visible_to is not None else None
+            self.transcript.append(HistoryEntry(turn.agent_id, parsed["thought"], parsed["speech"], visible_to))
+            visible_history = self.transcript.render(turn.agent_id)
+            if self.echo:
+                print(f"{turn.agent_id}: {parsed['speech']}")
+        else:
+            self.votes.append(Vote(turn.agent_id, parsed["vote"]))
+            visible_history = turn.visible_history
+            if self.echo:
+                print(f"{turn.agent_id}: {parsed['speech']} (vote: {parsed['vote']})")
+        if self.context == "thread":
+            self._extend_thread(turn, parsed, content)
+        self.turn_counter += 1
+
+        record = TurnRecord(
+            utc_now(),
+            self.run_index,
+            turn.round_index,
+            turn.phase,
+            self.turn_counter,
+            turn.agent_id,
+            turn.model_alias,
+            parsed["vote"],
+            parsed["thought"],
+            parsed["speech"],
+            turn.system_prompt,
+            turn.user_prompt,
+            content,
+            visible_history,
+        )
+        append_jsonl_record(self.log_path, encode_record(record, self.extra_fields, metrics))
+        self._advance()
+        self.save_checkpoint()
+
+    def record_failure(
+        self,
+        turn: PendingTurn,
+        content: str | None,
+        error: Exception | None,
+        *,
+        metrics: Dict[str, Any] | None = None,
+    ) -> None:
+        """再試行を使い切ったターンを記録し、試合を中断状態にする。"""
+
+        label = "投票" if turn.phase_type == "vote" else "議論"
+        print(f"WARNING: {turn.agent_id} の{label}応答を取得できなかったためこの試合を中断します。")
+        record = FailureRecord(
+            utc_now(),
+            self.run_index,
+            turn.round_index,
+            turn.phase,
+            self.turn_counter + 1,
+            turn.agent_id,
+            turn.model_alias,
+            str(error),
+            content,
+        )
+        append_jsonl_record(self.log_path, encode_record(record, self.extra_fields, metrics))
+        # 共通の失敗ログには再現用にプロンプトも残す
+        prompts = {"system_prompt": turn.system_prompt, "user_prompt": turn.user_prompt}
+        append_failure_log(self.failure_log_dir, encode_record(record, prompts, self.extra_fields, metrics))
+        self.failed = True
+        end_run(self.log_path, self.run_index)
+        self.save_checkpoint()
+
+    def _extend_thread(self, turn: PendingTurn, parsed: Dict[str, str], content: str | None) -> None:
+        # 送信したメッセージと応答をそのまま積み、次回は自分の発言も含めて既読にする
+        thread = self.threads.setdefault(turn.agent_id, AgentThread())
+        reply = content if content is not None else orjson.dumps(parsed).decode("utf-8")
+        thread.extend(
+            [*turn.messages[len(thread.messages):], AIMessage(content=reply)],
+            phase=turn.phase,
+            cursor=self.transcript.visible_count(turn.agent_id),
+        )
+
+    def _advance(self) -> None:
+        self.agent_position += 1
+        if self.agent_position < len(self.player_order):
+            return
+        self.agent_position = 0
+        if self.current_step.phase.type == "vote":
+            self._write_summary()
+            self.votes = []
+        if self.step_index + 1 >= len(self.steps):
+            self.finished = True
+            end_run(self.log_path, self.run_index)
+            return
+        self.step_index += 1
+
+    def _write_summary(self) -> None:
+        tally: Dict[str, int] = {}
+        for entry in self.votes:
+            tally[entry.vote] = tally.get(entry.vote, 0) + 1
+
+        summary = VoteSummaryRecord(
+            utc_now(),
+            self.run_index,
+            self.round_index,
+            f"{self.current_step.phase.name}_summary",
+            self.votes,
+            tally,
+        )
+        append_jsonl_record(self.log_path, encode_record(summary))
+
+    # --- チェックポイント ------------------------------------------------------------
+
+    @property
+    def checkpoint_path(self) -> Path | None:
+        if self.checkpoint_dir is None:
+            return None
+        return self.checkpoint_dir / f"{log_stem(self.log_path)}_run{self.run_index:04d}.json"
+
+    @property
+    def status(self) -> str:
+        if self.finished:
+            return "finished"
+        if self.failed:
+            return "failed"
+        return "in_progress"
+
+    def to_checkpoint(self) -> Dict[str, Any]:
+        """直近の成功ターンまでの試合状態を辞書化する。"""
+
+        state = {
+            "version": CHECKPOINT_VERSION,
+            "timestamp": utc_now(),
+            "status": self.status,
+            "run": self.run_index,
+            "log_file": self.log_path.name,
+            "agents": self.config_agents,
+            "phases": [phase.to_config() for phase in self.phases],
+            "step_index": self.step_index,
+            "agent_position": self.agent_position,
+            "turn_counter": self.turn_counter,
+            "history": self.transcript.encoded_entries,
+            "votes": self.votes,
+            "seed": self.seed,
+            "rng_state": self.rng.getstate(),
+        }
+        if self.job is not None:
+            state["job"] = self.job
+        if is_compressed(self.log_path):
+            # 圧縮ログは試合の終わりまで行をバッファするため、強制終了で失わないようチェックポイントにも持つ
+            lines, frames = pending_lines(self.log_path, self.run_index)
+            state["log_buffer"] = {"frames": frames, "lines": [orjson.Fragment(line.rstrip(b"\n")) for line in lines]}
+        if self.threads:
+            state["threads"] = {agent: thread.to_checkpoint() for agent, thread in self.threads.items()}
+        return state
+
+    def claim_checkpoint(self) -> bool:
+        """この試合のチェックポイントをこのプロセスのものとして確保する（`claim_checkpoint` を参照）。"""
+
+        path = self.checkpoint_path
+        if path is None or self._checkpoint_claimed:
+            return True
+        self._checkpoint_claimed = claim_checkpoint(path)
+        return self._checkpoint_claimed
+
+    def release_checkpoint(self) -> None:
+        if self.checkpoint_path is not None and self._checkpoint_claimed:
+            release_checkpoint(self.checkpoint_path)
+            self._checkpoint_claimed = False
+
+    def save_checkpoint(self) -> None:
+        """チェックポイントを一時ファイル経由で原子的に書き換える。試合が完了したら削除する。"""
+
+        path = self.checkpoint_path
+        if path is None:
+            return
+        if self.finished:
+            path.unlink(missing_ok=True)
+            self.release_checkpoint()
+            return
+        if not self.claim_checkpoint():
+            raise RuntimeError(f"チェックポイント {path.name} は別のプロセスが使用中です。")
+        with timed("log_io"):
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".tmp")
+            tmp_path.write_bytes(orjson.dumps(self.to_checkpoint()))
+            os.replace(tmp_path, path)
+
+    def restore(self, state: Dict[str, Any]) -> None:
+        """チェックポイントから状態を復元する。失敗した試合は最後の成功ターンから再開する。"""
+
+        if state.get("version") != CHECKPOINT_VERSION:
+            raise ValueError(f"未対応のチェックポイント形式です: version={state.get('version')}")
+        if state.get("agents") != self.config_agents:
+            raise ValueError(
+                f"run {self.run_index}: チェックポイントと現在の config.yaml の agents が一致しません。"
+            )
+        if state.get("phases") != [phase.to_config() for phase in self.phases]:
+            raise ValueError(f"run {self.run_index}: チェックポイントと現在のフェーズ構成が一致しません。")
+
+        self.step_index = int(state["step_index"])
+        self.agent_position = int(state["agent_position"])
+        self.turn_counter = int(state["turn_counter"])
+        self.transcript = Transcript.from_entries(self.player_order, state.get("history", []))
+        self.votes = [Vote.from_dict(vote) for vote in state.get("votes", [])]
+        # inline で保存した試合を thread で再開した場合は、次のターンで履歴全体を送り直す
+        self.threads = {}
+        if self.context == "thread":
+            self.threads = {
+                agent: AgentThread.from_checkpoint(raw) for agent, raw in (state.get("threads") or {}).items()
+            }
+        self.seed = state.get("seed")
+        self.job = state.get("job", self.job)
+        rng_state = state.get("rng_state")
+        if rng_state is not None:
+            version, internal, gauss = rng_state
+            self.rng.setstate((version, tuple(internal), gauss))
+        self.finished = state.get("status") == "finished"
+        self.failed = False
+        log_buffer = state.get("log_buffer")
+        if log_buffer:
+            restore_pending_lines(
+                self.log_path,
+                self.run_index,
+                [orjson.dumps(line) + b"\n" for line in log_buffer.get("lines", [])],
+                int(log_buffer.get("frames", 0)),
+            )
+
+
+def load_checkpoint(path: Path) -> Dict[str, Any]:
+    """チェックポイント JSON を読み込む。"""
+
+    return orjson.loads(path.read_bytes())
+
+
+def checkpoint_lock_path(path: Path) -> Path:
+    return path.with_name(path.name + CHECKPOINT_LOCK_SUFFIX)
+
+
+def claim_checkpoint(path: Path) -> bool:
+    """チェックポイントの `.lock` を排他作成し、持ち主としてこのプロセスを書き込む。
+
+    既に他のプロセスのロックがあり、その持ち主が動いている（または別ホストで確かめられない）
+    場合は False を返す。持ち主が終了していれば中断した試合とみなしてロックを引き継ぐ。
+    """
+
+    lock = checkpoint_lock_path(path)
+    lock.parent.mkdir(parents=True, exist_ok=True)
+    tag = process_tag()
+    for _ in range(2):
+        if create_exclusive(lock, tag):
+            return True
+        try:
+            owner = lock.read_text(encoding="utf-8").strip()
+        except FileNotFoundError:
+            continue
+        if owner == tag:
+            return True
+        if process_alive(owner) is not False:
+            return False
+        # 終了したプロセスのロックを退避する。名前の変更は1プロセスしか成功しない
+        stale = lock.with_name(f"{lock.name}.{tag}")
+        try:
+            os.rename(lock, stale)
+        except FileNotFoundError:
+            continue
+        if stale.read_text(encoding="utf-8").strip() != owner:
+            # 読んでから退避するまでに別のプロセスが確保していたので戻す
+            try:
+                os.link(stale, lock)
+            except FileExistsError:
+                pass
+            finally:
+                stale.unlink(missing_ok=True)
+            return False
+        stale.unlink(missing_ok=True)
+    return False
+
+
+def release_checkpoint(path: Path) -> None:
+    """このプロセスが持つチェックポイントのロックを外す。"""
+
+    lock = checkpoint_lock_path(path)
+    try:
+        owner = lock.read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        return
+    if owner == process_tag():
+        lock.unlink(missing_ok=True)
+
+
+def find_resumable_checkpoints(checkpoint_dir: Path, log_base: str | None = None) -> List[Dict[str, Any]]:
+    """完了していない（失敗・中断した）試合のチェックポイントを列挙する。
+
+    `log_base` を渡すと `<log_base>_NNN` のログのものだけを返し、同じディレクトリにある
+    別の実行（スイープなど）のチェックポイントは拾わない。読めないファイルは警告して飛ばし、
+    完了済みのもの（古い版が残したもの）は削除する。
+    """
+
+    if not checkpoint_dir.exists():
+        return []
+    pattern = re.compile(rf"{re.escape(log_base)}_\d+_run\d+\.json") if log_base else None
+    states = []
+    for path in sorted(checkpoint_dir.glob("*.json")):
+        if pattern is not None and not pattern.fullmatch(path.name):
+            continue
+        try:
+            state = load_checkpoint(path)
+        except (OSError, ValueError) as exc:
+            print(f"WARNING: チェックポイント {path.name} を読めないため飛ばします: {exc}")
+            continue
+        if state.get("status") == "finished":
+            path.unlink(missing_ok=True)
+            checkpoint_lock_path(path).unlink(missing_ok=True)
+            continue
+        states.append(state)
+    return states
+
+
+__all__ = [
+    "CHECKPOINT_VERSION",
+    "PHASE_TYPES",
+    "CONTEXT_MODES",
+    "PhaseSpec",
+    "RoundStep",
+    "expand_rounds",
+    "Transcript",
+    "AgentThread",
+    "PendingTurn",
+    "MatchSession",
+    "load_checkpoint",
+    "claim_checkpoint",
+    "release_checkpoint",
+    "find_resumable_checkpoints",
+]
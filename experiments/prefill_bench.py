@@ -0,0 +1,229 @@
+"""inline / thread の2つのコンテキスト方式でプロンプト処理（prefill）の速さを比べるベンチマーク。
+
+同じテンプレート・同じモデルで試合を方式ごとに交互に実行し、ターンログから
+方式別・ラウンド別に入力トークン数、キャッシュ済みトークン数（OpenAI 互換 API が
+`cached_tokens` を返す場合）、prefill 時間（Ollama の `prompt_eval_duration`）、
+応答までの所要時間を集計する。ログは `logs/prefill_bench/` に、集計は
+`logs/prefill_bench.jsonl` に残す。
+
+```bash
+python -m experiments.prefill_bench experiments/template_4player --matches 3
+python -m experiments.prefill_bench experiments/template_4player --model ollama_gemma3
+```
+"""
+from __future__ import annotations
+
+import argparse
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+from experiments.engine import GameEngine, GameSpec
+from experiments.logio import iter_log_records
+from experiments.match import CONTEXT_MODES
+from experiments.runner import append_jsonl_record
+
+BENCH_LOG_FILENAME = "prefill_bench.jsonl"
+BENCH_LOG_DIRNAME = "prefill_bench"
+
+
+def _mean(values: Sequence[float]) -> float | None:
+    return sum(values) / len(values) if values else None
+
+
+@dataclass
+class ContextStats:
+    """1方式（あるいはその1ラウンド）分のターン集計。"""
+
+    turns: int = 0
+    input_tokens: List[int] = field(default_factory=list)
+    cached_tokens: List[int] = field(default_factory=list)
+    prefill_seconds: List[float] = field(default_factory=list)
+    latency_seconds: List[float] = field(default_factory=list)
+
+    def add(self, row: Dict[str, Any]) -> None:
+        self.turns += 1
+        usage = row.get("usage") or {}
+        if usage.get("input_tokens") is not None:
+            self.input_tokens.append(usage["input_tokens"])
+        cached = (usage.get("input_token_details") or {}).get("cache_read")
+        if cached is not None:
+            self.cached_tokens.append(cached)
+        if row.get("prefill_seconds") is not None:
+            self.prefill_seconds.append(row["prefill_seconds"])
+        if row.get("latency_seconds") is not None:
+            self.latency_seconds.append(row["latency_seconds"])
+
+    def summary(self) -> Dict[str, Any]:
+        input_tokens = _mean(self.input_tokens)
+        cached_tokens = _mean(self.cached_tokens)
+        return {
+            "turns": self.turns,
+            "mean_input_tokens": input_tokens,
+            "mean_cached_tokens": cached_tokens,
+            "cached_share": cached_tokens / input_tokens if cached_tokens is not None and input_tokens else None,
+            "mean_prefill_seconds": _mean(self.prefill_seconds),
+            "mean_latency_seconds": _mean(self.latency_seconds),
+        }
+
+
+@dataclass
+class PrefillReport:
+    """ベンチマーク1回分の結果。"""
+
+    template: str
+    models: List[str]
+    matches: int
+    logs: Dict[str, str]
+    overall: Dict[str, ContextStats]
+    by_round: Dict[str, Dict[int, ContextStats]]
+
+    def to_record(self) -> Dict[str, Any]:
+        return {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "template": self.template,
+            "models": self.models,
+            "matches": self.matches,
+            "logs": self.logs,
+            "contexts": {context: stats.summary() for context, stats in self.overall.items()},
+            "by_round": {
+                context: {str(round_index): stats.summary() for round_index, stats in rounds.items()}
+                for context, rounds in self.by_round.items()
+            },
+        }
+
+
+def summarize_turns(rows: Iterable[Dict[str, Any]]) -> Tuple[ContextStats, Dict[int, ContextStats]]:
+    """ターンログの成功行を全体・ラウンド別に集計する。"""
+
+    overall = ContextStats()
+    by_round: Dict[int, ContextStats] = defaultdict(ContextStats)
+    for row in rows:
+        if "speech" not in row or "agent" not in row:
+            continue
+        overall.add(row)
+        by_round[int(row.get("round", 0))].add(row)
+    return overall, dict(sorted(by_round.items()))
+
+
+def run_benchmark(
+    engine: GameEngine,
+    config: Dict[str, Any],
+    prompts: Dict[str, Any],
+    *,
+    matches: int,
+    contexts: Sequence[str] = CONTEXT_MODES,
+) -> PrefillReport:
+    """方式ごとに `matches` 試合を交互に実行して集計する。"""
+
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    log_dir = engine.logs_dir / BENCH_LOG_DIRNAME
+    log_dir.mkdir(parents=True, exist_ok=True)
+    configs = {context: {**config, "game": {**(config.get("game") or {}), "context": context}} for context in contexts}
+    log_paths = {context: log_dir / f"{stamp}_{context}.jsonl" for context in contexts}
+
+    for run_index in range(1, matches + 1):
+        # 時間帯やサーバの状態による偏りを避けるため、方式を交互に走らせる
+        for context in contexts:
+            cfg = configs[context]
+            session = engine.create_session(cfg, prompts, log_paths[context], run_index, checkpoints=False, echo=False)
+            ok = engine.play_session(session, max_retries=GameSpec.from_config(cfg).max_retries)
+            print(f"[prefill-bench] run {run_index} {context}: {'ok' if ok else 'FAILED'} ({session.turn_counter} turns)")
+
+    overall: Dict[str, ContextStats] = {}
+    by_round: Dict[str, Dict[int, ContextStats]] = {}
+    for context, path in log_paths.items():
+        overall[context], by_round[context] = summarize_turns(iter_log_records(path) if path.exists() else [])
+    return PrefillReport(
+        template=engine.base_dir.name,
+        models=sorted(set(config.get("agents", {}).values())),
+        matches=matches,
+        logs={context: path.name for context, path in log_paths.items()},
+        overall=overall,
+        by_round=by_round,
+    )
+
+
+def _fmt(value: float | None, spec: str) -> str:
+    return "-" if value is None else format(value, spec)
+
+
+def print_report(report: PrefillReport) -> None:
+    """方式別・ラウンド別の集計を表形式で表示する。"""
+
+    print(f"=== Prefill benchmark: {report.template} x {report.matches} matches ({', '.join(report.models)}) ===")
+    header = f"{'context':<8} {'round':>5} {'turns':>6} {'input_tok':>10} {'cached':>8} {'prefill':>9} {'latency':>9}"
+    print(header)
+    for context, stats in report.overall.items():
+        rows = [("all", stats), *report.by_round[context].items()]
+        for label, item in rows:
+            summary = item.summary()
+            print(
+                f"{context:<8} {label:>5} {summary['turns']:>6} "
+                f"{_fmt(summary['mean_input_tokens'], '.0f'):>10} "
+                f"{_fmt(summary['cached_share'], '.0%'):>8} "
+                f"{_fmt(summary['mean_prefill_seconds'], '.3f'):>9} "
+                f"{_fmt(summary['mean_latency_seconds'], '.2f'):>9}"
+            )
+    if not any(stats.prefill_seconds for stats in report.overall.values()):
+        print("NOTE: prefill 時間を返すのは Ollama のみです。他のプロバイダは cached 列と latency 列で比較してください。")
+
+
+def save_report(report: PrefillReport, logs_dir: Path) -> Path:
+    """集計結果を logs/prefill_bench.jsonl に追記する。"""
+
+    path = logs_dir / BENCH_LOG_FILENAME
+    append_jsonl_record(path, report.to_record())
+    return path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare prefill time between inline and thread context modes")
+    parser.add_argument("template_dir", type=Path, help="config.yaml / prompts.yaml を含むテンプレートディレクトリ")
+    parser.add_argument("--matches", type=int, default=2, help="方式ごとの試合数（default: %(default)s）")
+    parser.add_argument("--model", default=None, help="全エージェントをこのモデルに差し替える")
+    parser.add_argument(
+        "--contexts",
+        nargs="+",
+        choices=CONTEXT_MODES,
+        default=list(CONTEXT_MODES),
+        help="比較する方式（default: %(default)s）",
+    )
+    parser.add_argument(
+        "--no-warmup",
+        dest="warmup",
+        action="store_false",
+        help="最初の方式だけがコールドスタートを被らないよう行う事前ロードを省く",
+    )
+    args = parser.parse_args()
+    if args.matches < 1:
+        parser.error("--matches must be >= 1")
+
+    engine = GameEngine(args.template_dir.resolve())
+    config, prompts = engine.load()
+    if args.model:
+        config["agents"] = {agent: args.model for agent in config.get("agents", {})}
+    if args.warmup:
+        engine.warm_up(set(config.get("agents", {}).values()))
+
+    report = run_benchmark(engine, config, prompts, matches=args.matches, contexts=args.contexts)
+    print_report(report)
+    path = save_report(report, engine.logs_dir)
+    print(f"(saved to {path.name})")
+
+
+__all__ = [
+    "BENCH_LOG_FILENAME",
+    "ContextStats",
+    "PrefillReport",
+    "summarize_turns",
+    "run_benchmark",
+    "print_report",
+    "save_report",
+]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""`--profile` 用の試合単位プロファイラ。
+
+1試合（バッチ時は1バッチ実行）ごとに次を記録し、ログファイルの隣に書き出す。
+
+- `<ログ名>_<ラベル>.prof`: cProfile の統計（`python -m pstats` や snakeviz で閲覧）
+- `<ログ名>_<ラベル>.profile.json`: 区分別の所要時間（LLM 待ち・プロンプト組み立て・
+  JSON パース・ログ I/O・その他）、cProfile の上位関数、tracemalloc の確保量上位と最大使用量
+
+区分別の時間は各処理を `timed()` で囲んで集計する。プロファイル中でなければ何もしない。
+"""
+from __future__ import annotations
+
+import contextvars
+import cProfile
+import io
+import pstats
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator
+
+import orjson
+
+TIME_CATEGORIES = ("llm_wait", "render", "parse", "log_io")
+TOP_FUNCTIONS = 25
+TOP_ALLOCATIONS = 25
+
+_active: contextvars.ContextVar[Dict[str, float] | None] = contextvars.ContextVar("profile_breakdown", default=None)
+
+
+@contextmanager
+def timed(category: str) -> Iterator[None]:
+    """プロファイル中なら、ブロックの所要時間を `category` に加算する。"""
+
+    breakdown = _active.get()
+    if breakdown is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        breakdown[category] += time.perf_counter() - started
+
+
+def _top_functions(profiler: cProfile.Profile) -> list:
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    rows = []
+    for (filename, line, func), (_, calls, own, cumulative, _) in stats.stats.items():  # type: ignore[attr-defined]
+        rows.append(
+            {
+                "function": f"{filename}:{line}({func})",
+                "calls": calls,
+                "own_seconds": round(own, 6),
+                "cumulative_seconds": round(cumulative, 6),
+            }
+        )
+    rows.sort(key=lambda row: row["own_seconds"], reverse=True)
+    return rows[:TOP_FUNCTIONS]
+
+
+@contextmanager
+def profile_match(log_path: Path, label: str) -> Iterator[Dict[str, float]]:
+    """ブロック内の CPU プロファイル・メモリ確保・区分別時間を記録して書き出す。"""
+
+    breakdown: Dict[str, float] = defaultdict(float)
+    token = _active.set(breakdown)
+    started_tracemalloc = not tracemalloc.is_tracing()
+    if started_tracemalloc:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    profiler.enable()
+    try:
+        yield breakdown
+    finally:
+        profiler.disable()
+        total = time.perf_counter() - started
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        if started_tracemalloc:
+            tracemalloc.stop()
+        _active.reset(token)
+
+        # `.jsonl` / `.jsonl.zst` どちらでも拡張子を除いたログ名を使う
+        stem = f"{log_path.name.split('.')[0]}_{label}"
+        prof_path = log_path.with_name(f"{stem}.prof")
+        profiler.dump_stats(prof_path)
+        accounted = sum(breakdown[category] for category in TIME_CATEGORIES)
+        report = {
+            "label": label,
+            "log_file": log_path.name,
+            "total_seconds": round(total, 6),
+            "breakdown_seconds": {
+                **{category: round(breakdown[category], 6) for category in TIME_CATEGORIES},
+                "other": round(max(0.0, total - accounted), 6),
+            },
+            "memory": {"current_bytes": current, "peak_bytes": peak},
+            "top_allocations": [
+                {"location": str(stat.traceback), "size_bytes": stat.size, "count": stat.count}
+                for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]
+            ],
+            "top_functions": _top_functions(profiler),
+            "cprofile_file": prof_path.name,
+        }
+        log_path.with_name(f"{stem}.profile.json").write_bytes(
+            orjson.dumps(report, option=orjson.OPT_INDENT_2)
+        )
+        shares = " ".join(
+            f"{name}={seconds:.3f}s" for name, seconds in report["breakdown_seconds"].items()
+        )
+        print(f"[profile] {stem}: total={total:.3f}s {shares} peak_mem={peak / 1024 / 1024:.1f}MiB")
+
+
+__all__ = [
+    "TIME_CATEGORIES",
+    "timed",
+    "profile_match",
+]
@@ -0,0 +1,126 @@
+"""試合ループで扱う履歴・投票・ログレコードの型。
+
+ターンごとに同じキーの辞書を組み立てる代わりにこれらを使い、orjson がそのまま直列化する。
+試合中ずっと保持する履歴・投票は `slots=True` でインスタンスを小さくし、
+作ってすぐ書き出すログ行は orjson の直列化が速い通常の dataclass にしている
+（slots 付きは属性を1つずつ取り出すため2倍ほど遅い）。
+ログ行は `encode_record()` で JSON バイト列にし、テンプレート固有の列や所要時間などの
+追加項目は同じ階層に並べる。
+
+ログの各行には `schema`（`SCHEMA_VERSION`）が入る。列の意味を変えたり削ったりするときは
+番号を上げ、読み出し側（aggregate / store など）はこの値で書式を判別する。
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Mapping
+
+import orjson
+
+from experiments.logio import EncodedRecord
+
+SCHEMA_VERSION = 1
+
+
+def utc_now() -> datetime:
+    # orjson は datetime を isoformat() と同じ文字列で書き出す
+    return datetime.now(timezone.utc)
+
+
+@dataclass(slots=True)
+class HistoryEntry:
+    """会話履歴の1発言。`visible_to` が None なら全員に見える。"""
+
+    agent: str
+    thought: str
+    speech: str
+    visible_to: List[str] | None = None
+
+    @classmethod
+    def from_dict(cls, raw: Mapping[str, Any]) -> "HistoryEntry":
+        return cls(raw["agent"], raw.get("thought", ""), raw["speech"], raw.get("visible_to"))
+
+
+@dataclass(slots=True)
+class Vote:
+    agent: str
+    vote: str
+
+    @classmethod
+    def from_dict(cls, raw: Mapping[str, Any]) -> "Vote":
+        return cls(raw["agent"], raw["vote"])
+
+
+@dataclass
+class TurnRecord:
+    """成功したターン1件分のログ行。"""
+
+    timestamp: datetime
+    run: int
+    round: int
+    phase: str
+    turn_index: int
+    agent: str
+    model_name: str
+    vote: str
+    thought: str
+    speech: str
+    system_prompt: str
+    user_prompt: str
+    raw_response: str | None
+    visible_history: str
+    schema: int = SCHEMA_VERSION
+
+
+@dataclass
+class FailureRecord:
+    """再試行を使い切ったターンのログ行（試合ログと failed_responses.jsonl で共通）。"""
+
+    timestamp: datetime
+    run: int
+    round: int
+    phase: str
+    turn_index: int
+    agent: str
+    model_name: str
+    error: str
+    raw_response: str | None
+    schema: int = SCHEMA_VERSION
+
+
+@dataclass
+class VoteSummaryRecord:
+    """投票フェーズの集計行（`<フェーズ名>_summary`）。"""
+
+    timestamp: datetime
+    run: int
+    round: int
+    phase: str
+    votes: List[Vote]
+    tally: Dict[str, int] = field(default_factory=dict)
+    schema: int = SCHEMA_VERSION
+
+
+def encode_record(record: Any, *extras: Mapping[str, Any] | None) -> EncodedRecord:
+    """record を1行分の JSON にする。extras のキーは同じ階層に並べる。"""
+
+    extras = [extra for extra in extras if extra]
+    if not extras:
+        return EncodedRecord(record.run, orjson.dumps(record))
+    merged = dict(record.__dict__)
+    for extra in extras:
+        merged.update(extra)
+    return EncodedRecord(record.run, orjson.dumps(merged))
+
+
+__all__ = [
+    "SCHEMA_VERSION",
+    "utc_now",
+    "HistoryEntry",
+    "Vote",
+    "TurnRecord",
+    "FailureRecord",
+    "VoteSummaryRecord",
+    "encode_record",
+]
@@ -2,7 +2,12 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
 import base64
+import os
+import re
+import socket
+import time
 from datetime import datetime
 from pathlib import Path
 from typing import Any, Dict, Iterable, List, Sequence, Tuple
@@ -13,12 +18,17 @@ import requests
 from requests import RequestException
 from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
 
-from src.config import create_client_from_model_name, get_model_config
+from experiments.logio import EncodedRecord, append_record, last_run_index, log_stem
+from experiments.profiling import profile_match, timed
+from src.config import create_client_from_model_name, get_model_config, list_model_names
 
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 DEFAULT_LOG_DIR = PROJECT_ROOT / "data" / "logs"
 DEFAULT_LOG_DIR.mkdir(parents=True, exist_ok=True)
 FAILURE_LOG_FILENAME = "failed_responses.jsonl"
+WORKER_RECOMMENDATIONS_PATH = PROJECT_ROOT / "data" / "loadtest.json"
+AUTO_WORKERS = "auto"
+DEFAULT_EXPERIMENT_LOG_NAME = "experiment.jsonl"
 
 
 class Turn(Dict[str, Any]):
@@ -30,14 +40,32 @@ class ExperimentConfig(Dict[str, Any]):
 
 
 class ExperimentRunner:
-    """YAML設定を読み込み、LangChainクライアントでターン制フローを実行する。"""
-
-    def __init__(self, config_path: Path, log_dir: Path | None = None) -> None:
+    """YAML設定を読み込み、LangChainクライアントでターン制フローを実行する。
+
+    `model_name` を渡すと config の `model_name` を上書きし、ログ名にモデル名を付ける。
+    `arun()` は `ainvoke` で同じ流れを実行し、`run_experiments()` から並行に使う。
+    """
+
+    def __init__(
+        self,
+        config_path: Path,
+        log_dir: Path | None = None,
+        *,
+        profile: bool = False,
+        model_name: str | None = None,
+        echo: bool = True,
+    ) -> None:
         self.config_path = config_path
         self.log_dir = log_dir or DEFAULT_LOG_DIR
+        self.profile = profile
+        self.echo = echo
         self.config = self._load_config()
+        self.model_override = model_name
+        if model_name:
+            self.config["model_name"] = model_name
         self.client = self._create_client()
         self.log_dir.mkdir(parents=True, exist_ok=True)
+        self.log_path = self._log_path()
 
     def _load_config(self) -> ExperimentConfig:
         if not self.config_path.exists():
@@ -59,16 +87,21 @@ class ExperimentRunner:
         return entry.get(key, "")
 
     def _log_path(self) -> Path:
-        filename = self.config.get("log_filename")
-        if not filename:
-            filename = f"experiment_{datetime.utcnow():%Y%m%dT%H%M%S}.jsonl"
-        return self.log_dir / filename
+        # 同じ logs/ で同時に動く別の会話・プロセスと重ならないよう、連番のファイルを排他作成して確保する
+        filename = Path(self.config.get("log_filename") or DEFAULT_EXPERIMENT_LOG_NAME)
+        stem = log_stem(filename)
+        base_name = f"{stem}_{self.model_override}" if self.model_override else stem
+        return next_sequential_log_path(self.log_dir, base_name, extension=filename.name[len(stem):])
 
     def _save_log(self, log_path: Path, record: Dict[str, Any]) -> None:
-        with log_path.open("a", encoding="utf-8") as fh:
-            fh.write(orjson.dumps(record).decode("utf-8") + "\n")
+        append_jsonl_record(log_path, record)
+
+    def _conversation(self) -> Tuple[List[BaseMessage], List[Tuple[str, str]], bool]:
+        """初期メッセージと (話者, プロンプト) の列を組み立てる。
+
+        3つ目の値は prompts_file 形式（1往復のみで応答を履歴に積まない）なら True。
+        """
 
-    def run(self) -> None:
         prompts_file = self.config.get("prompts_file")
 
         if prompts_file:
@@ -86,26 +119,7 @@ class ExperimentRunner:
                 raise ValueError("prompts.yaml に system_prompt がありません。")
             if not user_prompt:
                 raise ValueError("prompts.yaml に user_prompt がありません。")
-
-            messages: List[BaseMessage] = [SystemMessage(content=system_prompt), HumanMessage(content=user_prompt)]
-            log_path = self._log_path()
-            response = self.client.invoke(messages)
-            if not isinstance(response, AIMessage):
-                response = AIMessage(content=str(response))
-
-            record = {
-                "timestamp": datetime.utcnow().isoformat(),
-                "turn_index": 1,
-                "speaker": self.config.get("speaker", "User"),
-                "prompt": user_prompt,
-                "response": response.content,
-                "model_name": self.config["model_name"],
-                "log_file": log_path.name,
-            }
-            self._save_log(log_path, record)
-            print(f"[Response] -> {response.content}")
-            print(f"ログを保存しました: {log_path}")
-            return
+            return [SystemMessage(content=system_prompt)], [(self.config.get("speaker", "User"), user_prompt)], True
 
         system_prompt = self._resolve_text(self.config, "system_prompt")
         if not system_prompt:
@@ -115,35 +129,87 @@ class ExperimentRunner:
         if not turns:
             raise ValueError("turns が空です。1つ以上のターンを設定するか prompts_file を指定してください。")
 
-        messages: List[BaseMessage] = [SystemMessage(content=system_prompt)]
-        log_path = self._log_path()
-
+        scripted: List[Tuple[str, str]] = []
         for idx, turn in enumerate(turns, start=1):
-            speaker = turn.get("speaker", "User")
             prompt = self._resolve_text(turn, "prompt")
             if not prompt:
                 raise ValueError(f"turn {idx} に prompt がありません。")
+            scripted.append((turn.get("speaker", "User"), prompt))
+        return [SystemMessage(content=system_prompt)], scripted, False
+
+    def _record_turn(self, log_path: Path, idx: int, speaker: str, prompt: str, response: Any, single_shot: bool) -> None:
+        content = response.content if isinstance(response, AIMessage) else str(response)
+        record = {
+            "timestamp": datetime.utcnow().isoformat(),
+            "turn_index": idx,
+            "speaker": speaker,
+            "prompt": prompt,
+            "response": content,
+            "model_name": self.config["model_name"],
+            "log_file": log_path.name,
+        }
+        self._save_log(log_path, record)
+        if self.echo:
+            print(f"[{'Response' if single_shot else speaker}] -> {content}")
 
+    def run(self) -> None:
+        log_path = self.log_path
+        if not self.profile:
+            self._run(log_path)
+            return
+        with profile_match(log_path, "profile"):
+            self._run(log_path)
+
+    def _run(self, log_path: Path) -> None:
+        messages, scripted, single_shot = self._conversation()
+        for idx, (speaker, prompt) in enumerate(scripted, start=1):
+            messages.append(HumanMessage(content=prompt))
+            with timed("llm_wait"):
+                response = self.client.invoke(messages)
+            messages.append(response if isinstance(response, AIMessage) else AIMessage(content=str(response)))
+            self._record_turn(log_path, idx, speaker, prompt, response, single_shot)
+        if self.echo:
+            print(f"ログを保存しました: {log_path}")
+
+    async def arun(self) -> Path:
+        """`ainvoke` で会話を実行し、ログのパスを返す。"""
+
+        messages, scripted, single_shot = self._conversation()
+        for idx, (speaker, prompt) in enumerate(scripted, start=1):
             messages.append(HumanMessage(content=prompt))
-            response = self.client.invoke(messages)
-            if isinstance(response, AIMessage):
-                messages.append(response)
-            else:
-                messages.append(AIMessage(content=str(response)))
-
-            record = {
-                "timestamp": datetime.utcnow().isoformat(),
-                "turn_index": idx,
-                "speaker": speaker,
-                "prompt": prompt,
-                "response": messages[-1].content,
-                "model_name": self.config["model_name"],
-                "log_file": log_path.name,
-            }
-            self._save_log(log_path, record)
-            print(f"[{speaker}] -> {messages[-1].content}")
-
-        print(f"ログを保存しました: {log_path}")
+            with timed("llm_wait"):
+                response = await self.client.ainvoke(messages)
+            messages.append(response if isinstance(response, AIMessage) else AIMessage(content=str(response)))
+            self._record_turn(self.log_path, idx, speaker, prompt, response, single_shot)
+        if self.echo:
+            print(f"ログを保存しました: {self.log_path}")
+        return self.log_path
+
+
+async def run_experiments(
+    runners: Sequence[ExperimentRunner],
+    *,
+    concurrency: int = 4,
+) -> List[Tuple[ExperimentRunner, BaseException | None]]:
+    """独立した会話を最大 `concurrency` 本ずつ並行に実行し、(runner, 例外 or None) を返す。"""
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _one(runner: ExperimentRunner) -> Tuple[ExperimentRunner, BaseException | None]:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await runner.arun()
+            except Exception as exc:  # 1会話の失敗で他を止めない
+                print(f"FAILED {runner.config_path.name} [{runner.config['model_name']}]: {type(exc).__name__}: {exc}")
+                return runner, exc
+            print(
+                f"done {runner.config_path.name} [{runner.config['model_name']}] "
+                f"in {time.perf_counter() - started:.1f}s -> {runner.log_path}"
+            )
+            return runner, None
+
+    return list(await asyncio.gather(*(_one(runner) for runner in runners)))
 
 
 def load_yaml(path: Path) -> Dict[str, Any]:
@@ -155,24 +221,45 @@ def load_yaml(path: Path) -> Dict[str, Any]:
 def load_next_run_index(log_path: Path) -> int:
     """既存ログを参照し、次に利用する run 番号を決定する。"""
 
-    if not log_path.exists():
+    try:
+        last_run = last_run_index(log_path)
+    except FileNotFoundError:
         return 1
+    return 1 if last_run is None else last_run + 1
 
-    last_entry: str | None = None
-    with log_path.open("r", encoding="utf-8") as fh:
-        for line in fh:
-            stripped = line.strip()
-            if stripped:
-                last_entry = stripped
 
-    if not last_entry:
-        return 1
+def process_tag() -> str:
+    """ホスト名とプロセス ID からなる、ファイル名に使える識別子。"""
+
+    host = re.sub(r"[^0-9A-Za-z-]+", "-", socket.gethostname()) or "host"
+    return f"{host}-{os.getpid()}"
+
+
+def create_exclusive(path: Path, content: str = "") -> bool:
+    """path を新規作成できたら True（既にあれば False）。共有ファイルシステムでも原子的に判定される。"""
 
     try:
-        record = orjson.loads(last_entry)
-        return int(record.get("run", 0)) + 1
-    except Exception:
-        return 1
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, "w", encoding="utf-8") as fh:
+        fh.write(content)
+    return True
+
+
+def process_alive(tag: str) -> bool | None:
+    """`process_tag` が示すプロセスがまだ動いているか。別ホストのものは確かめられないので None。"""
+
+    host, _, pid = tag.strip().rpartition("-")
+    if host != process_tag().rpartition("-")[0] or not pid.isdigit():
+        return None
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
 
 
 def strip_code_fence(raw: str) -> str:
@@ -196,16 +283,19 @@ def setup_experiment_environment(
     log_dir: Path | None = None,
     default_log_name: str = "experiment.jsonl",
 ) -> Tuple[Dict[str, Any], Dict[str, Any], Path, int]:
-    """共通的な設定読込とログ設定の初期化を行う。"""
+    """共通的な設定読込とログ設定の初期化を行う。
+
+    ログは `log_filename` を基にした連番のファイル（`logfile_001.jsonl` など）を排他作成して確保するため、
+    同時に起動した別のプロセスと同じファイルにはならない。
+    """
 
     config = load_yaml(config_path)
     prompts = load_yaml(prompts_path)
 
     target_dir = log_dir or config_path.parent / "logs"
-    target_dir.mkdir(parents=True, exist_ok=True)
-
-    log_name = config.get("log_filename", default_log_name)
-    log_path = target_dir / log_name
+    log_name = Path(config.get("log_filename", default_log_name))
+    stem = log_stem(log_name)
+    log_path = next_sequential_log_path(target_dir, stem, extension=log_name.name[len(stem):])
     run_index = load_next_run_index(log_path)
 
     return config, prompts, log_path, run_index
@@ -259,32 +349,64 @@ def next_sequential_log_path(
     *,
     extension: str = ".jsonl",
 ) -> Path:
-    """directory 内で base_name_001... のような連番ファイルパスを生成する。"""
+    """directory 内で base_name_001... のような連番ファイルパスを確保する。
+
+    番号は平文・圧縮ログ（およびそのセグメント）をまとめて数える。返すファイルは空のまま
+    排他作成しておくため、同じディレクトリで同時に起動した別プロセスとは必ず別の番号になる。
+    """
 
     directory.mkdir(parents=True, exist_ok=True)
 
     indices: list[int] = []
-    pattern = f"{base_name}_*{extension}"
-    for path in directory.glob(pattern):
-        stem_suffix = path.stem.split("_")[-1]
+    for path in directory.glob(f"{base_name}_*.jsonl*"):
+        stem_suffix = path.name.split(".")[0].split("_")[-1]
         if stem_suffix.isdigit():
             indices.append(int(stem_suffix))
 
     next_index = max(indices) + 1 if indices else 1
     candidate = directory / f"{base_name}_{next_index:03d}{extension}"
-    while candidate.exists():
+    while not create_exclusive(candidate):
         next_index += 1
         candidate = directory / f"{base_name}_{next_index:03d}{extension}"
     return candidate
 
 
-def append_failure_log(log_dir: Path, record: Dict[str, Any]) -> None:
-    """失敗した応答を共通ファイルに追記保存する。"""
+def append_jsonl_record(path: Path, record: Dict[str, Any] | EncodedRecord) -> None:
+    """JSONL ファイルへ1レコードを追記する（`.jsonl.zst` なら圧縮ログへ）。"""
+
+    append_record(path, record)
+
+
+def failure_shard_path(log_dir: Path) -> Path:
+    """このプロセスが失敗ログを書くシャード（`failed_responses.<ホスト>-<pid>.jsonl`）。"""
+
+    stem = FAILURE_LOG_FILENAME.removesuffix(".jsonl")
+    return log_dir / f"{stem}.{process_tag()}.jsonl"
+
+
+def list_failure_logs(log_dir: Path) -> List[Path]:
+    """統合済みの失敗ログと未統合のシャードを返す。"""
+
+    stem = FAILURE_LOG_FILENAME.removesuffix(".jsonl")
+    main_log = log_dir / FAILURE_LOG_FILENAME
+    shards = sorted(log_dir.glob(f"{stem}.*.jsonl"))
+    return ([main_log] if main_log.exists() else []) + shards
+
+
+def is_failure_log(path: Path) -> bool:
+    stem = FAILURE_LOG_FILENAME.removesuffix(".jsonl")
+    return path.name == FAILURE_LOG_FILENAME or (path.name.startswith(f"{stem}.") and path.suffix == ".jsonl")
+
+
+def append_failure_log(log_dir: Path, record: Dict[str, Any] | EncodedRecord) -> None:
+    """失敗した応答をこのプロセスのシャードに追記保存する。
+
+    複数のプロセス・マシンが同じ logs/ に書いても行が混ざらないよう、共通ファイルには直接書かない。
+    `python -m experiments.logmerge` で `failed_responses.jsonl` へ統合する。
+    """
 
     log_dir.mkdir(parents=True, exist_ok=True)
-    path = log_dir / FAILURE_LOG_FILENAME
-    with path.open("a", encoding="utf-8") as fh:
-        fh.write(orjson.dumps(record).decode("utf-8") + "\n")
+    append_jsonl_record(failure_shard_path(log_dir), record)
 
 
 def check_ollama_endpoint(
@@ -355,32 +477,101 @@ def resolve_player_order(
     return player_order
 
 
+def load_worker_recommendations(path: Path | None = None) -> Dict[str, Dict[str, Any]]:
+    """`experiments.loadtest` が保存したモデル別の推奨並列数（無ければ空）。"""
+
+    path = path or WORKER_RECOMMENDATIONS_PATH
+    if not path.exists():
+        return {}
+    return orjson.loads(path.read_bytes())
+
+
+def recommended_workers(model_aliases: Iterable[str], path: Path | None = None) -> int | None:
+    """モデル群の推奨並列数。どれか1つでも未計測なら None。
+
+    複数のモデルを同時に使う場合は、最も小さい推奨値に合わせる。
+    """
+
+    recommendations = load_worker_recommendations(path)
+    counts = []
+    for alias in set(model_aliases):
+        entry = recommendations.get(alias)
+        if entry is None:
+            return None
+        counts.append(int(entry["workers"]))
+    return min(counts) if counts else None
+
+
+def worker_count(value: str) -> int | str:
+    """`--workers` / `--concurrency` 用の argparse 型。正の整数か `auto`。"""
+
+    if value == AUTO_WORKERS:
+        return value
+    try:
+        count = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a positive integer or '{AUTO_WORKERS}', got {value!r}") from None
+    if count < 1:
+        raise argparse.ArgumentTypeError("must be >= 1")
+    return count
+
+
+def resolve_worker_count(value: int | str, model_aliases: Iterable[str], *, fallback: int) -> int:
+    """`auto` を負荷試験の推奨値に置き換える（未計測のモデルがあれば fallback）。"""
+
+    if value != AUTO_WORKERS:
+        return int(value)
+    aliases = sorted(set(model_aliases))
+    count = recommended_workers(aliases)
+    if count is None:
+        print(
+            f"WARNING: {', '.join(aliases)} の推奨並列数がありません（python -m experiments.loadtest で計測できます）。"
+            f"{fallback} で実行します。"
+        )
+        return fallback
+    print(f"Using {count} workers recommended by the load test for {', '.join(aliases)}")
+    return count
+
+
 __all__ = [
     "Turn",
     "ExperimentConfig",
     "ExperimentRunner",
+    "run_experiments",
     "load_yaml",
     "load_next_run_index",
+    "process_tag",
+    "create_exclusive",
+    "process_alive",
     "strip_code_fence",
     "setup_experiment_environment",
     "load_image_base64",
     "collect_image_paths",
     "create_human_message_with_images",
     "next_sequential_log_path",
+    "append_jsonl_record",
+    "failure_shard_path",
+    "list_failure_logs",
+    "is_failure_log",
     "append_failure_log",
     "check_ollama_endpoint",
     "collect_ollama_connection_errors",
     "resolve_player_order",
+    "load_worker_recommendations",
+    "recommended_workers",
+    "worker_count",
+    "resolve_worker_count",
     "parse_total_matches",
+    "parse_run_options",
 ]
 
 
-def parse_total_matches(
+def build_run_argument_parser(
     *,
     description: str,
     default: int,
-) -> int:
-    """共通の --matches CLI 引数を解析し、試合数を返す。"""
+) -> argparse.ArgumentParser:
+    """テンプレートの run.py が共通で受け付ける CLI 引数を定義する。"""
 
     parser = argparse.ArgumentParser(description=description)
     parser.add_argument(
@@ -389,7 +580,211 @@ def parse_total_matches(
         default=default,
         help="Number of matches to run consecutively (default: %(default)s)",
     )
+    parser.add_argument(
+        "--batch",
+        choices=("local", "command", "openai"),
+        default=None,
+        help=(
+            "Advance all matches phase by phase through OpenAI-Batch style JSONL files "
+            "(local: in-process stand-in, command: external runner such as vLLM run_batch, "
+            "openai: OpenAI Batch API)"
+        ),
+    )
+    parser.add_argument(
+        "--batch-command",
+        default=None,
+        help="Command template for --batch command; {input}, {output} and {model} are substituted",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Resume failed or interrupted matches from their last checkpointed turn instead of starting new ones",
+    )
+    parser.add_argument(
+        "--no-warmup",
+        dest="warmup",
+        action="store_false",
+        help="Skip pre-loading models and opening connections before the first match",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Render every prompt without calling any model and estimate tokens and wall time",
+    )
+    parser.add_argument(
+        "--workers",
+        type=worker_count,
+        default=1,
+        help=(
+            "Number of matches assumed to run in parallel for the --dry-run wall time projection; "
+            "'auto' uses the worker count recommended by experiments.loadtest (default: %(default)s)"
+        ),
+    )
+    parser.add_argument(
+        "--telemetry",
+        choices=("prometheus", "otlp", "both"),
+        default=None,
+        help="Write per-model metrics (Prometheus textfile) and/or match/turn trace spans (OTLP JSON) under logs/telemetry/",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Write a cProfile dump, a tracemalloc summary and an LLM-wait/render/parse/log-I/O time split per match next to the log",
+    )
+    parser.add_argument(
+        "--context",
+        choices=("inline", "thread"),
+        default=None,
+        help=(
+            "Override game.context: inline re-embeds the transcript in every prompt, thread keeps an "
+            "append-only message thread per agent so consecutive requests share a long prefix"
+        ),
+    )
+    parser.add_argument(
+        "--hedge",
+        action="store_true",
+        help=(
+            "When a request outlives the model's recent latency percentile, send a duplicate to one of its "
+            "`replicas` in models.yaml and keep whichever answers first"
+        ),
+    )
+    parser.add_argument(
+        "--hedge-percentile",
+        type=float,
+        default=95.0,
+        help="Latency percentile after which a hedge is sent (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--adaptive-timeouts",
+        action="store_true",
+        help=(
+            "Cut off each request at a deadline derived from the model's recent latency "
+            "(timeouts.percentile x timeouts.multiplier in models.yaml) instead of only the fixed read timeout"
+        ),
+    )
+    parser.add_argument(
+        "--live",
+        action="store_true",
+        help=(
+            "Show a live status line with finished/failed matches, matches/min, output tokens/s, "
+            "in-flight requests per endpoint, retries and ETA"
+        ),
+    )
+    parser.add_argument(
+        "--quiet",
+        action="store_true",
+        help="Do not print each agent's speech (terminal output is a measurable cost at high concurrency)",
+    )
+    parser.add_argument(
+        "--log-format",
+        choices=("jsonl", "zstd"),
+        default="jsonl",
+        help="Write match logs as plain JSONL or as zstd-compressed JSONL with one seekable frame per run",
+    )
+    parser.add_argument(
+        "--rotate-mb",
+        type=float,
+        default=None,
+        help="With --log-format zstd, start a new log segment once the current one exceeds this size (MiB)",
+    )
+    parser.add_argument(
+        "--rotate-runs",
+        type=int,
+        default=None,
+        help="With --log-format zstd, start a new log segment after this many runs",
+    )
+    return parser
+
+
+def parse_run_options(
+    *,
+    description: str,
+    default: int,
+) -> argparse.Namespace:
+    """run.py 共通の CLI 引数を解析して Namespace を返す。"""
+
+    parser = build_run_argument_parser(description=description, default=default)
     args = parser.parse_args()
     if args.matches < 1:
         parser.error("--matches must be >= 1")
-    return args.matches
+    if args.batch == "command" and not args.batch_command:
+        parser.error("--batch command requires --batch-command")
+    if args.hedge and args.batch:
+        parser.error("--hedge cannot be combined with --batch")
+    if not 0 < args.hedge_percentile < 100:
+        parser.error("--hedge-percentile must be between 0 and 100")
+    if (args.rotate_mb is not None or args.rotate_runs is not None) and args.log_format != "zstd":
+        parser.error("--rotate-mb/--rotate-runs require --log-format zstd")
+    return args
+
+
+def parse_total_matches(
+    *,
+    description: str,
+    default: int,
+) -> int:
+    """共通の --matches CLI 引数を解析し、試合数を返す。"""
+
+    return parse_run_options(description=description, default=default).matches
+
+
+def main() -> None:
+    """`python -m experiments.runner config.yaml [...]` で ExperimentRunner を実行する。
+
+    設定ファイルが複数、または `--models` を指定した場合は、(設定, モデル) ごとの会話を
+    `--concurrency` 本まで並行に実行し、会話ごとに別のログへ書き出す。
+    """
+
+    parser = argparse.ArgumentParser(description="Run a YAML-defined turn-based experiment")
+    parser.add_argument("configs", nargs="+", type=Path, help="実験設定 YAML のパス（複数可）")
+    parser.add_argument("--log-dir", type=Path, default=None, help=f"ログの保存先（既定: {DEFAULT_LOG_DIR}）")
+    parser.add_argument(
+        "--models",
+        nargs="+",
+        default=None,
+        help="各設定の model_name をこれらのモデルに差し替えて実行する（all で models.yaml の全モデル）",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=worker_count,
+        default=4,
+        help="同時に実行する会話数の上限。auto で負荷試験の推奨値を使う（default: %(default)s）",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="cProfile・tracemalloc・区分別所要時間をログの隣に書き出す（1会話のときのみ）",
+    )
+    args = parser.parse_args()
+
+    models: List[str | None] = [None]
+    if args.models:
+        models = list_model_names() if args.models == ["all"] else args.models
+    if len(args.configs) == 1 and len(models) == 1:
+        ExperimentRunner(args.configs[0], args.log_dir, profile=args.profile, model_name=models[0]).run()
+        return
+    if args.profile:
+        parser.error("--profile can only be used with a single conversation")
+
+    runners: List[ExperimentRunner] = []
+    skipped = 0
+    for config_path in args.configs:
+        for model in models:
+            try:
+                runners.append(ExperimentRunner(config_path, args.log_dir, model_name=model, echo=False))
+            except (KeyError, ValueError, FileNotFoundError) as exc:
+                print(f"SKIPPED {config_path.name} [{model or '-'}]: {exc}")
+                skipped += 1
+    concurrency = resolve_worker_count(
+        args.concurrency, (runner.config["model_name"] for runner in runners), fallback=4
+    )
+    print(f"=== Running {len(runners)} conversations (concurrency={concurrency}) ===")
+    results = asyncio.run(run_experiments(runners, concurrency=concurrency))
+    failed = sum(1 for _, error in results if error is not None) + skipped
+    print(f"=== {len(results) + skipped - failed} succeeded, {failed} failed ===")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
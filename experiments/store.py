@@ -0,0 +1,400 @@
+"""試合ログを SQLite に取り込み、実験を横断して検索できるようにする分析用ストア。
+
+`logfile_*` / `sweep_NNN`（平文・zstd 圧縮）と `failed_responses.jsonl`（と未統合のシャード）を読み、
+ファイルごとに読み込み済みのバイトオフセット（圧縮ログはフレーム境界）を `ingested_files` に記録するため、
+2回目以降は追記された行だけを取り込む（ファイルが短くなっていればそのファイル分を入れ直す）。
+
+テーブル:
+
+- matches: (source, run) ごとのターン数・投票回数・失敗有無・時刻範囲
+- seats: (source, run, agent) → model の割り当て
+- turns: 1ターン1行（発言・思考・投票・プロンプト・所要時間など）
+- votes: 投票サマリーを展開した1票1行（投票者・投票先とそれぞれのモデル）
+- failures: failed_responses.jsonl の各行
+
+`source` はプロジェクトルートからの相対パス。ノートブックからは
+`pd.read_sql_query(sql, sqlite3.connect(DEFAULT_DB_PATH))` でそのまま参照できる。
+
+```bash
+python -m experiments.store ingest                      # experiments/*/logs を取り込む
+python -m experiments.store query "SELECT model, COUNT(*) FROM turns GROUP BY model"
+```
+"""
+from __future__ import annotations
+
+import argparse
+import sqlite3
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Tuple
+
+import orjson
+
+from experiments.logio import MATCH_LOG_BASES, list_log_files, log_segments, read_appended_lines
+from experiments.runner import FAILURE_LOG_FILENAME, PROJECT_ROOT, is_failure_log, list_failure_logs
+
+DEFAULT_DB_PATH = PROJECT_ROOT / "data" / "wolf_logs.sqlite"
+DEFAULT_LOG_GLOB = "experiments/*/logs"
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingested_files (
+    source TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    rows INTEGER NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS matches (
+    source TEXT NOT NULL,
+    run INTEGER NOT NULL,
+    turns INTEGER NOT NULL DEFAULT 0,
+    vote_rounds INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    first_timestamp TEXT,
+    last_timestamp TEXT,
+    PRIMARY KEY (source, run)
+);
+CREATE TABLE IF NOT EXISTS seats (
+    source TEXT NOT NULL,
+    run INTEGER NOT NULL,
+    agent TEXT NOT NULL,
+    model TEXT NOT NULL,
+    PRIMARY KEY (source, run, agent)
+);
+CREATE TABLE IF NOT EXISTS turns (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    run INTEGER NOT NULL,
+    round INTEGER,
+    phase TEXT,
+    turn_index INTEGER,
+    agent TEXT,
+    model TEXT,
+    vote TEXT,
+    thought TEXT,
+    speech TEXT,
+    error TEXT,
+    attempts INTEGER,
+    latency_seconds REAL,
+    timestamp TEXT,
+    system_prompt TEXT,
+    user_prompt TEXT,
+    raw_response TEXT,
+    extra TEXT
+);
+CREATE TABLE IF NOT EXISTS votes (
+    source TEXT NOT NULL,
+    run INTEGER NOT NULL,
+    round INTEGER,
+    phase TEXT,
+    voter TEXT,
+    target TEXT,
+    voter_model TEXT,
+    target_model TEXT
+);
+CREATE TABLE IF NOT EXISTS failures (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    log_dir TEXT,
+    run INTEGER,
+    round INTEGER,
+    phase TEXT,
+    agent TEXT,
+    model TEXT,
+    error TEXT,
+    raw_response TEXT,
+    system_prompt TEXT,
+    user_prompt TEXT,
+    timestamp TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_turns_match ON turns (source, run, turn_index);
+CREATE INDEX IF NOT EXISTS idx_turns_model ON turns (model, phase);
+CREATE INDEX IF NOT EXISTS idx_turns_agent ON turns (agent, phase);
+CREATE INDEX IF NOT EXISTS idx_turns_phase ON turns (phase);
+CREATE INDEX IF NOT EXISTS idx_seats_model ON seats (model);
+CREATE INDEX IF NOT EXISTS idx_votes_match ON votes (source, run);
+CREATE INDEX IF NOT EXISTS idx_votes_models ON votes (voter_model, target_model);
+CREATE INDEX IF NOT EXISTS idx_failures_model ON failures (model, phase);
+"""
+
+TURN_COLUMNS = (
+    "round",
+    "phase",
+    "turn_index",
+    "agent",
+    "vote",
+    "thought",
+    "speech",
+    "error",
+    "attempts",
+    "latency_seconds",
+    "timestamp",
+    "system_prompt",
+    "user_prompt",
+    "raw_response",
+)
+# turns の列に持たない既知のキー（extra へ入れない）
+_TURN_KNOWN_KEYS = frozenset(TURN_COLUMNS) | {"run", "model_name", "schema"}
+
+
+def connect(db_path: Path = DEFAULT_DB_PATH) -> sqlite3.Connection:
+    """スキーマを用意した接続を返す。"""
+
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+    return conn
+
+
+def _source_name(path: Path) -> str:
+    resolved = path.resolve()
+    try:
+        return resolved.relative_to(PROJECT_ROOT).as_posix()
+    except ValueError:
+        return resolved.as_posix()
+
+
+def discover_log_files(paths: Iterable[Path]) -> List[Tuple[Path, str]]:
+    """ディレクトリを (ファイル, 種別) に展開する。種別は match / failures。
+
+    圧縮ログのセグメントはそれぞれ別のファイルとして取り込む。
+    """
+
+    found: List[Tuple[Path, str]] = []
+    for path in paths:
+        if path.is_dir():
+            for log in list_log_files(path, MATCH_LOG_BASES):
+                found.extend((segment, "match") for segment in log_segments(log))
+            found.extend((failure_log, "failures") for failure_log in list_failure_logs(path))
+        elif path.exists():
+            found.append((path, "failures" if is_failure_log(path) else "match"))
+        else:
+            raise FileNotFoundError(f"ログが見つかりません: {path}")
+    return list(dict.fromkeys(found))
+
+
+def _delete_source(conn: sqlite3.Connection, source: str, kind: str) -> None:
+    tables = ("failures",) if kind == "failures" else ("matches", "seats", "turns", "votes")
+    for table in tables:
+        conn.execute(f"DELETE FROM {table} WHERE source = ?", (source,))
+
+
+def _ingest_match_rows(conn: sqlite3.Connection, source: str, rows: Iterable[Dict[str, Any]]) -> None:
+    for row in rows:
+        run = row.get("run")
+        if run is None:
+            continue
+        timestamp = row.get("timestamp")
+        conn.execute(
+            "INSERT INTO matches (source, run, first_timestamp, last_timestamp) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (source, run) DO UPDATE SET last_timestamp = excluded.last_timestamp",
+            (source, run, timestamp, timestamp),
+        )
+        phase = row.get("phase") or ""
+        if phase.endswith("_summary"):
+            seats = dict(conn.execute("SELECT agent, model FROM seats WHERE source = ? AND run = ?", (source, run)))
+            conn.executemany(
+                "INSERT INTO votes (source, run, round, phase, voter, target, voter_model, target_model) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        source,
+                        run,
+                        row.get("round"),
+                        phase,
+                        vote.get("agent"),
+                        vote.get("vote"),
+                        seats.get(vote.get("agent")),
+                        seats.get(vote.get("vote")),
+                    )
+                    for vote in row.get("votes") or []
+                ],
+            )
+            conn.execute(
+                "UPDATE matches SET vote_rounds = vote_rounds + 1 WHERE source = ? AND run = ?", (source, run)
+            )
+            continue
+        if "agent" not in row or "model_name" not in row:
+            continue
+        conn.execute(
+            "INSERT OR REPLACE INTO seats (source, run, agent, model) VALUES (?, ?, ?, ?)",
+            (source, run, row["agent"], row["model_name"]),
+        )
+        extra = {key: value for key, value in row.items() if key not in _TURN_KNOWN_KEYS}
+        conn.execute(
+            f"INSERT INTO turns (source, run, model, extra, {', '.join(TURN_COLUMNS)}) "
+            f"VALUES (?, ?, ?, ?, {', '.join('?' for _ in TURN_COLUMNS)})",
+            (
+                source,
+                run,
+                row["model_name"],
+                orjson.dumps(extra).decode("utf-8") if extra else None,
+                *(row.get(column) for column in TURN_COLUMNS),
+            ),
+        )
+        failed = 1 if "error" in row and "speech" not in row else 0
+        conn.execute(
+            "UPDATE matches SET turns = turns + 1, failed = MAX(failed, ?) WHERE source = ? AND run = ?",
+            (failed, source, run),
+        )
+
+
+def _ingest_failure_rows(conn: sqlite3.Connection, source: str, rows: Iterable[Dict[str, Any]]) -> None:
+    log_dir = Path(source).parent.as_posix()
+    conn.executemany(
+        "INSERT INTO failures (source, log_dir, run, round, phase, agent, model, error, raw_response, "
+        "system_prompt, user_prompt, timestamp) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            (
+                source,
+                log_dir,
+                row.get("run"),
+                row.get("round"),
+                row.get("phase"),
+                row.get("agent"),
+                row.get("model_name"),
+                row.get("error"),
+                row.get("raw_response"),
+                row.get("system_prompt"),
+                row.get("user_prompt"),
+                row.get("timestamp"),
+            )
+            for row in rows
+        ],
+    )
+
+
+def ingest_file(conn: sqlite3.Connection, path: Path, kind: str) -> int:
+    """1ファイルの未取り込み部分を取り込み、取り込んだ行数を返す。"""
+
+    source = _source_name(path)
+    state = conn.execute("SELECT offset FROM ingested_files WHERE source = ?", (source,)).fetchone()
+    offset = state[0] if state else 0
+    with conn:
+        if offset > path.stat().st_size:
+            # ファイルが作り直されている: このファイル由来の行を消して最初から入れ直す
+            _delete_source(conn, source, kind)
+            offset = 0
+        lines, next_offset = read_appended_lines(path, offset)
+        rows = []
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                row = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                continue
+            if isinstance(row, dict):
+                rows.append(row)
+        if kind == "failures":
+            _ingest_failure_rows(conn, source, rows)
+        else:
+            _ingest_match_rows(conn, source, rows)
+        conn.execute(
+            "INSERT INTO ingested_files (source, kind, offset, rows, updated_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (source) DO UPDATE SET offset = excluded.offset, rows = rows + excluded.rows, "
+            "updated_at = excluded.updated_at",
+            (source, kind, next_offset, len(rows), datetime.now(timezone.utc).isoformat()),
+        )
+    return len(rows)
+
+
+def _forget_merged_shards(conn: sqlite3.Connection) -> None:
+    # logmerge で failed_responses.jsonl へ統合されて消えたシャードの行は、統合先から入れ直される
+    rows = conn.execute("SELECT source FROM ingested_files WHERE kind = 'failures'").fetchall()
+    with conn:
+        for (source,) in rows:
+            path = Path(source) if Path(source).is_absolute() else PROJECT_ROOT / source
+            if path.name != FAILURE_LOG_FILENAME and is_failure_log(path) and not path.exists():
+                _delete_source(conn, source, "failures")
+                conn.execute("DELETE FROM ingested_files WHERE source = ?", (source,))
+
+
+def ingest(paths: Iterable[Path], db_path: Path = DEFAULT_DB_PATH) -> Dict[str, int]:
+    """ログ群を取り込み、ファイルごとの新規行数を返す。"""
+
+    conn = connect(db_path)
+    try:
+        _forget_merged_shards(conn)
+        return {
+            _source_name(path): ingest_file(conn, path, kind) for path, kind in discover_log_files(paths)
+        }
+    finally:
+        conn.close()
+
+
+def query_turns(
+    conn: sqlite3.Connection,
+    *,
+    model: str | None = None,
+    agent: str | None = None,
+    phase: str | None = None,
+    source: str | None = None,
+    limit: int | None = None,
+):
+    """条件に合うターンを DataFrame で返す（None の条件は無視）。"""
+
+    import pandas as pd
+
+    clauses, params = [], []
+    for column, value in (("model", model), ("agent", agent), ("phase", phase), ("source", source)):
+        if value is not None:
+            clauses.append(f"{column} = ?")
+            params.append(value)
+    sql = "SELECT * FROM turns"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY source, run, turn_index"
+    if limit is not None:
+        sql += f" LIMIT {int(limit)}"
+    return pd.read_sql_query(sql, conn, params=params)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Incrementally load match logs into a SQLite analytics store")
+    parser.add_argument("--db", type=Path, default=DEFAULT_DB_PATH, help="SQLite ファイル（default: %(default)s）")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    ingest_parser = subparsers.add_parser("ingest", help="ログの新しい行を取り込む")
+    ingest_parser.add_argument(
+        "paths", nargs="*", type=Path, help=f"ログファイルまたは logs ディレクトリ（省略時は {DEFAULT_LOG_GLOB}）"
+    )
+    query_parser = subparsers.add_parser("query", help="SQL を実行して結果を表示する")
+    query_parser.add_argument("sql")
+    args = parser.parse_args()
+
+    if args.command == "ingest":
+        paths = args.paths or sorted(PROJECT_ROOT.glob(DEFAULT_LOG_GLOB))
+        counts = ingest(paths, args.db)
+        for source, count in counts.items():
+            if count:
+                print(f"{source}: +{count} rows")
+        print(f"ingested {sum(counts.values())} new rows from {len(counts)} files into {args.db}")
+        return
+
+    import pandas as pd
+
+    conn = connect(args.db)
+    try:
+        with pd.option_context("display.width", 160, "display.max_columns", 30):
+            print(pd.read_sql_query(args.sql, conn))
+    finally:
+        conn.close()
+
+
+__all__ = [
+    "DEFAULT_DB_PATH",
+    "SCHEMA_VERSION",
+    "connect",
+    "discover_log_files",
+    "ingest_file",
+    "ingest",
+    "query_turns",
+]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""負荷試験・テスト用の OpenAI 互換スタブサーバ。
+
+`POST /v1/chat/completions` に、ゲームの JSON 形式の応答を決まった処理時間で返す。
+同時に処理できるのは `slots` 件までで、それを超えたリクエストは空きを待つため、
+並列数を上げるとスループットが頭打ちになりレイテンシが伸びる、実機に近い曲線になる。
+
+```bash
+python -m experiments.stub_server --port 8000 --slots 4
+python -m experiments.loadtest --stub --stub-slots 4     # 負荷試験から内部で起動する場合
+```
+
+models.yaml に `provider: openai` / `base_url: http://127.0.0.1:8000/v1` のモデルを書けば
+他のツールからも使える。
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict
+
+import orjson
+
+STUB_MODEL = "stub"
+STUB_CONTENT = '{"thought": "様子を見る", "speech": "まだ判断材料が少ないので、皆の意見を聞きたいです。", "vote": "B"}'
+
+
+class StubServer:
+    """スタブを別スレッドで動かす。`with` で起動・停止する。"""
+
+    def __init__(
+        self,
+        *,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        slots: int = 4,
+        prefill_seconds: float = 0.05,
+        seconds_per_token: float = 0.002,
+        output_tokens: int = 64,
+        jitter: float = 0.1,
+    ) -> None:
+        self.slots = threading.BoundedSemaphore(slots)
+        self.prefill_seconds = prefill_seconds
+        self.seconds_per_token = seconds_per_token
+        self.output_tokens = output_tokens
+        self.jitter = jitter
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def __enter__(self) -> "StubServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown()
+
+    def serve_forever(self) -> None:
+        self._server.serve_forever()
+
+    def shutdown(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def complete(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """1リクエスト分の処理時間を待ち、chat.completion の応答を返す。"""
+
+        prompt_chars = sum(len(str(message.get("content", ""))) for message in body.get("messages", []))
+        service = self.prefill_seconds + self.output_tokens * self.seconds_per_token
+        service *= 1 + random.uniform(-self.jitter, self.jitter)
+        with self.slots:
+            time.sleep(max(0.0, service))
+        with self._lock:
+            self.requests += 1
+            number = self.requests
+        prompt_tokens = max(1, prompt_chars // 2)
+        return {
+            "id": f"chatcmpl-stub-{number}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", STUB_MODEL),
+            "choices": [
+                {"index": 0, "message": {"role": "assistant", "content": STUB_CONTENT}, "finish_reason": "stop"}
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": self.output_tokens,
+                "total_tokens": prompt_tokens + self.output_tokens,
+            },
+        }
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.rstrip("/") != "/v1/models":
+                    self._send(404, {"error": {"message": "not found"}})
+                    return
+                self._send(200, {"object": "list", "data": [{"id": STUB_MODEL, "object": "model"}]})
+
+            def do_POST(self) -> None:
+                if self.path.rstrip("/") != "/v1/chat/completions":
+                    self._send(404, {"error": {"message": "not found"}})
+                    return
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    body = orjson.loads(self.rfile.read(length) or b"{}")
+                except orjson.JSONDecodeError:
+                    self._send(400, {"error": {"message": "invalid JSON"}})
+                    return
+                self._send(200, stub.complete(body))
+
+            def _send(self, status: int, payload: Dict[str, Any]) -> None:
+                data = orjson.dumps(payload)
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                return
+
+        return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stub server with a fixed number of parallel slots")
+    parser.add_argument("--host", default="127.0.0.1", help="待ち受けアドレス（default: %(default)s）")
+    parser.add_argument("--port", type=int, default=8000, help="待ち受けポート（default: %(default)s）")
+    parser.add_argument("--slots", type=int, default=4, help="同時に処理するリクエスト数（default: %(default)s）")
+    parser.add_argument("--prefill-seconds", type=float, default=0.05, help="1リクエストの固定処理時間（default: %(default)s）")
+    parser.add_argument("--seconds-per-token", type=float, default=0.002, help="出力1トークンあたりの時間（default: %(default)s）")
+    parser.add_argument("--output-tokens", type=int, default=64, help="応答のトークン数として返す値（default: %(default)s）")
+    args = parser.parse_args()
+    if args.slots < 1:
+        parser.error("--slots must be >= 1")
+    server = StubServer(
+        host=args.host,
+        port=args.port,
+        slots=args.slots,
+        prefill_seconds=args.prefill_seconds,
+        seconds_per_token=args.seconds_per_token,
+        output_tokens=args.output_tokens,
+    )
+    print(f"stub server listening on {server.base_url} ({args.slots} slots)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+
+
+__all__ = [
+    "STUB_MODEL",
+    "StubServer",
+]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,633 @@
+"""エージェント×モデル割り当てのグリッドを、Ollama のモデル常駐を意識した順序で回すスイーパー。
+
+```yaml
+# sweep.yaml
+template: experiments/template_4player   # config.yaml / prompts.yaml を持つテンプレート
+matches_per_job: 1
+grid:
+  agents:                                # エージェントごとの候補（直積を取る）
+    A: [ollama_gemma3:27b, ollama_gpt-oss:20b]
+    B: [ollama_gemma3:27b]
+    C: [ollama_gemma3:27b, ollama_gpt-oss:20b]
+    D: [ollama_gemma3:27b]
+  prompts: [prompts.yaml]                # テンプレートからの相対パス
+  seeds: [1, 2]                          # 試合の seed（seed × 1000 + ジョブ内の試合番号を Ollama / OpenAI 互換の seed に渡す）
+hosts:
+  default_max_loaded_models: 1           # OLLAMA_MAX_LOADED_MODELS 相当
+  max_loaded_models:
+    https://example.trycloudflare.com: 2
+estimated_job_seconds: 120               # keep_alive 切れの見積りに使う（省略可）
+```
+
+```bash
+python -m experiments.sweep sweep.yaml --plan-only
+python -m experiments.sweep sweep.yaml
+python -m experiments.sweep sweep.yaml --resume   # 中断した試合をチェックポイントから再開
+```
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import re
+import sys
+from collections import OrderedDict
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, Iterable, List, Sequence, Tuple
+
+import requests
+from requests import RequestException
+
+from experiments.dryrun import ResponseSampler, estimate_matches, print_report, save_report
+from experiments.console import LiveConsole
+from experiments.engine import GameEngine, GameSpec
+from experiments.logio import LOG_FORMATS, LogFormat, configure_log, log_stem
+from experiments.runner import (
+    PROJECT_ROOT,
+    append_jsonl_record,
+    collect_ollama_connection_errors,
+    load_yaml,
+    next_sequential_log_path,
+    resolve_worker_count,
+    worker_count,
+)
+from experiments.match import find_resumable_checkpoints
+from experiments.telemetry import TELEMETRY_MODES, Telemetry
+from src.config import get_model_config
+
+OLLAMA_DEFAULT_KEEP_ALIVE = "5m"
+DEFAULT_MAX_LOADED_MODELS = 1
+SWEEP_LOG_BASE = "sweep"
+# 試合の seed は「グリッドの seed × MATCH_SEED_STRIDE + ジョブ内の試合番号」
+MATCH_SEED_STRIDE = 1000
+_DURATION_PATTERN = re.compile(r"^\s*(-?\d+(?:\.\d+)?)\s*(ms|s|m|h)?\s*$")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0, None: 1.0}
+
+# host -> Ollama 上のモデル名の集合
+Residency = Dict[str, FrozenSet[str]]
+
+
+@dataclass(frozen=True)
+class SweepJob:
+    """グリッドの1点（エージェント割り当て × プロンプト × シード）。"""
+
+    index: int
+    agents: Tuple[Tuple[str, str], ...]
+    prompts_file: str
+    seed: int | None
+
+    @property
+    def agent_map(self) -> Dict[str, str]:
+        return dict(self.agents)
+
+    def to_checkpoint(self, match: int) -> Dict[str, Any]:
+        """チェックポイントに残すジョブ設定（割り当ては試合状態の agents に入る）。"""
+
+        return {"index": self.index, "prompts_file": self.prompts_file, "seed": self.seed, "match": match}
+
+    @classmethod
+    def from_checkpoint(cls, state: Dict[str, Any]) -> "SweepJob | None":
+        job = state.get("job")
+        if not isinstance(job, dict) or "prompts_file" not in job or not state.get("agents"):
+            return None
+        return cls(
+            index=int(job.get("index", -1)),
+            agents=tuple(state["agents"].items()),
+            prompts_file=job["prompts_file"],
+            seed=job.get("seed"),
+        )
+
+
+@dataclass
+class SweepSpec:
+    """sweep.yaml の内容。"""
+
+    template_dir: Path
+    agent_grid: Dict[str, List[str]]
+    prompts_files: List[str]
+    seeds: List[int | None]
+    matches_per_job: int = 1
+    default_max_loaded_models: int = DEFAULT_MAX_LOADED_MODELS
+    max_loaded_models: Dict[str, int] = field(default_factory=dict)
+    estimated_job_seconds: float | None = None
+
+    @classmethod
+    def from_file(cls, path: Path) -> "SweepSpec":
+        raw = load_yaml(path)
+        template = raw.get("template")
+        if not template:
+            raise ValueError("sweep 設定に template がありません。")
+        template_dir = Path(template)
+        if not template_dir.is_absolute():
+            template_dir = PROJECT_ROOT / template_dir
+        grid = raw.get("grid") or {}
+        agent_grid = grid.get("agents") or {}
+        if not agent_grid:
+            raise ValueError("grid.agents が空です。")
+        hosts = raw.get("hosts") or {}
+        matches_per_job = int(raw.get("matches_per_job", 1))
+        if not 1 <= matches_per_job < MATCH_SEED_STRIDE:
+            raise ValueError(f"matches_per_job は 1 以上 {MATCH_SEED_STRIDE} 未満にしてください: {matches_per_job}")
+        return cls(
+            template_dir=template_dir,
+            agent_grid={
+                agent: list(aliases) if isinstance(aliases, list) else [aliases]
+                for agent, aliases in agent_grid.items()
+            },
+            prompts_files=list(grid.get("prompts") or ["prompts.yaml"]),
+            seeds=list(grid.get("seeds") or [None]),
+            matches_per_job=matches_per_job,
+            default_max_loaded_models=int(hosts.get("default_max_loaded_models", DEFAULT_MAX_LOADED_MODELS)),
+            max_loaded_models={
+                url.rstrip("/"): int(count) for url, count in (hosts.get("max_loaded_models") or {}).items()
+            },
+            estimated_job_seconds=raw.get("estimated_job_seconds"),
+        )
+
+
+def match_seed(seed: int | None, match: int) -> int | None:
+    """グリッドの seed とジョブ内の試合番号（1始まり）から試合の seed を決める。
+
+    実行順や他のジョブに依存しないため、並べ替えたスイープでも同じ試合は同じ seed になり、
+    異なる seed・試合番号の組が同じ値になることもない。
+    """
+
+    return None if seed is None else int(seed) * MATCH_SEED_STRIDE + match
+
+
+def parse_keep_alive(value: Any) -> float:
+    """Ollama の keep_alive 指定を秒に変換する（負値は無期限 = inf）。"""
+
+    if value is None:
+        value = OLLAMA_DEFAULT_KEEP_ALIVE
+    if isinstance(value, (int, float)):
+        seconds = float(value)
+    else:
+        match = _DURATION_PATTERN.match(str(value))
+        if not match:
+            raise ValueError(f"keep_alive を解釈できません: {value}")
+        seconds = float(match.group(1)) * _DURATION_UNITS[match.group(2)]
+    return float("inf") if seconds < 0 else seconds
+
+
+def expand_grid(spec: SweepSpec) -> List[SweepJob]:
+    """グリッドの直積をジョブ列（素朴な順序）に展開する。"""
+
+    agents = list(spec.agent_grid)
+    jobs: List[SweepJob] = []
+    for combo in itertools.product(*(spec.agent_grid[agent] for agent in agents)):
+        for prompts_file in spec.prompts_files:
+            for seed in spec.seeds:
+                jobs.append(
+                    SweepJob(
+                        index=len(jobs),
+                        agents=tuple(zip(agents, combo)),
+                        prompts_file=prompts_file,
+                        seed=seed,
+                    )
+                )
+    return jobs
+
+
+def job_residency(job: SweepJob) -> Residency:
+    """ジョブが必要とする Ollama モデルをホスト別にまとめる。Ollama 以外は対象外。"""
+
+    needs: Dict[str, set] = {}
+    for alias in set(job.agent_map.values()):
+        model_config = get_model_config(alias)
+        if model_config.provider != "ollama":
+            continue
+        host = (model_config.base_url or "http://localhost:11434").rstrip("/")
+        needs.setdefault(host, set()).add(model_config.model)
+    return {host: frozenset(models) for host, models in needs.items()}
+
+
+def collect_keep_alive(jobs: Iterable[SweepJob]) -> Dict[Tuple[str, str], float]:
+    """(host, model) ごとの keep_alive 秒数。同じモデルで値が異なる場合は短い方を採用する。"""
+
+    result: Dict[Tuple[str, str], float] = {}
+    aliases = {alias for job in jobs for alias in job.agent_map.values()}
+    for alias in sorted(aliases):
+        model_config = get_model_config(alias)
+        if model_config.provider != "ollama":
+            continue
+        host = (model_config.base_url or "http://localhost:11434").rstrip("/")
+        key = (host, model_config.model)
+        seconds = parse_keep_alive(model_config.keep_alive)
+        result[key] = min(seconds, result.get(key, float("inf")))
+    return result
+
+
+class ResidencySimulator:
+    """ホストごとのモデル常駐（LRU + keep_alive 失効）を模擬し、ロード回数を数える。"""
+
+    def __init__(
+        self,
+        *,
+        capacities: Dict[str, int],
+        default_capacity: int,
+        keep_alive: Dict[Tuple[str, str], float],
+        job_seconds: float | None = None,
+    ) -> None:
+        self.capacities = capacities
+        self.default_capacity = max(1, default_capacity)
+        self.keep_alive = keep_alive
+        self.job_seconds = job_seconds
+        self.clock = 0.0
+        self.loads = 0
+        # host -> OrderedDict[model, last_used]（末尾ほど最近）
+        self.resident: Dict[str, "OrderedDict[str, float]"] = {}
+
+    def capacity(self, host: str) -> int:
+        return max(1, self.capacities.get(host, self.default_capacity))
+
+    def cost(self, needs: Residency) -> int:
+        """needs を実行する場合に新規ロードが必要なモデル数（状態は変えない）。"""
+
+        missing = 0
+        for host, models in needs.items():
+            loaded = self.resident.get(host, {})
+            missing += sum(1 for model in models if model not in loaded)
+        return missing
+
+    def _expire(self) -> None:
+        for host, loaded in self.resident.items():
+            for model, last_used in list(loaded.items()):
+                if self.clock - last_used > self.keep_alive.get((host, model), parse_keep_alive(None)):
+                    del loaded[model]
+
+    def run_job(self, needs: Residency) -> int:
+        """1ジョブ分の常駐状態を進め、発生したロード数を返す。"""
+
+        if self.job_seconds is not None:
+            self._expire()
+        loads = 0
+        for host, models in needs.items():
+            loaded = self.resident.setdefault(host, OrderedDict())
+            capacity = self.capacity(host)
+            for model in sorted(models):
+                if model in loaded:
+                    loaded.move_to_end(model)
+                else:
+                    loads += 1
+                    while len(loaded) >= capacity:
+                        victim = next((m for m in loaded if m not in models), next(iter(loaded)))
+                        del loaded[victim]
+                loaded[model] = self.clock
+            if len(models) > capacity:
+                # 1試合の中で交互に呼ばれるため、容量超過分はターンごとに入れ替わる
+                loads += len(models) - capacity
+        if self.job_seconds is not None:
+            self.clock += self.job_seconds
+        for host, loaded in self.resident.items():
+            for model in list(loaded):
+                if self.keep_alive.get((host, model), 1.0) == 0:
+                    del loaded[model]
+                elif model in needs.get(host, ()):
+                    loaded[model] = self.clock
+        self.loads += loads
+        return loads
+
+
+def _simulator_for(spec: SweepSpec, jobs: Sequence[SweepJob]) -> ResidencySimulator:
+    return ResidencySimulator(
+        capacities=spec.max_loaded_models,
+        default_capacity=spec.default_max_loaded_models,
+        keep_alive=collect_keep_alive(jobs),
+        job_seconds=spec.estimated_job_seconds,
+    )
+
+
+def count_model_loads(spec: SweepSpec, jobs: Sequence[SweepJob]) -> int:
+    """指定順でジョブを実行した場合のモデルロード総数を見積もる。"""
+
+    simulator = _simulator_for(spec, jobs)
+    for job in jobs:
+        simulator.run_job(job_residency(job))
+    return simulator.loads
+
+
+def schedule_jobs(spec: SweepSpec, jobs: Sequence[SweepJob]) -> List[SweepJob]:
+    """必要モデル集合が同じジョブをまとめ、ロードが最小になるグループから貪欲に並べる。"""
+
+    groups: "OrderedDict[Tuple[Tuple[str, FrozenSet[str]], ...], List[SweepJob]]" = OrderedDict()
+    needs_by_key: Dict[Tuple[Tuple[str, FrozenSet[str]], ...], Residency] = {}
+    for job in jobs:
+        needs = job_residency(job)
+        key = tuple(sorted(needs.items()))
+        groups.setdefault(key, []).append(job)
+        needs_by_key[key] = needs
+
+    simulator = _simulator_for(spec, jobs)
+    remaining = list(groups)
+    ordered: List[SweepJob] = []
+    while remaining:
+        best = min(
+            remaining,
+            key=lambda key: (simulator.cost(needs_by_key[key]), -len(groups[key]), groups[key][0].index),
+        )
+        remaining.remove(best)
+        for job in groups[best]:
+            simulator.run_job(needs_by_key[best])
+            ordered.append(job)
+    return ordered
+
+
+def fetch_loaded_models(base_url: str, *, timeout: float = 5.0) -> FrozenSet[str] | None:
+    """Ollama の `/api/ps` から現在ロード中のモデル名を取得する。失敗時は None。"""
+
+    try:
+        response = requests.get(base_url.rstrip("/") + "/api/ps", timeout=timeout)
+        response.raise_for_status()
+    except RequestException:
+        return None
+    return frozenset(item.get("name", "") for item in response.json().get("models", []))
+
+
+def observe_swaps(needs: Residency) -> int:
+    """実行直前の `/api/ps` と必要モデルを比べ、これから発生するロード数を数える。"""
+
+    swaps = 0
+    for host, models in needs.items():
+        loaded = fetch_loaded_models(host)
+        if loaded is None:
+            continue
+        swaps += sum(1 for model in models if model not in loaded)
+    return swaps
+
+
+def _job_config(base_config: Dict[str, Any], job: SweepJob) -> Dict[str, Any]:
+    config = dict(base_config)
+    config["agents"] = job.agent_map
+    config["prompts_file"] = job.prompts_file
+    if job.seed is not None:
+        config["seed"] = job.seed
+    return config
+
+
+def dry_run_sweep(spec: SweepSpec, *, workers: int = 1) -> Dict[str, Any]:
+    """全ジョブのプロンプトを組み立ててトークン量と所要時間を見積もる（LLM は呼ばない）。"""
+
+    engine = GameEngine(spec.template_dir)
+    base_config, _ = engine.load()
+    prompts_cache: Dict[str, Dict[str, Any]] = {}
+    workloads = []
+    for job in schedule_jobs(spec, expand_grid(spec)):
+        if job.prompts_file not in prompts_cache:
+            prompts_cache[job.prompts_file] = load_yaml(spec.template_dir / job.prompts_file)
+        workloads.append((_job_config(base_config, job), prompts_cache[job.prompts_file], spec.matches_per_job))
+    sampler = ResponseSampler.from_logs_dir(engine.logs_dir, seed=base_config.get("seed"))
+    report = estimate_matches(engine, workloads, workers=workers, sampler=sampler)
+    print_report(report)
+    save_report(report, engine.logs_dir)
+    return report.to_record()
+
+
+def run_sweep(
+    spec: SweepSpec,
+    *,
+    plan_only: bool = False,
+    warmup: bool = True,
+    telemetry: str | None = None,
+    log_format: str = "jsonl",
+    live: bool = False,
+    quiet: bool = False,
+) -> Dict[str, Any]:
+    """グリッドを展開・並べ替えし、（plan_only でなければ）全ジョブを実行する。
+
+    `live` で進捗行（`experiments.console`）を表示し、`quiet` で各エージェントの発言を表示しない。
+    """
+
+    jobs = expand_grid(spec)
+    ordered = schedule_jobs(spec, jobs)
+    distinct_models = {
+        (host, model) for job in jobs for host, models in job_residency(job).items() for model in models
+    }
+    report: Dict[str, Any] = {
+        "jobs": len(jobs),
+        "distinct_models": len(distinct_models),
+        "naive_loads": count_model_loads(spec, jobs),
+        "scheduled_loads": count_model_loads(spec, ordered),
+    }
+    report["naive_swaps"] = report["naive_loads"] - len(distinct_models)
+    report["scheduled_swaps"] = report["scheduled_loads"] - len(distinct_models)
+    print(
+        f"[sweep] {len(jobs)} jobs, model loads: naive={report['naive_loads']} "
+        f"scheduled={report['scheduled_loads']} (swaps {report['naive_swaps']} -> {report['scheduled_swaps']})"
+    )
+    if plan_only:
+        for job in ordered:
+            print(f" - job {job.index}: {job.agent_map} prompts={job.prompts_file} seed={job.seed}")
+        return report
+
+    aliases = {alias for job in jobs for alias in job.agent_map.values()}
+    failures = collect_ollama_connection_errors(aliases)
+    if failures:
+        for alias, url, detail in failures:
+            print(f"ERROR: {alias}: base_url={url} -> {detail}")
+        return report
+
+    engine = GameEngine(spec.template_dir, quiet=quiet)
+    base_config, _ = engine.load()
+    if warmup and ordered:
+        # 全エンドポイントへ接続を張り、モデルは最初のジョブで使うものだけ載せておく
+        first_aliases = set(ordered[0].agent_map.values())
+        engine.warm_up(first_aliases, connect_only=aliases - first_aliases)
+    log_format = LogFormat(compress=log_format == "zstd")
+    log_path = next_sequential_log_path(engine.logs_dir, SWEEP_LOG_BASE, extension=log_format.suffix)
+    plan_path = log_path.with_name(f"{log_stem(log_path)}_plan.jsonl")
+    configure_log(log_path, log_format)
+    engine.telemetry = Telemetry.for_log(engine.logs_dir, log_stem(log_path), telemetry) or engine.telemetry
+    prompts_cache: Dict[str, Dict[str, Any]] = {}
+
+    run_index = 0
+    observed_swaps = 0
+    succeeded = 0
+    total_runs = len(ordered) * spec.matches_per_job
+    console = (
+        LiveConsole(engine.telemetry, total_runs, overwrite=quiet and sys.stderr.isatty()) if live else nullcontext()
+    )
+    with console:
+        for position, job in enumerate(ordered, start=1):
+            if job.prompts_file not in prompts_cache:
+                prompts_cache[job.prompts_file] = load_yaml(spec.template_dir / job.prompts_file)
+            config = _job_config(base_config, job)
+            swaps = observe_swaps(job_residency(job))
+            observed_swaps += swaps
+            print(f"=== Sweep job {position}/{len(ordered)} (grid #{job.index}, model loads: {swaps}) ===")
+            for match in range(1, spec.matches_per_job + 1):
+                run_index += 1
+                seed = match_seed(config.get("seed"), match)
+                append_jsonl_record(plan_path, {
+                    "timestamp": datetime.now(timezone.utc).isoformat(),
+                    "run": run_index,
+                    "job": job.index,
+                    "agents": job.agent_map,
+                    "prompts_file": job.prompts_file,
+                    "seed": job.seed,
+                    "match": match,
+                    "match_seed": seed,
+                    "observed_model_loads": swaps,
+                })
+                # ジョブ設定をチェックポイントに残し、--resume で sweep.yaml なしに組み立て直せるようにする
+                if engine.run(
+                    config,
+                    prompts_cache[job.prompts_file],
+                    log_path,
+                    run_index,
+                    seed=seed,
+                    job=job.to_checkpoint(match),
+                ):
+                    succeeded += 1
+                swaps = 0
+    engine.telemetry.close()
+
+    report["observed_loads"] = observed_swaps
+    report["succeeded"] = succeeded
+    report["runs"] = run_index
+    print(
+        f"[sweep] finished {succeeded}/{run_index} runs, observed model loads={observed_swaps} "
+        f"(log: {log_path.name}, plan: {plan_path.name})"
+    )
+    return report
+
+
+def resume_sweep(
+    spec: SweepSpec,
+    *,
+    warmup: bool = True,
+    telemetry: str | None = None,
+    live: bool = False,
+    quiet: bool = False,
+) -> Dict[str, Any]:
+    """中断したスイープの試合をチェックポイントから再開する。
+
+    ジョブの設定（割り当て・プロンプト・seed）はチェックポイントから組み立て直すため、
+    sweep.yaml はテンプレートの場所にだけ使う。ログは元の `sweep_NNN` に追記される。
+    """
+
+    engine = GameEngine(spec.template_dir, quiet=quiet)
+    base_config, _ = engine.load()
+    prompts_cache: Dict[str, Dict[str, Any]] = {}
+    resumed: List[Tuple[Any, Dict[str, Any]]] = []
+    for state in find_resumable_checkpoints(engine.checkpoint_dir, SWEEP_LOG_BASE):
+        job = SweepJob.from_checkpoint(state)
+        if job is None:
+            print(f"WARNING: {state.get('log_file')} run {state.get('run')} にはジョブ設定がないため飛ばします。")
+            continue
+        if job.prompts_file not in prompts_cache:
+            prompts_cache[job.prompts_file] = load_yaml(spec.template_dir / job.prompts_file)
+        config = _job_config(base_config, job)
+        session = engine.resume_session(config, prompts_cache[job.prompts_file], state)
+        if session is not None:
+            resumed.append((session, config))
+    report: Dict[str, Any] = {"resumed": len(resumed), "succeeded": 0}
+    if not resumed:
+        print("再開できる試合はありません。")
+        return report
+
+    aliases = {alias for session, _ in resumed for alias in session.config_agents.values()}
+    failures = collect_ollama_connection_errors(aliases)
+    if failures:
+        for alias, url, detail in failures:
+            print(f"ERROR: {alias}: base_url={url} -> {detail}")
+        for session, _ in resumed:
+            session.release_checkpoint()
+        return report
+    # 同じモデル集合の試合を続けて流し、入れ替えを減らす
+    resumed.sort(
+        key=lambda item: (sorted(set(item[0].config_agents.values())), item[0].log_path.name, item[0].run_index)
+    )
+    if warmup:
+        first_aliases = set(resumed[0][0].config_agents.values())
+        engine.warm_up(first_aliases, connect_only=aliases - first_aliases)
+    first_log = resumed[0][0].log_path
+    engine.telemetry = Telemetry.for_log(engine.logs_dir, log_stem(first_log), telemetry) or engine.telemetry
+    print(f"=== Resuming {len(resumed)} sweep runs from checkpoints ===")
+    console = (
+        LiveConsole(engine.telemetry, len(resumed), overwrite=quiet and sys.stderr.isatty()) if live else nullcontext()
+    )
+    with console:
+        for session, config in resumed:
+            if engine.play_session(session, max_retries=GameSpec.from_config(config).max_retries):
+                report["succeeded"] += 1
+    engine.telemetry.close()
+    print(f"[sweep] resumed {report['succeeded']}/{len(resumed)} runs")
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a model-affinity ordered sweep over agent/model grids")
+    parser.add_argument("spec", type=Path, help="sweep.yaml のパス")
+    parser.add_argument("--plan-only", action="store_true", help="実行せずにジョブ順とロード見積りだけ表示する")
+    parser.add_argument("--resume", action="store_true", help="中断したスイープの試合をチェックポイントから再開する")
+    parser.add_argument("--no-warmup", dest="warmup", action="store_false", help="開始前のウォームアップを省略する")
+    parser.add_argument("--dry-run", action="store_true", help="LLM を呼ばずにトークン量と所要時間を見積もる")
+    parser.add_argument(
+        "--workers",
+        type=worker_count,
+        default=1,
+        help="--dry-run の所要時間見積りで仮定する並列試合数（auto で負荷試験の推奨値）",
+    )
+    parser.add_argument(
+        "--telemetry",
+        choices=TELEMETRY_MODES,
+        default=None,
+        help="logs/telemetry/ にメトリクス（Prometheus textfile）とトレース（OTLP JSON）を書き出す",
+    )
+    parser.add_argument(
+        "--log-format",
+        choices=LOG_FORMATS,
+        default="jsonl",
+        help="試合ログを平文 JSONL か run 単位フレームの zstd 圧縮 JSONL で書く",
+    )
+    parser.add_argument("--live", action="store_true", help="完了・失敗試合数、スループット、完了見込みを一定間隔で表示する")
+    parser.add_argument("--quiet", action="store_true", help="各エージェントの発言を表示しない")
+    args = parser.parse_args()
+    if args.dry_run:
+        spec = SweepSpec.from_file(args.spec)
+        models = {alias for job in expand_grid(spec) for _, alias in job.agents}
+        dry_run_sweep(spec, workers=resolve_worker_count(args.workers, models, fallback=1))
+        return
+    if args.resume:
+        resume_sweep(
+            SweepSpec.from_file(args.spec),
+            warmup=args.warmup,
+            telemetry=args.telemetry,
+            live=args.live,
+            quiet=args.quiet,
+        )
+        return
+    run_sweep(
+        SweepSpec.from_file(args.spec),
+        plan_only=args.plan_only,
+        warmup=args.warmup,
+        telemetry=args.telemetry,
+        log_format=args.log_format,
+        live=args.live,
+        quiet=args.quiet,
+    )
+
+
+__all__ = [
+    "SweepJob",
+    "SweepSpec",
+    "ResidencySimulator",
+    "parse_keep_alive",
+    "expand_grid",
+    "job_residency",
+    "count_model_loads",
+    "match_seed",
+    "schedule_jobs",
+    "fetch_loaded_models",
+    "dry_run_sweep",
+    "run_sweep",
+    "resume_sweep",
+]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+"""試合実行のメトリクスとトレースをオフラインのファイルへ書き出す。
+
+- Prometheus textfile（node_exporter の textfile collector でそのまま読める形式）:
+  モデル・エンドポイント別のリクエスト数・再試行数・レイテンシのヒストグラム・
+  トークン数・実行中リクエスト数と、試合数・最終ターン時刻を出力する。
+  一定間隔と試合終了時に一時ファイル経由で置き換える。
+- OTLP JSON（OpenTelemetry の file exporter と同じ1行1 `ExportTraceServiceRequest`）:
+  試合を親スパン、各ターン（バッチ時は各ステップ）を子スパンとして、
+  親スパンが閉じるたびに1行追記する。
+
+いずれも外部サービスやライブラリを必要としない。
+"""
+from __future__ import annotations
+
+import contextvars
+import os
+import secrets
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+
+import orjson
+
+from experiments.profiling import timed
+from src.config import get_model_config
+
+TELEMETRY_MODES = ("prometheus", "otlp", "both")
+LATENCY_BUCKETS = (0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+METRIC_PREFIX = "wolf"
+DEFAULT_FLUSH_INTERVAL = 15.0
+SCOPE_NAME = "experiments.telemetry"
+
+_current_span: contextvars.ContextVar["Span | None"] = contextvars.ContextVar("current_span", default=None)
+
+
+@dataclass
+class Span:
+    """OTLP の Span 1件分。"""
+
+    name: str
+    trace_id: str
+    span_id: str
+    parent_span_id: str = ""
+    start_ns: int = 0
+    end_ns: int = 0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: str | None = None
+    children: List["Span"] = field(default_factory=list)
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update({key: value for key, value in attributes.items() if value is not None})
+
+    def to_otlp(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(key, value) for key, value in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_span_id:
+            data["parentSpanId"] = self.parent_span_id
+        return data
+
+    def flatten(self) -> Iterator["Span"]:
+        yield self
+        for child in self.children:
+            yield from child.flatten()
+
+
+@dataclass
+class TelemetrySnapshot:
+    """ある時点の累計値（ライブ表示用）。"""
+
+    matches: Dict[str, int]
+    turns: int
+    attempts: int
+    retries: int
+    timeouts: int
+    input_tokens: int
+    output_tokens: int
+    in_flight: Dict[str, int]
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Telemetry:
+    """カウンタ・ゲージ・ヒストグラムとスパンを保持し、ファイルへ書き出す。
+
+    メトリクスの更新はロックで保護し、スパンの親子関係は contextvars で追跡するため、
+    スレッドや asyncio タスクから同時に呼び出してもよい。
+    """
+
+    def __init__(
+        self,
+        *,
+        prometheus_path: Path | None = None,
+        otlp_path: Path | None = None,
+        service_name: str = "wolf-game",
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+    ) -> None:
+        self.prometheus_path = prometheus_path
+        self.otlp_path = otlp_path
+        self.service_name = service_name
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[Tuple[str, ...], float]] = defaultdict(lambda: defaultdict(float))
+        self._gauges: Dict[str, Dict[Tuple[str, ...], float]] = defaultdict(lambda: defaultdict(float))
+        self._histogram: Dict[Tuple[str, ...], List[float]] = {}
+        self._endpoints: Dict[str, str] = {}
+        self._last_flush = 0.0
+
+    @classmethod
+    def for_log(cls, logs_dir: Path, log_stem: str, mode: str | None) -> "Telemetry | None":
+        """`--telemetry` の指定から `logs/telemetry/<ログ名>.{prom,otlp.jsonl}` に書く Telemetry を作る。"""
+
+        if not mode:
+            return None
+        if mode not in TELEMETRY_MODES:
+            raise ValueError(f"未対応の telemetry 指定です: {mode}（{', '.join(TELEMETRY_MODES)}）")
+        directory = logs_dir / "telemetry"
+        directory.mkdir(parents=True, exist_ok=True)
+        return cls(
+            prometheus_path=directory / f"{log_stem}.prom" if mode in ("prometheus", "both") else None,
+            otlp_path=directory / f"{log_stem}.otlp.jsonl" if mode in ("otlp", "both") else None,
+        )
+
+    def endpoint_for(self, model_alias: str) -> str:
+        if model_alias not in self._endpoints:
+            model_config = get_model_config(model_alias)
+            self._endpoints[model_alias] = model_config.base_url or model_config.provider
+        return self._endpoints[model_alias]
+
+    # --- メトリクス -----------------------------------------------------------------
+
+    @contextmanager
+    def in_flight(self, model_alias: str, count: int = 1) -> Iterator[None]:
+        """ブロックの間、モデル・エンドポイント別の実行中リクエスト数を増やす。"""
+
+        key = (model_alias, self.endpoint_for(model_alias))
+        with self._lock:
+            self._gauges["llm_in_flight_requests"][key] += count
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._gauges["llm_in_flight_requests"][key] -= count
+            self.flush()
+
+    def observe_request(
+        self,
+        model_alias: str,
+        *,
+        seconds: float,
+        attempts: int,
+        ok: bool,
+        timeouts: int = 0,
+        input_tokens: int | None = None,
+        output_tokens: int | None = None,
+    ) -> None:
+        """1ターン分（再試行込み）の結果を記録する。"""
+
+        key = (model_alias, self.endpoint_for(model_alias))
+        with self._lock:
+            self._counters["llm_requests_total"][key + ("ok" if ok else "error",)] += 1
+            self._counters["llm_attempts_total"][key] += attempts
+            self._counters["llm_retries_total"][key] += max(0, attempts - 1)
+            if timeouts:
+                self._counters["llm_timeouts_total"][key] += timeouts
+            if input_tokens:
+                self._counters["llm_tokens_total"][key + ("input",)] += input_tokens
+            if output_tokens:
+                self._counters["llm_tokens_total"][key + ("output",)] += output_tokens
+            buckets = self._histogram.setdefault(key, [0.0] * (len(LATENCY_BUCKETS) + 2))
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    buckets[index] += 1
+            buckets[-2] += 1
+            buckets[-1] += seconds
+            self._gauges["last_turn_timestamp_seconds"][()] = time.time()
+
+    def observe_hedge(self, model_alias: str, *, won: bool, saved_seconds: float | None = None) -> None:
+        """レプリカへ重ねて送ったリクエスト1件の結果を記録する（saved_seconds は計測できたときだけ）。"""
+
+        key = (model_alias, self.endpoint_for(model_alias))
+        with self._lock:
+            if saved_seconds is None:
+                self._counters["llm_hedges_total"][key + ("won" if won else "lost",)] += 1
+            else:
+                self._counters["llm_hedges_total"][key + ("won",)] += 1
+                self._counters["llm_hedge_probes_total"][key] += 1
+                self._counters["llm_hedge_probe_saved_seconds_total"][key] += saved_seconds
+
+    def observe_match(self, status: str) -> None:
+        with self._lock:
+            self._counters["matches_total"][(status,)] += 1
+        self.flush(force=True)
+
+    def snapshot(self) -> TelemetrySnapshot:
+        """現在の累計値をモデル・エンドポイントについて合算して返す（実行中リクエストはエンドポイント別）。"""
+
+        with self._lock:
+            counters = self._counters
+
+            def total(name: str) -> int:
+                return int(sum(counters[name].values())) if name in counters else 0
+
+            tokens = counters.get("llm_tokens_total", {})
+            in_flight: Dict[str, int] = defaultdict(int)
+            for (_, endpoint), count in self._gauges.get("llm_in_flight_requests", {}).items():
+                in_flight[endpoint] += int(count)
+            return TelemetrySnapshot(
+                matches={status: int(count) for (status,), count in counters.get("matches_total", {}).items()},
+                turns=total("llm_requests_total"),
+                attempts=total("llm_attempts_total"),
+                retries=total("llm_retries_total"),
+                timeouts=total("llm_timeouts_total"),
+                input_tokens=int(sum(count for key, count in tokens.items() if key[-1] == "input")),
+                output_tokens=int(sum(count for key, count in tokens.items() if key[-1] == "output")),
+                in_flight=dict(in_flight),
+            )
+
+    def render_prometheus(self) -> str:
+        """現在の値を Prometheus テキスト形式で返す。"""
+
+        model_labels = ("model", "endpoint")
+        definitions = [
+            ("llm_requests_total", "counter", "LLM turns by outcome (retries included in one turn)", model_labels + ("outcome",)),
+            ("llm_attempts_total", "counter", "LLM invocation attempts", model_labels),
+            ("llm_retries_total", "counter", "LLM attempts beyond the first per turn", model_labels),
+            ("llm_timeouts_total", "counter", "LLM attempts that hit the connect/read or adaptive timeout", model_labels),
+            ("llm_tokens_total", "counter", "Tokens reported by the provider", model_labels + ("direction",)),
+            ("llm_hedges_total", "counter", "Duplicate requests sent to a replica by whether they won", model_labels + ("outcome",)),
+            ("llm_hedge_probes_total", "counter", "Won hedges whose primary was left running to measure the saving", model_labels),
+            ("llm_hedge_probe_saved_seconds_total", "counter", "Latency saved by won hedges, measured on probes", model_labels),
+            ("llm_in_flight_requests", "gauge", "LLM requests currently waiting for a response", model_labels),
+            ("matches_total", "counter", "Finished matches by status", ("status",)),
+            ("last_turn_timestamp_seconds", "gauge", "Unix time of the last recorded turn", ()),
+        ]
+        lines: List[str] = []
+        with self._lock:
+            for name, kind, help_text, label_names in definitions:
+                series = self._counters.get(name) if kind == "counter" else self._gauges.get(name)
+                if not series:
+                    continue
+                metric = f"{METRIC_PREFIX}_{name}"
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} {kind}")
+                for values, number in sorted(series.items()):
+                    lines.append(f"{metric}{_labels(label_names, values)} {number:g}")
+            if self._histogram:
+                metric = f"{METRIC_PREFIX}_llm_turn_latency_seconds"
+                lines.append(f"# HELP {metric} Wall time per LLM turn including retries")
+                lines.append(f"# TYPE {metric} histogram")
+                for values, buckets in sorted(self._histogram.items()):
+                    bounds = [f"{bound:g}" for bound in LATENCY_BUCKETS] + ["+Inf"]
+                    for bound, number in zip(bounds, buckets[:-1]):
+                        bucket_labels = _labels(model_labels, values, 'le="' + bound + '"')
+                        lines.append(f"{metric}_bucket{bucket_labels} {number:g}")
+                    lines.append(f"{metric}_count{_labels(model_labels, values)} {buckets[-2]:g}")
+                    lines.append(f"{metric}_sum{_labels(model_labels, values)} {buckets[-1]:.6f}")
+        return "\n".join(lines) + "\n"
+
+    def flush(self, *, force: bool = False) -> None:
+        """Prometheus textfile を書き直す（force でなければ flush_interval ごと）。"""
+
+        if self.prometheus_path is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < self.flush_interval:
+            return
+        self._last_flush = now
+        tmp_path = self.prometheus_path.with_name(f".{self.prometheus_path.name}.{os.getpid()}.tmp")
+        with timed("log_io"):
+            tmp_path.write_text(self.render_prometheus(), encoding="utf-8")
+            os.replace(tmp_path, self.prometheus_path)
+
+    # --- トレース -------------------------------------------------------------------
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:
+        """スパンを開始する。親スパンが無ければ新しいトレースになり、閉じた時点で書き出す。"""
+
+        parent = _current_span.get()
+        span = Span(
+            name=name,
+            trace_id=parent.trace_id if parent else secrets.token_hex(16),
+            span_id=secrets.token_hex(8),
+            parent_span_id=parent.span_id if parent else "",
+            start_ns=time.time_ns(),
+        )
+        span.set(**attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as exc:
+            span.error = span.error or f"{type(exc).__name__}: {exc}"
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_ns = time.time_ns()
+            if parent is not None:
+                with self._lock:
+                    parent.children.append(span)
+            else:
+                self._export(span)
+
+    def _export(self, root: Span) -> None:
+        if self.otlp_path is None:
+            return
+        request = {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": [_otlp_attribute("service.name", self.service_name)]},
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": SCOPE_NAME},
+                            "spans": [span.to_otlp() for span in root.flatten()],
+                        }
+                    ],
+                }
+            ]
+        }
+        with timed("log_io"), self._lock, self.otlp_path.open("ab") as fh:
+            fh.write(orjson.dumps(request) + b"\n")
+
+    def close(self) -> None:
+        self.flush(force=True)
+
+
+__all__ = [
+    "TELEMETRY_MODES",
+    "LATENCY_BUCKETS",
+    "Span",
+    "TelemetrySnapshot",
+    "Telemetry",
+]
@@ -1,9 +1,11 @@
 """Streamlitアプリ: ログの会話・投票をざっと閲覧するビューア。"""
 from __future__ import annotations
 
-import json
+import sqlite3
+import sys
+import time
 from pathlib import Path
-from typing import List
+from typing import Any, Dict, List, Tuple
 
 import pandas as pd
 import streamlit as st
@@ -11,28 +13,90 @@ import streamlit as st
 EXPERIMENT_DIR = Path(__file__).resolve().parents[1]
 LOG_DIR = EXPERIMENT_DIR / "logs"
 DEFAULT_LOG_PATH = LOG_DIR / "templete_4player.jsonl"
+PROJECT_ROOT = EXPERIMENT_DIR.parents[1]
+STORE_PATH = PROJECT_ROOT / "data" / "wolf_logs.sqlite"
+
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from experiments.aggregate import LiveThroughput  # noqa: E402
+from experiments.logio import LogTail, iter_log_records, list_log_files  # noqa: E402
 
 
 def load_records(log_path: Path) -> List[dict]:
-    records: List[dict] = []
-    with log_path.open("r", encoding="utf-8") as fh:
-        for line in fh:
-            line = line.strip()
-            if not line:
-                continue
-            records.append(json.loads(line))
-    return records
+    """平文・zstd 圧縮（セグメント分割を含む）のどちらのログも読む。"""
+
+    return list(iter_log_records(log_path))
+
+
+def group_by_run(records: List[dict], runs: Dict[Any, List[dict]] | None = None) -> Dict[Any, List[dict]]:
+    runs = {} if runs is None else runs
+    for record in records:
+        if record.get("run") is not None:
+            runs.setdefault(record["run"], []).append(record)
+    return runs
+
+
+def follow_log(log_path: Path) -> Tuple[Dict[Any, List[dict]], LiveThroughput, int]:
+    """ライブ追従: 前回の更新以降に追記された行だけを読み、セッションに溜めた記録と処理速度へ足す。"""
+
+    state = st.session_state.get("live_tail")
+    if state is None or state["tail"].path != log_path:
+        state = st.session_state["live_tail"] = {"tail": LogTail(log_path), "runs": {}, "throughput": LiveThroughput()}
+    new_records = state["tail"].poll()
+    if state["tail"].rewound:
+        state["runs"], state["throughput"] = {}, LiveThroughput()
+    group_by_run(new_records, state["runs"])
+    state["throughput"].update(new_records)
+    return state["runs"], state["throughput"], len(new_records)
+
+
+def render_throughput(throughput: LiveThroughput, added: int) -> None:
+    rate = throughput.matches_per_minute
+    latency = throughput.mean_turn_latency
+    st.sidebar.metric("終了した試合", len(throughput.finished_runs))
+    st.sidebar.metric("試合/分", f"{rate:.2f}" if rate is not None else "—")
+    st.sidebar.metric("平均ターン時間", f"{latency:.2f} 秒" if latency is not None else "—")
+    st.sidebar.caption(f"ターン {throughput.turns} 件（今回 {added} 行追記）")
+
+
+def render_store_search() -> None:
+    """SQLite ストア（`python -m experiments.store ingest` で作成）から全実験のターンを検索する。"""
+
+    st.subheader("横断検索（SQLite ストア）")
+    with sqlite3.connect(STORE_PATH) as conn:
+        options = {
+            column: ["(すべて)"] + [row[0] for row in conn.execute(
+                f"SELECT DISTINCT {column} FROM turns WHERE {column} IS NOT NULL ORDER BY {column}"
+            )]
+            for column in ("model", "agent", "phase")
+        }
+        filters = {
+            column: st.sidebar.selectbox(f"{column} で絞り込み", values)
+            for column, values in options.items()
+        }
+        clauses = [f"{column} = ?" for column, value in filters.items() if value != "(すべて)"]
+        params = [value for value in filters.values() if value != "(すべて)"]
+        sql = "SELECT source, run, round, phase, agent, model, vote, speech, thought, error FROM turns"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY source, run, turn_index LIMIT 1000"
+        st.dataframe(pd.read_sql_query(sql, conn, params=params), use_container_width=True)
 
 
 def main() -> None:
     st.set_page_config(page_title="Werewolf Log Viewer", layout="wide")
     st.title("Template MM 4-Player Log Viewer")
 
+    if STORE_PATH.exists() and st.sidebar.checkbox("SQLite ストアから横断検索"):
+        render_store_search()
+        return
+
     if not LOG_DIR.exists():
         st.error(f"ログディレクトリが見つかりません: {LOG_DIR}")
         return
 
-    log_files = sorted(LOG_DIR.glob("*.jsonl"))
+    log_files = list_log_files(LOG_DIR)
     if not log_files:
         st.error("ログファイルが存在しません。")
         return
@@ -47,25 +111,39 @@ def main() -> None:
         "ログファイル", log_files, index=default_index, format_func=lambda p: p.name
     )
 
+    live = st.sidebar.checkbox("ライブ追従（書き込み中のログ）")
     try:
-        records = load_records(selected_path)
-    except json.JSONDecodeError as exc:
-        st.error(f"JSONの読み込みに失敗しました: {exc}")
+        if live:
+            interval = st.sidebar.number_input("更新間隔（秒）", min_value=1, max_value=60, value=5)
+            runs, throughput, added = follow_log(selected_path)
+            render_throughput(throughput, added)
+        else:
+            runs = group_by_run(load_records(selected_path))
+    except OSError as exc:
+        st.error(f"ログの読み込みに失敗しました: {exc}")
         return
 
-    if not records:
-        st.warning("レコードが存在しません。")
-        return
+    render_runs(runs, live=live)
 
-    df = pd.DataFrame(records)
-    if "run" not in df.columns:
-        st.error("ログに 'run' 列がありません。")
+    st.sidebar.markdown("---")
+    if live:
+        time.sleep(interval)
+        st.rerun()
+    st.sidebar.markdown("ログが更新された場合は再実行するか、ライブ追従を有効にしてください。")
+
+
+def render_runs(runs: Dict[Any, List[dict]], *, live: bool) -> None:
+    if not runs:
+        st.warning("'run' を持つレコードが存在しません。")
         return
 
-    runs = sorted(df["run"].dropna().unique())
-    selected_run = st.sidebar.selectbox("Run番号", runs, format_func=lambda x: int(x))
+    run_numbers = sorted(runs)
+    # ライブ追従中は最新の run を既定で表示する
+    selected_run = st.sidebar.selectbox(
+        "Run番号", run_numbers, index=len(run_numbers) - 1 if live else 0, format_func=lambda x: int(x)
+    )
 
-    run_df = df[df["run"] == selected_run].copy()
+    run_df = pd.DataFrame(runs[selected_run])
     if "turn_index" in run_df.columns:
         run_df["turn_index"] = pd.to_numeric(run_df["turn_index"], errors="coerce")
         run_df = run_df.sort_values("turn_index", na_position="last")
@@ -142,9 +220,6 @@ def main() -> None:
         else:
             st.write("tally 情報がありません。")
 
-    st.sidebar.markdown("---")
-    st.sidebar.markdown("ログが更新された場合は再実行してください。")
-
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,108 @@
+"""直近のレイテンシから1リクエストの期限を決める適応タイムアウト。
+
+`config/models.yaml` の `timeouts.connect` / `timeouts.read` は HTTP クライアントの固定の上限で、
+トンネルが詰まっても `invoke` が無期限に止まらないようにする。`timeouts.adaptive: true`
+（あるいは `run.py --adaptive-timeouts`）では、さらにモデル・エンドポイント別の直近レイテンシの
+`percentile` 分位点 × `multiplier` を期限とし、過ぎたら `ainvoke` を接続ごと取り消して
+`LLMTimeoutError` を送出する。期限は `floor` 以上 `read` 以下に収め、サンプルが `min_samples`
+に満たない間は `read` をそのまま使う。タイムアウトが続くと期限を倍々に延ばし、
+サーバ全体が遅くなったときに全リクエストを切り続けないようにする。
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from typing import Any, Sequence
+
+from experiments.latency import DEFAULT_WINDOW, LatencyWindow, run_on_background_loop
+from src.config.models import TimeoutConfig
+
+MAX_BACKOFF_EXPONENT = 4
+
+
+class LLMTimeoutError(TimeoutError):
+    """LLM 呼び出しが期限内に返らなかった。"""
+
+    def __init__(self, model_alias: str, seconds: float) -> None:
+        super().__init__(f"{model_alias} が {seconds:.1f} 秒以内に応答しませんでした")
+        self.model_alias = model_alias
+        self.seconds = seconds
+
+
+def is_timeout_error(exc: BaseException) -> bool:
+    """HTTP クライアントやプロバイダ SDK のタイムアウト例外かどうか。
+
+    httpx・openai・anthropic・google の SDK はそれぞれ別のタイムアウト例外を持ち、
+    `TimeoutError` を継承しないものもあるため、クラス名でも判定する。
+    """
+
+    if isinstance(exc, TimeoutError):
+        return True
+    return any("Timeout" in cls.__name__ for cls in type(exc).__mro__)
+
+
+class DeadlineClient:
+    """直近のレイテンシから決めた期限で `ainvoke` を打ち切るクライアント。
+
+    `invoke` / `ainvoke` だけを持ち、ウォームアップなどのために `chat_model` は元のものを返す。
+    """
+
+    def __init__(
+        self,
+        model_alias: str,
+        client: Any,
+        config: TimeoutConfig,
+        *,
+        window: LatencyWindow | None = None,
+    ) -> None:
+        self.model_alias = model_alias
+        self.client = client
+        self.config = config
+        self.window = window if window is not None else LatencyWindow(DEFAULT_WINDOW)
+        self._consecutive_timeouts = 0
+        self._lock = threading.Lock()
+
+    @property
+    def chat_model(self) -> Any:
+        return self.client.chat_model
+
+    def deadline(self) -> float | None:
+        """次のリクエストの期限（秒）。サンプル不足なら read の上限（未設定なら None）。"""
+
+        config = self.config
+        if len(self.window) < config.min_samples:
+            return config.read
+        quantile = self.window.quantile(config.percentile)
+        if quantile is None:
+            return config.read
+        backoff = 2 ** min(self._consecutive_timeouts, MAX_BACKOFF_EXPONENT)
+        seconds = max(config.floor, quantile * config.multiplier * backoff)
+        return seconds if config.read is None else min(seconds, config.read)
+
+    def invoke(self, messages: Sequence[Any], **kwargs) -> Any:
+        return run_on_background_loop(self.ainvoke(messages, **kwargs))
+
+    async def ainvoke(self, messages: Sequence[Any], **kwargs) -> Any:
+        deadline = self.deadline()
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(self.client.ainvoke(messages, **kwargs), timeout=deadline)
+        except asyncio.TimeoutError:
+            # 打ち切った呼び出しも少なくとも deadline かかっていた。入れないと遅い側が窓から消え期限が縮み続ける
+            if deadline is not None:
+                self.window.add(deadline)
+            with self._lock:
+                self._consecutive_timeouts += 1
+            raise LLMTimeoutError(self.model_alias, deadline) from None
+        self.window.add(time.perf_counter() - started)
+        with self._lock:
+            self._consecutive_timeouts = 0
+        return result
+
+
+__all__ = [
+    "LLMTimeoutError",
+    "is_timeout_error",
+    "DeadlineClient",
+]
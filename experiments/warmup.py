@@ -0,0 +1,162 @@
+"""スイープ開始前のモデルロードと接続プールのウォームアップ。
+
+Ollama は空プロンプトの `/api/generate`（`keep_alive` 付き）でモデルだけをロードし、
+OpenAI 互換 / Anthropic はモデル一覧 API を叩いて TLS ハンドシェイク済みの接続を
+クライアントの接続プールに残す。各エンドポイントについて 1 回目（コールドスタート）と
+2 回目（ウォーム）の所要時間を分けて記録する。
+"""
+from __future__ import annotations
+
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Iterable, List, Tuple
+
+from experiments.runner import append_jsonl_record
+from src.config import get_model_config
+
+WARMUP_LOG_FILENAME = "warmup.jsonl"
+# Ollama がモデルを読み込み直す原因になる options
+LOAD_OPTION_KEYS = ("num_ctx", "num_batch", "num_gpu", "num_thread")
+
+
+@dataclass
+class WarmupResult:
+    """1モデル分のウォームアップ結果。"""
+
+    alias: str
+    provider: str
+    endpoint: str
+    ok: bool
+    model_loaded: bool = False
+    cold_seconds: float | None = None
+    warm_seconds: float | None = None
+    detail: str = ""
+
+
+def _timed(action: Callable[[], Any]) -> float:
+    started = time.perf_counter()
+    action()
+    return time.perf_counter() - started
+
+
+def _warm_up_action(model_config, chat_model, *, load_model: bool) -> Tuple[str, Callable[[], Any] | None]:
+    """(エンドポイント, 計測する呼び出し) を返す。軽い呼び出しがないプロバイダは None。"""
+
+    provider = model_config.provider
+    endpoint = model_config.base_url or ""
+    if provider == "ollama":
+        ollama_client = chat_model._client
+        # ロード時の値と異なると最初のターンで読み込み直しになるため、プロファイルの値で載せる
+        load_options = {
+            key: getattr(model_config, key, None)
+            for key in LOAD_OPTION_KEYS
+            if getattr(model_config, key, None) is not None
+        }
+
+        def action() -> None:
+            if load_model:
+                # 空プロンプトの generate はモデルのロードのみを行う
+                ollama_client.generate(
+                    model=model_config.model,
+                    keep_alive=model_config.keep_alive,
+                    options=load_options or None,
+                )
+            else:
+                ollama_client.ps()
+
+        return endpoint or "http://localhost:11434", action
+    if provider == "openai":
+        root_client = chat_model.root_client
+
+        def action() -> None:
+            root_client.models.list()
+
+        return endpoint or "https://api.openai.com/v1", action
+    if provider == "anthropic":
+        anthropic_client = chat_model._client
+
+        def action() -> None:
+            anthropic_client.models.list(limit=1)
+
+        return endpoint or "https://api.anthropic.com", action
+    return endpoint, None
+
+
+def warm_up_model(alias: str, client, *, load_model: bool = True) -> WarmupResult:
+    """エイリアスに対応するクライアントでモデルロードと接続確立を済ませる。
+
+    `load_model=False` の Ollama は `/api/ps` だけを叩き、接続のみ確立してモデルは載せない
+    （同時常駐数が少ないホストで、すぐには使わないモデルを載せて入れ替えを招かないため）。
+    ウォームアップは失敗しても試合を止めず、`ok=False` の結果を返す。
+    """
+
+    model_config = get_model_config(alias)
+    provider = model_config.provider
+    endpoint = model_config.base_url or ""
+    try:
+        endpoint, action = _warm_up_action(model_config, client.chat_model, load_model=load_model)
+    except AttributeError as exc:
+        # LangChain の LLMClient 以外（テスト用の代役・ゲートウェイのクライアントなど）は内部のクライアントを持たない
+        return WarmupResult(
+            alias, provider, endpoint, ok=False, detail=f"unsupported client {type(client).__name__}: {exc}"
+        )
+    if action is None:
+        return WarmupResult(alias, provider, endpoint, ok=True, detail="skipped: no lightweight warm-up call")
+
+    try:
+        cold = _timed(action)
+        warm = _timed(action)
+    except Exception as exc:
+        return WarmupResult(alias, provider, endpoint, ok=False, detail=str(exc))
+    return WarmupResult(
+        alias,
+        provider,
+        endpoint,
+        ok=True,
+        model_loaded=provider == "ollama" and load_model,
+        cold_seconds=cold,
+        warm_seconds=warm,
+    )
+
+
+def warm_up_models(
+    aliases: Iterable[str],
+    client_for: Callable[[str], Any],
+    *,
+    log_dir: Path | None = None,
+    connect_only: Iterable[str] = (),
+) -> List[WarmupResult]:
+    """全エイリアスをウォームアップし、結果を表示・記録する。
+
+    `client_for` には実行時と同じクライアントキャッシュを渡すこと。別インスタンスを
+    作ると確立した接続がプールに残らず、ウォームアップの意味がなくなる。
+    `connect_only` に含めたエイリアスは接続だけを確立する。
+    """
+
+    skip_load = set(connect_only)
+    results: List[WarmupResult] = []
+    # 接続のみのものを先に処理し、実際にロードするモデルが最後に常駐するようにする
+    for alias in sorted(set(aliases) | skip_load, key=lambda name: (name not in skip_load, name)):
+        result = warm_up_model(alias, client_for(alias), load_model=alias not in skip_load)
+        results.append(result)
+        if not result.ok:
+            print(f"WARNING: warm-up failed for {alias} ({result.endpoint}): {result.detail}")
+        elif result.cold_seconds is None:
+            print(f"[warmup] {alias}: {result.detail}")
+        else:
+            print(
+                f"[warmup] {alias}: cold={result.cold_seconds:.2f}s warm={result.warm_seconds:.2f}s "
+                f"({result.endpoint})"
+            )
+        if log_dir is not None:
+            log_dir.mkdir(parents=True, exist_ok=True)
+            append_jsonl_record(
+                log_dir / WARMUP_LOG_FILENAME,
+                {"timestamp": datetime.now(timezone.utc).isoformat(), **asdict(result)},
+            )
+    return results
+
+
+__all__ = ["WARMUP_LOG_FILENAME", "WarmupResult", "warm_up_model", "warm_up_models"]
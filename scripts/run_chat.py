@@ -1,32 +1,135 @@
-"""設定済みモデルでLLMに問い合わせる最小CLI。"""
+"""設定済みモデルでLLMに問い合わせる最小CLI。
+
+`--input prompts.jsonl` を付けると、1行1件のプロンプトを1プロセスでまとめて処理し、
+入力と同じ順で結果を `--output`（省略時は標準出力）へ JSONL で書き出す。
+入力行は `{"id": ..., "system_prompt": ..., "user_prompt": ...}` で、
+`system_prompt` を省略した行には位置引数の system_prompt を使う。
+"""
 from __future__ import annotations
 
 import argparse
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
 
+import orjson
 from langchain_core.messages import HumanMessage, SystemMessage
 
+from src.api.client import LLMClient
 from src.config import DEFAULT_MODELS_PATH, create_client_from_model_name
 
+DEFAULT_MAX_CONCURRENCY = 8
+
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(
         description="config/models.yaml で定義したモデル名を使って問い合わせます。"
     )
     parser.add_argument("model_name", help="models.yaml に定義したモデル名")
-    parser.add_argument("system_prompt", help="システムメッセージ")
-    parser.add_argument("user_prompt", help="ユーザープロンプト")    
+    parser.add_argument("system_prompt", nargs="?", default=None, help="システムメッセージ")
+    parser.add_argument("user_prompt", nargs="?", default=None, help="ユーザープロンプト（--input 時は不要）")
     parser.add_argument(
         "--stream",
         action="store_true",
         help="応答をストリーミング表示",
     )
-    return parser.parse_args()
+    parser.add_argument("--input", type=Path, default=None, help="1行1件のプロンプトを書いた JSONL")
+    parser.add_argument("--output", type=Path, default=None, help="結果の JSONL（省略時は標準出力）")
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=DEFAULT_MAX_CONCURRENCY,
+        help="--input 時に同時に送るリクエスト数の上限（default: %(default)s）",
+    )
+    args = parser.parse_args()
+    if args.input is None and (args.system_prompt is None or args.user_prompt is None):
+        parser.error("system_prompt and user_prompt are required unless --input is given")
+    if args.input is not None and args.stream:
+        parser.error("--stream cannot be combined with --input")
+    if args.max_concurrency < 1:
+        parser.error("--max-concurrency must be >= 1")
+    return args
+
+
+def iter_prompt_chunks(path: Path, size: int) -> Iterator[List[Dict[str, Any]]]:
+    """入力 JSONL を size 件ずつ読み、行番号（1始まり）を `line` に入れて返す。"""
+
+    chunk: List[Dict[str, Any]] = []
+    with path.open("rb") as fh:
+        for line_number, line in enumerate(fh, start=1):
+            if not line.strip():
+                continue
+            try:
+                item = orjson.loads(line)
+            except orjson.JSONDecodeError as exc:
+                item = {"error": f"JSON の読み込みに失敗しました: {exc}"}
+            if not isinstance(item, dict):
+                item = {"error": "各行は JSON オブジェクトである必要があります。"}
+            item["line"] = line_number
+            chunk.append(item)
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def run_batch(client: LLMClient, args: argparse.Namespace) -> int:
+    """--input の全件を処理し、失敗した件数を返す。"""
+
+    output = args.output.open("wb") if args.output else sys.stdout.buffer
+    failures = total = 0
+    try:
+        # 結果を入力順に逐次書き出せるよう、同時実行数の数倍ずつまとめて送る
+        for chunk in iter_prompt_chunks(args.input, args.max_concurrency * 8):
+            requests = [
+                item for item in chunk if "error" not in item and item.get("user_prompt")
+            ]
+            replies = client.batch(
+                [
+                    [
+                        SystemMessage(content=item.get("system_prompt") or args.system_prompt or ""),
+                        HumanMessage(content=item["user_prompt"]),
+                    ]
+                    for item in requests
+                ],
+                max_concurrency=args.max_concurrency,
+            )
+            by_line = {item["line"]: reply for item, reply in zip(requests, replies)}
+            for item in chunk:
+                result: Dict[str, Any] = {"line": item["line"], "model_name": args.model_name}
+                if "id" in item:
+                    result["id"] = item["id"]
+                reply = by_line.get(item["line"])
+                if reply is None:
+                    result["error"] = item.get("error") or "user_prompt がありません。"
+                elif isinstance(reply, Exception):
+                    result["error"] = f"{type(reply).__name__}: {reply}"
+                else:
+                    result["response"] = reply.content
+                    usage = getattr(reply, "usage_metadata", None)
+                    if usage:
+                        result["usage"] = dict(usage)
+                failures += "error" in result
+                total += 1
+                output.write(orjson.dumps(result) + b"\n")
+            output.flush()
+    finally:
+        if args.output:
+            output.close()
+    print(f"{total} prompts processed, {failures} failed", file=sys.stderr)
+    return failures
 
 
 def main() -> None:
     args = parse_args()
     client = create_client_from_model_name(args.model_name)
-    print(f"Using model configuration: {args.model_name}")
+    print(f"Using model configuration: {args.model_name}", file=sys.stderr if args.input else sys.stdout)
+
+    if args.input is not None:
+        if run_batch(client, args):
+            raise SystemExit(1)
+        return
 
     messages = [
         SystemMessage(content=args.system_prompt),
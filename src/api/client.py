@@ -1,7 +1,7 @@
 """LangChainチャットモデルを扱う軽量ラッパー。"""
 from __future__ import annotations
 
-from typing import AsyncIterator, Iterable, Sequence
+from typing import AsyncIterator, Iterable, List, Sequence
 
 from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_core.messages import BaseMessage
@@ -21,6 +21,11 @@ class LLMClient:
         # 内部で利用するLangChainチャットモデルを保持
         self._chat_model = chat_model
 
+    @property
+    def chat_model(self) -> BaseChatModel:
+        """内部のLangChainチャットモデル（接続プールの再利用や事前ウォームアップ用）。"""
+        return self._chat_model
+
     @classmethod
     def from_provider(cls, provider: BaseProvider) -> "LLMClient":
         # 任意のプロバイダからモデルを生成してLLMClientを構築
@@ -54,13 +59,47 @@ class LLMClient:
         provider = AnthropicProvider(settings=settings)
         return cls.from_provider(provider)
 
-    def invoke(self, messages: Sequence[BaseMessage], **kwargs) -> BaseMessage:
+    def _model_with_seed(self, seed: int | None) -> BaseChatModel:
+        """`seed` を持つモデル（Ollama・OpenAI 互換）ならその呼び出しだけ seed を差し替える。
+
+        持たないプロバイダでは seed を無視する。コピーは HTTP クライアントを共有する。
+        """
+        if seed is None or "seed" not in type(self._chat_model).model_fields:
+            return self._chat_model
+        return self._chat_model.model_copy(update={"seed": seed})
+
+    def invoke(self, messages: Sequence[BaseMessage], *, seed: int | None = None, **kwargs) -> BaseMessage:
         # 同期的にメッセージを送信し最終応答を取得
-        return self._chat_model.invoke(messages, **kwargs)
+        return self._model_with_seed(seed).invoke(messages, **kwargs)
 
-    async def ainvoke(self, messages: Sequence[BaseMessage], **kwargs) -> BaseMessage:
+    async def ainvoke(self, messages: Sequence[BaseMessage], *, seed: int | None = None, **kwargs) -> BaseMessage:
         # 非同期APIでメッセージを送信し応答を得る
-        return await self._chat_model.ainvoke(messages, **kwargs)
+        return await self._model_with_seed(seed).ainvoke(messages, **kwargs)
+
+    def batch(
+        self,
+        inputs: Sequence[Sequence[BaseMessage]],
+        *,
+        max_concurrency: int | None = None,
+        **kwargs,
+    ) -> List[BaseMessage | Exception]:
+        """複数の会話をまとめて送信し、入力と同じ順で応答を返す。
+
+        失敗した要素は例外オブジェクトとして返し、他の要素の処理は止めない。
+        """
+        config = {"max_concurrency": max_concurrency} if max_concurrency else None
+        return self._chat_model.batch(list(inputs), config=config, return_exceptions=True, **kwargs)
+
+    async def abatch(
+        self,
+        inputs: Sequence[Sequence[BaseMessage]],
+        *,
+        max_concurrency: int | None = None,
+        **kwargs,
+    ) -> List[BaseMessage | Exception]:
+        """`batch` の非同期版。同時実行数は `max_concurrency` で抑える。"""
+        config = {"max_concurrency": max_concurrency} if max_concurrency else None
+        return await self._chat_model.abatch(list(inputs), config=config, return_exceptions=True, **kwargs)
 
     def stream(self, messages: Sequence[BaseMessage], **kwargs) -> Iterable[str]:
         # ストリーミングで逐次トークンを受け取り文字列として返す
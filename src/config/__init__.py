@@ -1,16 +1,36 @@
-"""設定読み込み機能の公開。"""
-from .models import (
-    DEFAULT_MODELS_PATH,
-    create_client_from_model_name,
-    get_model_config,
-    list_model_names,
-    load_model_registry,
+"""設定読み込み機能の公開。
+
+`src` の読み込み時に `.env` を読むため `src.config.env` は常に import されるが、
+LangChain を読み込む `models` は最初に使われた時点で import する
+（ゲートウェイの薄いクライアントなどを軽く保つため）。
+"""
+from __future__ import annotations
+
+from typing import Any
+
+_MODEL_EXPORTS = (
+    "DEFAULT_MODELS_PATH",
+    "create_client_from_model_name",
+    "get_model_config",
+    "list_model_names",
+    "load_model_registry",
+    "split_model_name",
 )
 
+
+def __getattr__(name: str) -> Any:
+    if name in _MODEL_EXPORTS:
+        from . import models
+
+        return getattr(models, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 __all__ = [
     "DEFAULT_MODELS_PATH",
     "create_client_from_model_name",
     "get_model_config",
     "list_model_names",
     "load_model_registry",
+    "split_model_name",
 ]
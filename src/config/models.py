@@ -1,8 +1,12 @@
-"""モデル設定の読み込みとLLMクライアント生成。"""
+"""モデル設定の読み込みとLLMクライアント生成。
+
+各モデルは `profiles` に推論オプション（`num_ctx` / `num_batch` / `max_tokens` など）の組を名前付きで持てる。
+`profile` で既定のプロファイルを選び、`<モデル名>@<プロファイル名>` と書けばその組で上書きした設定になる。
+"""
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Dict, Literal, Optional, Union
+from typing import Any, Dict, List, Literal, Optional, Tuple, Union
 
 import yaml
 from pydantic import BaseModel, Field, ValidationError
@@ -12,6 +16,26 @@ from src.api.client import LLMClient
 
 PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
 DEFAULT_MODELS_PATH = PROJECT_ROOT / "config" / "models.yaml"
+PROFILE_SEPARATOR = "@"
+
+
+class TimeoutConfig(BaseModel):
+    """リクエストのタイムアウト設定（秒）。
+
+    `connect` / `read` は HTTP クライアントに渡す上限。`adaptive` を有効にすると、
+    `experiments` の実行時にモデル・エンドポイント別の直近レイテンシの `percentile` 分位点 ×
+    `multiplier` を1リクエストの期限とする（`floor` 以上 `read` 以下）。
+    """
+
+    connect: Optional[float] = Field(default=10.0, gt=0)
+    read: Optional[float] = Field(default=600.0, gt=0)
+    adaptive: bool = False
+    percentile: float = Field(default=99.0, gt=0, lt=100)
+    multiplier: float = Field(default=3.0, ge=1.0)
+    floor: float = Field(default=15.0, gt=0)
+    min_samples: int = Field(default=20, ge=1)
+
+    model_config = ConfigDict(extra="forbid")
 
 
 class ModelConfig(BaseModel):
@@ -30,14 +54,43 @@ class ModelConfig(BaseModel):
     max_output_tokens: Optional[int] = Field(default=None, description="最大出力トークン数")
     max_tokens: Optional[int] = Field(default=None, description="OpenAI出力トークン上限")
     description: Optional[str] = Field(default=None, description="用途のメモ")
+    profile: Optional[str] = Field(default=None, description="既定で適用するチューニングプロファイル名")
+    profiles: Dict[str, Dict[str, Any]] = Field(
+        default_factory=dict, description="プロファイル名→プロバイダへ渡す推論オプション"
+    )
+    replicas: List[str] = Field(
+        default_factory=list, description="同じモデルを提供する別エンドポイントのモデル名（ヘッジ先）"
+    )
+    timeouts: TimeoutConfig = Field(default_factory=TimeoutConfig, description="接続・読み取りタイムアウト")
 
     model_config = ConfigDict(extra="allow")
 
-    def to_provider_kwargs(self) -> Dict[str, object]:
-        """プロバイダ生成時に渡すキーワード引数を返す。"""
+    def with_profile(self, profile: Optional[str]) -> "ModelConfig":
+        """指定プロファイルの値で上書きした設定を返す（None ならプロファイルを適用しない）。"""
+        if profile is not None and profile not in self.profiles:
+            available = ", ".join(sorted(self.profiles)) or "なし"
+            raise KeyError(f"プロファイル '{profile}' は定義されていません。利用可能: {available}")
         data = self.model_dump()
-        data.pop("provider", None)
-        data.pop("description", None)
+        overrides = self.profiles.get(profile, {}) if profile is not None else {}
+        data.update(overrides)
+        if "timeouts" in overrides:
+            # プロファイルの timeouts は既定値ではなく元の設定に重ねる
+            data["timeouts"] = {**self.timeouts.model_dump(), **overrides["timeouts"]}
+        data["profile"] = None
+        return ModelConfig.model_validate(data)
+
+    def resolved(self) -> "ModelConfig":
+        """既定のプロファイルを適用した設定を返す。"""
+        return self.with_profile(self.profile) if self.profile is not None else self
+
+    def to_provider_kwargs(self) -> Dict[str, object]:
+        """プロバイダ生成時に渡すキーワード引数を返す（既定のプロファイルを適用済み）。"""
+        data = self.resolved().model_dump()
+        for key in ("provider", "description", "profile", "profiles", "replicas"):
+            data.pop(key, None)
+        timeouts = data.pop("timeouts")
+        data["connect_timeout"] = timeouts["connect"]
+        data["read_timeout"] = timeouts["read"]
         return {k: v for k, v in data.items() if v is not None}
 
 
@@ -70,18 +123,31 @@ def list_model_names(config_path: Path | None = None) -> list[str]:
     return list(load_model_registry(config_path).models.keys())
 
 
+def split_model_name(name: str) -> Tuple[str, Optional[str]]:
+    """`<モデル名>@<プロファイル名>` を (モデル名, プロファイル名) に分ける。"""
+
+    alias, separator, profile = name.rpartition(PROFILE_SEPARATOR)
+    if not separator:
+        return name, None
+    return alias, profile
+
+
 def get_model_config(name: str, config_path: Union[Path, str, None] = None) -> ModelConfig:
-    """指定名のモデル設定を取得。"""
+    """指定名のモデル設定を取得（`@プロファイル名` 付きならそのプロファイルを適用する）。"""
 
     registry = load_model_registry(Path(config_path) if config_path else None)
-    if name not in registry.models:
+    alias, profile = split_model_name(name)
+    if alias not in registry.models:
         available = ", ".join(sorted(registry.models))
-        raise KeyError(f"モデル名 '{name}' は設定に存在しません。利用可能: {available}")
-    return registry.models[name]
+        raise KeyError(f"モデル名 '{alias}' は設定に存在しません。利用可能: {available}")
+    model_config = registry.models[alias]
+    if profile is None:
+        return model_config.resolved()
+    return model_config.with_profile(profile)
 
 
 def create_client_from_model_name(name: str, *, config_path: Union[Path, str, None] = None) -> LLMClient:
-    """設定ファイル上のモデル名からLLMClientを生成する。"""
+    """設定ファイル上のモデル名（`@プロファイル名` 付き可）からLLMClientを生成する。"""
 
     model_config = get_model_config(name, Path(config_path) if config_path else None)
     kwargs = model_config.to_provider_kwargs()
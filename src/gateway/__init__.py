@@ -0,0 +1,18 @@
+"""常駐推論ゲートウェイの薄いクライアント（サーバは `src.gateway.server`）。"""
+from .client import (
+    BATCH_PRIORITY,
+    DEFAULT_GATEWAY_URL,
+    INTERACTIVE_PRIORITY,
+    GatewayClient,
+    GatewayError,
+    GatewayReply,
+)
+
+__all__ = [
+    "BATCH_PRIORITY",
+    "DEFAULT_GATEWAY_URL",
+    "INTERACTIVE_PRIORITY",
+    "GatewayClient",
+    "GatewayError",
+    "GatewayReply",
+]
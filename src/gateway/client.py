@@ -0,0 +1,192 @@
+"""推論ゲートウェイ（`src.gateway.server`）へ問い合わせる薄いクライアント。
+
+標準ライブラリと orjson だけで動き、LangChain やプロバイダ SDK を読み込まないため、
+ノートブックや短命なスクリプトでも起動が速い。`LLMClient` と同じ
+`invoke` / `ainvoke` / `batch` / `abatch` / `stream` を持つ。
+
+接続先は引数か環境変数 `WOLF_GATEWAY_URL`（`http://127.0.0.1:8765` や
+`unix:///tmp/wolf-gateway.sock`）で指定する。
+"""
+from __future__ import annotations
+
+import asyncio
+import http.client
+import os
+import socket
+import threading
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, Iterable, List, Sequence
+from urllib.parse import urlsplit
+
+import orjson
+
+DEFAULT_GATEWAY_URL = "http://127.0.0.1:8765"
+INTERACTIVE_PRIORITY = 0
+BATCH_PRIORITY = 10
+
+_ROLES = {"human": "user", "ai": "assistant", "system": "system", "tool": "tool"}
+
+
+class GatewayError(RuntimeError):
+    """ゲートウェイがエラーを返した。"""
+
+
+@dataclass
+class GatewayReply:
+    """応答1件。`content` / `usage_metadata` / `response_metadata` は AIMessage と同じ名前。"""
+
+    content: Any
+    usage_metadata: Dict[str, Any] = field(default_factory=dict)
+    response_metadata: Dict[str, Any] = field(default_factory=dict)
+    latency_seconds: float | None = None
+    cached: bool = False
+
+    def to_message(self):
+        """LangChain の AIMessage に変換する（必要なときだけ LangChain を読み込む）。"""
+
+        from langchain_core.messages import AIMessage
+
+        return AIMessage(
+            content=self.content,
+            usage_metadata=self.usage_metadata or None,
+            response_metadata=self.response_metadata,
+        )
+
+
+def _message_to_dict(message: Any) -> Any:
+    if isinstance(message, (dict, tuple, list, str)):
+        return message
+    role = _ROLES.get(getattr(message, "type", ""), getattr(message, "type", "user"))
+    return {"role": role, "content": message.content}
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path: str, timeout: float | None) -> None:
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class GatewayClient:
+    """1つのモデル名に紐づいたゲートウェイ経由のクライアント。
+
+    `priority` は小さいほど先に処理される。対話的な利用は既定の 0、
+    スイープなどの大量実行は `BATCH_PRIORITY` を指定すると対話の呼び出しを妨げない。
+    `cache=True` にすると同じモデル・メッセージ・引数の応答をゲートウェイのキャッシュから返す。
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        *,
+        url: str | None = None,
+        priority: int = INTERACTIVE_PRIORITY,
+        cache: bool = False,
+        timeout: float | None = 600.0,
+    ) -> None:
+        self.model_name = model_name
+        self.url = url or os.environ.get("WOLF_GATEWAY_URL", DEFAULT_GATEWAY_URL)
+        self.priority = priority
+        self.cache = cache
+        self.timeout = timeout
+        # スレッドごとに keep-alive の接続を持つ
+        self._local = threading.local()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            parts = urlsplit(self.url)
+            if parts.scheme == "unix":
+                connection = _UnixHTTPConnection(parts.path, self.timeout)
+            else:
+                connection = http.client.HTTPConnection(parts.hostname or "127.0.0.1", parts.port or 80, timeout=self.timeout)
+            self._local.connection = connection
+        return connection
+
+    def _request(self, method: str, path: str, body: Dict[str, Any] | None = None) -> Dict[str, Any]:
+        data = orjson.dumps(body) if body is not None else None
+        headers = {"Content-Type": "application/json"} if data is not None else {}
+        for attempt in range(2):
+            connection = self._connection()
+            try:
+                connection.request(method, path, body=data, headers=headers)
+                response = connection.getresponse()
+                payload = orjson.loads(response.read())
+                break
+            except (ConnectionError, http.client.HTTPException, OSError) as exc:
+                connection.close()
+                self._local.connection = None
+                # サーバ側で閉じられた keep-alive 接続は1回だけ張り直す
+                if attempt == 1 or isinstance(exc, TimeoutError):
+                    raise GatewayError(f"ゲートウェイ {self.url} に接続できません: {exc}") from exc
+        if response.status != 200:
+            raise GatewayError(payload.get("error") or f"HTTP {response.status}")
+        return payload
+
+    def _payload(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        return {"model": self.model_name, "priority": self.priority, "cache": self.cache, "kwargs": kwargs}
+
+    def invoke(self, messages: Sequence[Any], **kwargs) -> GatewayReply:
+        body = {**self._payload(kwargs), "messages": [_message_to_dict(message) for message in messages]}
+        return GatewayReply(**self._request("POST", "/v1/invoke", body))
+
+    async def ainvoke(self, messages: Sequence[Any], **kwargs) -> GatewayReply:
+        return await asyncio.to_thread(self.invoke, messages, **kwargs)
+
+    def batch(
+        self,
+        inputs: Sequence[Sequence[Any]],
+        *,
+        max_concurrency: int | None = None,
+        **kwargs,
+    ) -> List[GatewayReply | Exception]:
+        """入力順の応答を返す。失敗した要素は GatewayError として返す。
+
+        同時実行数はゲートウェイ側のワーカー数で決まるため、`max_concurrency` は
+        `LLMClient.batch` との互換のために受け取るだけで使わない。
+        """
+
+        body = {
+            **self._payload(kwargs),
+            "inputs": [[_message_to_dict(message) for message in messages] for messages in inputs],
+        }
+        return [
+            GatewayError(result["error"]) if "error" in result else GatewayReply(**result)
+            for result in self._request("POST", "/v1/batch", body)["results"]
+        ]
+
+    async def abatch(
+        self,
+        inputs: Sequence[Sequence[Any]],
+        *,
+        max_concurrency: int | None = None,
+        **kwargs,
+    ) -> List[GatewayReply | Exception]:
+        return await asyncio.to_thread(self.batch, inputs, max_concurrency=max_concurrency, **kwargs)
+
+    def stream(self, messages: Sequence[Any], **kwargs) -> Iterable[str]:
+        # ゲートウェイは応答をまとめて返すため、全文を1チャンクとして返す
+        yield str(self.invoke(messages, **kwargs).content)
+
+    async def astream(self, messages: Sequence[Any], **kwargs) -> AsyncIterator[str]:
+        yield str((await self.ainvoke(messages, **kwargs)).content)
+
+    def models(self) -> List[str]:
+        return self._request("GET", "/v1/models")["models"]
+
+    def stats(self) -> Dict[str, Any]:
+        return self._request("GET", "/v1/stats")
+
+
+__all__ = [
+    "DEFAULT_GATEWAY_URL",
+    "INTERACTIVE_PRIORITY",
+    "BATCH_PRIORITY",
+    "GatewayError",
+    "GatewayReply",
+    "GatewayClient",
+]
@@ -0,0 +1,425 @@
+"""LLMClient を常駐プロセスで共有するローカル推論ゲートウェイ。
+
+ノートブック・スクリプト・実験がそれぞれクライアントや接続を作る代わりに、
+このデーモンがモデルごとの LLMClient（接続プール）・レート制限・応答キャッシュを保持し、
+localhost の HTTP か Unix ソケットで `invoke` / `batch` を受け付ける。
+
+リクエストは優先度付きキューに積まれ、値の小さいものから処理する
+（既定は対話用の 0、`src.gateway.client.BATCH_PRIORITY` を付けたスイープは後回し）。
+
+```bash
+python -m src.gateway.server --port 8765 --workers 16
+python -m src.gateway.server --socket /tmp/wolf-gateway.sock
+```
+
+エンドポイント:
+
+- `POST /v1/invoke`: `{"model", "messages", "priority"?, "cache"?, "kwargs"?}` → 応答1件
+- `POST /v1/batch`: `{"model", "inputs": [messages, ...], ...}` → 入力順の `results`（失敗は `error`）
+- `GET /v1/models` / `GET /v1/stats`: 利用可能なモデル名 / キュー長・キャッシュ・モデル別の処理数
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import heapq
+import itertools
+import os
+import queue
+import socketserver
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import orjson
+from langchain_core.messages import convert_to_messages
+
+from src.api.client import LLMClient
+from src.config import create_client_from_model_name, get_model_config, list_model_names
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = 16
+DEFAULT_CACHE_SIZE = 4096
+
+
+class RateLimiter:
+    """1分あたりのリクエスト数を制限するトークンバケット。"""
+
+    def __init__(self, requests_per_minute: float) -> None:
+        self.rate = requests_per_minute / 60.0
+        self.capacity = max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> float:
+        """トークンが取れれば 0 を、取れなければ次に取れるまでの秒数を返す（待たない）。"""
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self) -> None:
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+
+class ResponseCache:
+    """(モデル, メッセージ, 引数) をキーにした LRU の応答キャッシュ。"""
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, Dict[str, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(model: str, messages: List[Any], kwargs: Dict[str, Any]) -> str:
+        payload = orjson.dumps([model, messages, kwargs], option=orjson.OPT_SORT_KEYS)
+        return hashlib.sha256(payload).hexdigest()
+
+    def get(self, key: str) -> Dict[str, Any] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, reply: Dict[str, Any]) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = reply
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+@dataclass(order=True)
+class _Job:
+    priority: int
+    sequence: int
+    model: str = field(compare=False)
+    messages: List[Any] = field(compare=False)
+    kwargs: Dict[str, Any] = field(compare=False)
+    cache_key: str | None = field(compare=False)
+    future: Future = field(compare=False, default_factory=Future)
+
+
+class GatewayError(Exception):
+    """HTTP ステータス付きでクライアントへ返すエラー。"""
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class Gateway:
+    """モデルごとの LLMClient・レート制限・応答キャッシュと、優先度付きの実行キューを持つ。"""
+
+    def __init__(
+        self,
+        *,
+        workers: int = DEFAULT_WORKERS,
+        cache_size: int = DEFAULT_CACHE_SIZE,
+        requests_per_minute: float | None = None,
+    ) -> None:
+        self.cache = ResponseCache(cache_size)
+        self.default_rpm = requests_per_minute
+        self.started = time.time()
+        self._clients: Dict[str, LLMClient] = {}
+        self._limiters: Dict[str, RateLimiter | None] = {}
+        self._setup_lock = threading.Lock()
+        self._queue: queue.PriorityQueue[_Job] = queue.PriorityQueue()
+        # レート制限で待たされているジョブ: (実行可能になる時刻, 連番, ジョブ) のヒープ
+        self._deferred: List[Tuple[float, int, _Job]] = []
+        self._deferred_lock = threading.Lock()
+        self._sequence = itertools.count()
+        self._stats_lock = threading.Lock()
+        self._counts: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self._in_flight = 0
+        for index in range(workers):
+            threading.Thread(target=self._worker, name=f"gateway-worker-{index}", daemon=True).start()
+
+    def client_for(self, model: str) -> Tuple[LLMClient, RateLimiter | None]:
+        """モデルのクライアントとレート制限を返す（初回に作成し、以後は使い回す）。"""
+
+        with self._setup_lock:
+            if model not in self._clients:
+                try:
+                    model_config = get_model_config(model)
+                except KeyError as exc:
+                    raise GatewayError(404, str(exc)) from exc
+                self._clients[model] = create_client_from_model_name(model)
+                # models.yaml の requests_per_minute（任意項目）が CLI の既定値より優先する
+                rpm = getattr(model_config, "requests_per_minute", None) or self.default_rpm
+                self._limiters[model] = RateLimiter(float(rpm)) if rpm else None
+            return self._clients[model], self._limiters[model]
+
+    def submit(
+        self,
+        model: str,
+        messages: List[Any],
+        *,
+        priority: int = 0,
+        cache: bool = False,
+        kwargs: Dict[str, Any] | None = None,
+    ) -> Future:
+        """1件をキューへ積み、応答の辞書で完了する Future を返す。"""
+
+        kwargs = kwargs or {}
+        self.client_for(model)
+        cache_key = ResponseCache.key(model, messages, kwargs) if cache else None
+        if cache_key is not None:
+            hit = self.cache.get(cache_key)
+            if hit is not None:
+                self._count(model, "cached")
+                future: Future = Future()
+                future.set_result({**hit, "cached": True})
+                return future
+        job = _Job(priority, next(self._sequence), model, messages, kwargs, cache_key)
+        self._queue.put(job)
+        return job.future
+
+    def _count(self, model: str, key: str) -> None:
+        with self._stats_lock:
+            self._counts[model][key] += 1
+
+    def _defer(self, job: _Job, wait: float) -> None:
+        with self._deferred_lock:
+            heapq.heappush(self._deferred, (time.monotonic() + wait, job.sequence, job))
+
+    def _release_deferred(self) -> float | None:
+        """実行可能になった保留ジョブをキューへ戻し、次の保留ジョブまでの秒数を返す。"""
+
+        with self._deferred_lock:
+            now = time.monotonic()
+            while self._deferred and self._deferred[0][0] <= now:
+                self._queue.put(heapq.heappop(self._deferred)[2])
+            return self._deferred[0][0] - now if self._deferred else None
+
+    def _next_job(self) -> _Job:
+        while True:
+            timeout = self._release_deferred()
+            try:
+                return self._queue.get(timeout=timeout)
+            except queue.Empty:
+                continue
+
+    def _worker(self) -> None:
+        while True:
+            job = self._next_job()
+            if job.future.cancelled():
+                continue
+            client, limiter = self.client_for(job.model)
+            # 制限中のモデルのジョブはワーカーを塞がずに保留し、他のモデルのジョブを先に処理する
+            if limiter is not None:
+                wait = limiter.try_acquire()
+                if wait > 0:
+                    self._defer(job, wait)
+                    continue
+            if not job.future.set_running_or_notify_cancel():
+                continue
+            with self._stats_lock:
+                self._in_flight += 1
+            started = time.perf_counter()
+            try:
+                reply = client.invoke(convert_to_messages(job.messages), **job.kwargs)
+            except Exception as exc:
+                self._count(job.model, "errors")
+                job.future.set_exception(exc)
+                continue
+            finally:
+                with self._stats_lock:
+                    self._in_flight -= 1
+            result = {
+                "content": reply.content,
+                "usage_metadata": dict(getattr(reply, "usage_metadata", None) or {}),
+                "response_metadata": _jsonable(getattr(reply, "response_metadata", None) or {}),
+                "latency_seconds": round(time.perf_counter() - started, 6),
+                "cached": False,
+            }
+            if job.cache_key is not None:
+                self.cache.put(job.cache_key, result)
+            self._count(job.model, "completed")
+            job.future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "uptime_seconds": round(time.time() - self.started, 1),
+                "queued": self._queue.qsize(),
+                "deferred": len(self._deferred),
+                "in_flight": self._in_flight,
+                "cache": {"entries": len(self.cache), "hits": self.cache.hits, "misses": self.cache.misses},
+                "models": {model: dict(counts) for model, counts in self._counts.items()},
+                "warm_clients": sorted(self._clients),
+            }
+
+
+def _jsonable(value: Any) -> Any:
+    return orjson.loads(orjson.dumps(value, default=str))
+
+
+def _error_body(exc: BaseException) -> Dict[str, str]:
+    return {"error": f"{type(exc).__name__}: {exc}"}
+
+
+class GatewayRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "WolfGateway/1.0"
+
+    @property
+    def gateway(self) -> Gateway:
+        return self.server.gateway  # type: ignore[attr-defined]
+
+    def address_string(self) -> str:
+        # Unix ソケットでは client_address が空文字になる
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        if self.server.verbose:  # type: ignore[attr-defined]
+            super().log_message(format, *args)
+
+    def _send(self, status: int, body: Any) -> None:
+        data = orjson.dumps(body)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        if self.path == "/v1/models":
+            self._send(200, {"models": list_model_names()})
+        elif self.path == "/v1/stats":
+            self._send(200, self.gateway.stats())
+        else:
+            self._send(404, {"error": f"unknown path: {self.path}"})
+
+    def do_POST(self) -> None:
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            payload = orjson.loads(self.rfile.read(length))
+            if self.path == "/v1/invoke":
+                self._send(200, self._submit(payload, payload["messages"]).result())
+            elif self.path == "/v1/batch":
+                futures = [self._submit(payload, messages) for messages in payload["inputs"]]
+                results = []
+                for future in futures:
+                    try:
+                        results.append(future.result())
+                    except Exception as exc:  # 1件の失敗で他の結果を捨てない
+                        results.append(_error_body(exc))
+                self._send(200, {"results": results})
+            else:
+                self._send(404, {"error": f"unknown path: {self.path}"})
+        except GatewayError as exc:
+            self._send(exc.status, {"error": str(exc)})
+        except (KeyError, TypeError, ValueError) as exc:
+            self._send(400, _error_body(exc))
+        except Exception as exc:
+            self._send(502, _error_body(exc))
+
+    def _submit(self, payload: Dict[str, Any], messages: List[Any]) -> Future:
+        return self.gateway.submit(
+            payload["model"],
+            messages,
+            priority=int(payload.get("priority", 0)),
+            cache=bool(payload.get("cache", False)),
+            kwargs=payload.get("kwargs") or {},
+        )
+
+
+class UnixGatewayServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(
+    gateway: Gateway,
+    *,
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    socket_path: Path | None = None,
+    verbose: bool = False,
+) -> None:
+    """ゲートウェイを HTTP（既定）か Unix ソケットで公開し、停止されるまで処理する。"""
+
+    if socket_path is not None:
+        if socket_path.exists():
+            socket_path.unlink()
+        server: socketserver.BaseServer = UnixGatewayServer(str(socket_path), GatewayRequestHandler)
+        address = f"unix://{socket_path}"
+    else:
+        server = ThreadingHTTPServer((host, port), GatewayRequestHandler)
+        address = f"http://{host}:{server.server_address[1]}"
+    server.gateway = gateway  # type: ignore[attr-defined]
+    server.verbose = verbose  # type: ignore[attr-defined]
+    print(f"Gateway listening on {address}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if socket_path is not None and socket_path.exists():
+            os.unlink(socket_path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve shared, warm LLM clients over localhost HTTP or a Unix socket")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="待ち受けアドレス（default: %(default)s）")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="待ち受けポート（default: %(default)s）")
+    parser.add_argument("--socket", type=Path, default=None, help="HTTP の代わりにこの Unix ソケットで待ち受ける")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="同時に処理するリクエスト数（default: %(default)s）")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE, help="応答キャッシュの最大件数（0 で無効）")
+    parser.add_argument(
+        "--requests-per-minute",
+        type=float,
+        default=None,
+        help="models.yaml に requests_per_minute が無いモデルに適用するレート上限",
+    )
+    parser.add_argument("--preload", nargs="*", default=(), help="起動時にクライアントを作っておくモデル名")
+    parser.add_argument("--verbose", action="store_true", help="リクエストごとのアクセスログを表示")
+    args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers must be >= 1")
+
+    gateway = Gateway(workers=args.workers, cache_size=args.cache_size, requests_per_minute=args.requests_per_minute)
+    for model in args.preload:
+        gateway.client_for(model)
+    serve(gateway, host=args.host, port=args.port, socket_path=args.socket, verbose=args.verbose)
+
+
+__all__ = [
+    "RateLimiter",
+    "ResponseCache",
+    "Gateway",
+    "GatewayError",
+    "serve",
+]
+
+
+if __name__ == "__main__":
+    main()
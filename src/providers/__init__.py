@@ -1,6 +1,6 @@
 """プロバイダ関連の公開インターフェース。"""
 from .base import BaseProvider
-from .ollama import OllamaProvider, OllamaSettings
+from .ollama import OllamaProvider, OllamaSettings, TunedChatOllama
 from .gemini import GeminiProvider, GeminiSettings
 from .openai import OpenAIProvider, OpenAISettings
 from .anthropic import AnthropicProvider, AnthropicSettings
@@ -9,6 +9,7 @@ __all__ = [
     "BaseProvider",
     "OllamaProvider",
     "OllamaSettings",
+    "TunedChatOllama",
     "GeminiProvider",
     "GeminiSettings",
     "OpenAIProvider",
@@ -18,6 +18,8 @@ class AnthropicSettings(BaseSettings):
     api_key: str = Field(..., env="ANTHROPIC_API_KEY", description="Anthropic APIキー")
     temperature: float = Field(default=0.3, ge=0.0, le=2.0)
     max_output_tokens: Optional[int] = Field(default=1024, description="最大出力トークン数")
+    connect_timeout: Optional[float] = Field(default=None, gt=0, description="接続タイムアウト（秒）")
+    read_timeout: Optional[float] = Field(default=None, gt=0, description="応答の読み取りタイムアウト（秒）")
 
     model_config = SettingsConfigDict(env_prefix="ANTHROPIC_", extra="ignore")
 
@@ -36,4 +38,7 @@ class AnthropicProvider(BaseProvider):
         }
         if self.settings.max_output_tokens is not None:
             kwargs["max_output_tokens"] = self.settings.max_output_tokens
+        if self.settings.read_timeout is not None:
+            # ChatAnthropic は秒数1つしか受け取らないため、読み取り側の値を全体の上限にする
+            kwargs["default_request_timeout"] = self.settings.read_timeout
         return ChatAnthropic(**kwargs)
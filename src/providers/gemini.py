@@ -20,6 +20,8 @@ class GeminiSettings(BaseSettings):
     temperature: float = Field(default=0.3, ge=0.0, le=2.0)
     top_p: float = Field(default=0.95, ge=0.0, le=1.0)
     max_output_tokens: Optional[int] = Field(default=5000, description="最大出力トークン数")
+    connect_timeout: Optional[float] = Field(default=None, gt=0, description="接続タイムアウト（秒）")
+    read_timeout: Optional[float] = Field(default=None, gt=0, description="応答の読み取りタイムアウト（秒）")
 
     model_config = SettingsConfigDict(env_prefix="GEMINI_", extra="ignore")
 
@@ -42,4 +44,7 @@ class GeminiProvider(BaseProvider):
         }
         if self.settings.max_output_tokens is not None:
             kwargs["max_output_tokens"] = self.settings.max_output_tokens
+        if self.settings.read_timeout is not None:
+            # Gemini クライアントは接続と読み取りを分けられないため、読み取り側の値を全体の上限にする
+            kwargs["timeout"] = self.settings.read_timeout
         return ChatGoogleGenerativeAI(**kwargs)
@@ -3,6 +3,7 @@ from __future__ import annotations
 
 from typing import Any, Dict, Optional
 
+import httpx
 from langchain_ollama import ChatOllama
 from langchain_core.language_models.chat_models import BaseChatModel
 from pydantic import Field
@@ -24,10 +25,31 @@ class OllamaSettings(BaseSettings):
     top_p: float = Field(default=0.95, ge=0.0, le=1.0)
     keep_alive: Optional[str] = Field(default=None, description="Ollamaのkeep-alive設定")
     streaming: bool = Field(default=False, description="デフォルトでストリーミング応答を有効にするか")
+    num_ctx: Optional[int] = Field(default=None, ge=1, description="コンテキスト長（トークン）")
+    num_predict: Optional[int] = Field(default=None, description="最大生成トークン数（-1 で無制限）")
+    num_batch: Optional[int] = Field(default=None, ge=1, description="プロンプト処理のバッチサイズ")
+    num_thread: Optional[int] = Field(default=None, ge=1, description="CPU スレッド数")
+    num_gpu: Optional[int] = Field(default=None, ge=0, description="GPU に載せるレイヤー数")
+    options: Dict[str, Any] = Field(default_factory=dict, description="その他の Ollama options（そのまま送る）")
+    connect_timeout: Optional[float] = Field(default=None, gt=0, description="接続タイムアウト（秒）")
+    read_timeout: Optional[float] = Field(default=None, gt=0, description="応答の読み取りタイムアウト（秒）")
 
     model_config = SettingsConfigDict(env_prefix="OLLAMA_", extra="ignore")
 
 
+class TunedChatOllama(ChatOllama):
+    """ChatOllama が属性として持たない Ollama の options（num_batch など）も送る。"""
+
+    extra_options: Dict[str, Any] = Field(default_factory=dict)
+
+    def _chat_params(self, messages, stop=None, **kwargs) -> Dict[str, Any]:
+        params = super()._chat_params(messages, stop, **kwargs)
+        if self.extra_options:
+            # 呼び出し時や属性で明示した値を優先する
+            params["options"] = {**self.extra_options, **params["options"]}
+        return params
+
+
 # Ollama設定からLangChainのChatOllamaインスタンスを生成するプロバイダ
 class OllamaProvider(BaseProvider):
     """設定に基づいて`ChatOllama`インスタンスを生成するファクトリ。"""
@@ -45,7 +67,21 @@ class OllamaProvider(BaseProvider):
             "top_p": self.settings.top_p,
             "streaming": self.settings.streaming,
             "keep_alive": self.settings.keep_alive,
+            "num_ctx": self.settings.num_ctx,
+            "num_predict": self.settings.num_predict,
+            "num_thread": self.settings.num_thread,
+            "num_gpu": self.settings.num_gpu,
         }
         # Noneの値を落としてOllama側のデフォルトを尊重する
         filtered_kwargs = {k: v for k, v in kwargs.items() if v is not None}
+        if self.settings.connect_timeout is not None or self.settings.read_timeout is not None:
+            # ollama.Client は残りの引数を httpx.Client へそのまま渡す
+            filtered_kwargs["client_kwargs"] = {
+                "timeout": httpx.Timeout(self.settings.read_timeout, connect=self.settings.connect_timeout)
+            }
+        extra_options = dict(self.settings.options)
+        if self.settings.num_batch is not None:
+            extra_options["num_batch"] = self.settings.num_batch
+        if extra_options:
+            return TunedChatOllama(extra_options=extra_options, **filtered_kwargs)
         return ChatOllama(**filtered_kwargs)
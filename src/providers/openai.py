@@ -3,6 +3,7 @@ from __future__ import annotations
 
 from typing import Any, Dict, Optional
 
+import httpx
 from langchain_openai import ChatOpenAI
 from langchain_core.language_models.chat_models import BaseChatModel
 from pydantic import Field
@@ -20,7 +21,13 @@ class OpenAISettings(BaseSettings):
     )
     base_url: Optional[str] = Field(default=None, description="OpenAI互換エンドポイントのURL")
     temperature: float = Field(default=0.3, ge=0.0, le=2.0)
+    top_p: Optional[float] = Field(default=None, ge=0.0, le=1.0)
     max_tokens: Optional[int] = Field(default=None, description="出力トークン上限")
+    extra_body: Optional[Dict[str, Any]] = Field(
+        default=None, description="リクエスト本文に追加する項目（vLLM の top_k・min_tokens など）"
+    )
+    connect_timeout: Optional[float] = Field(default=None, gt=0, description="接続タイムアウト（秒）")
+    read_timeout: Optional[float] = Field(default=None, gt=0, description="応答の読み取りタイムアウト（秒）")
 
     model_config = SettingsConfigDict(env_prefix="OPENAI_", extra="ignore")
 
@@ -47,6 +54,12 @@ class OpenAIProvider(BaseProvider):
         if self.settings.base_url is not None:
             kwargs["base_url"] = self.settings.base_url
 
+        if self.settings.top_p is not None:
+            kwargs["top_p"] = self.settings.top_p
         if self.settings.max_tokens is not None:
             kwargs["max_tokens"] = self.settings.max_tokens
+        if self.settings.extra_body:
+            kwargs["extra_body"] = self.settings.extra_body
+        if self.settings.connect_timeout is not None or self.settings.read_timeout is not None:
+            kwargs["timeout"] = httpx.Timeout(self.settings.read_timeout, connect=self.settings.connect_timeout)
         return ChatOpenAI(**kwargs)
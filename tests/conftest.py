@@ -0,0 +1,25 @@
+"""テスト共通のフィクスチャ。"""
+from __future__ import annotations
+
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+TEMPLATE_DIR = PROJECT_ROOT / "experiments" / "template_4player"
+
+
+@pytest.fixture
+def template_dir(tmp_path: Path) -> Path:
+    """template_4player の config.yaml / prompts.yaml を一時ディレクトリに複製する（ログもそこへ書かれる）。"""
+
+    target = tmp_path / "template"
+    target.mkdir()
+    for name in ("config.yaml", "prompts.yaml"):
+        shutil.copy(TEMPLATE_DIR / name, target / name)
+    return target
@@ -0,0 +1,72 @@
+"""崩れた JSON 応答の修復。"""
+from __future__ import annotations
+
+import orjson
+import pytest
+
+from experiments.agent_io import parse_agent_output, repair_json_text
+
+
+@pytest.mark.parametrize(
+    ("text", "expected_repairs", "expected"),
+    [
+        (
+            'はい、次の通りです。\n{"speech": "様子を見ます"}\n以上です。',
+            ["extract_object"],
+            {"speech": "様子を見ます"},
+        ),
+        ('{"speech": "a", "vote": "B",}', ["trailing_comma"], {"speech": "a", "vote": "B"}),
+        ('{"speech": "a", "tags": ["x", "y", ],\n}', ["trailing_comma"], {"speech": "a", "tags": ["x", "y"]}),
+        ("{“speech”: “様子を見ます”}", ["fullwidth_quotes"], {"speech": "様子を見ます"}),
+        ('{"speech"："a"，"vote"："B"}', ["fullwidth_punctuation"], {"speech": "a", "vote": "B"}),
+        ('{"speech": "一行目\n二行目\tタブ"}', ["control_chars"], {"speech": "一行目\n二行目\tタブ"}),
+        (
+            '説明\n{"thought": "考え", "speech": "a",}',
+            ["extract_object", "trailing_comma"],
+            {"thought": "考え", "speech": "a"},
+        ),
+    ],
+)
+def test_repair_json_text(text, expected_repairs, expected):
+    repaired, repairs = repair_json_text(text)
+    assert repairs == expected_repairs
+    assert orjson.loads(repaired) == expected
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        '{"speech": "途中で切れ',
+        '{"thought": "考え", "speech": {"nested": 1}',
+        "JSON がありません",
+    ],
+)
+def test_unrepairable_text_is_returned_unchanged(text):
+    assert repair_json_text(text) == (text, [])
+
+
+def test_commas_and_braces_inside_strings_are_kept():
+    text = '{"speech": "a, }", "vote": "B",}'
+    repaired, repairs = repair_json_text(text)
+    assert repairs == ["trailing_comma"]
+    assert orjson.loads(repaired) == {"speech": "a, }", "vote": "B"}
+
+
+def test_parse_agent_output_records_repairs():
+    repairs: list = []
+    raw = '```json\n{"thought": "t", "speech": "s", "vote": "B",}\n```'
+    assert parse_agent_output(raw, require_vote=True, repairs=repairs) == {"thought": "t", "speech": "s", "vote": "B"}
+    assert repairs == ["trailing_comma"]
+
+
+def test_parse_agent_output_leaves_valid_json_alone():
+    repairs: list = []
+    assert parse_agent_output('{"speech": "s"}', repairs=repairs)["speech"] == "s"
+    assert repairs == []
+
+
+def test_parse_agent_output_still_rejects_truncated_and_incomplete_replies():
+    with pytest.raises(orjson.JSONDecodeError):
+        parse_agent_output('{"speech": "途中で切れ')
+    with pytest.raises(ValueError, match="vote"):
+        parse_agent_output('{"speech": "s",}', require_vote=True)
@@ -0,0 +1,55 @@
+"""バッチ実行の結果を、ログ名と run 番号で正しい試合へ戻せること。"""
+from __future__ import annotations
+
+from pathlib import Path
+
+import orjson
+
+from experiments.batch import BatchExecutor, read_batch_results, run_batch_matches
+from experiments.engine import GameEngine
+from experiments.logio import iter_log_records
+
+
+class EchoCustomIdExecutor(BatchExecutor):
+    """各リクエストに、その custom_id を発言として返す。"""
+
+    def execute(self, input_path: Path, output_path: Path, model_alias: str) -> None:
+        rows = []
+        for line in input_path.read_bytes().splitlines():
+            custom_id = orjson.loads(line)["custom_id"]
+            content = orjson.dumps({"thought": "-", "speech": custom_id, "vote": "B"}).decode("utf-8")
+            rows.append(
+                {
+                    "custom_id": custom_id,
+                    "response": {"status_code": 200, "body": {"choices": [{"message": {"content": content}}]}},
+                    "error": None,
+                }
+            )
+        output_path.write_bytes(b"".join(orjson.dumps(row) + b"\n" for row in rows))
+
+
+def test_resumed_sessions_with_same_run_number_keep_their_own_results(template_dir: Path) -> None:
+    engine = GameEngine(template_dir, quiet=True)
+    config, prompts = engine.load()
+    logs = [engine.logs_dir / "logfile_001.jsonl", engine.logs_dir / "logfile_002.jsonl"]
+    sessions = [engine.create_session(config, prompts, path, 1, echo=False) for path in logs]
+
+    outcomes = run_batch_matches(sessions, EchoCustomIdExecutor(), engine.logs_dir / "batches", max_retries=2)
+
+    assert outcomes == [True, True]
+    for path in logs:
+        speeches = [row["speech"] for row in iter_log_records(path) if "speech" in row]
+        assert speeches, path
+        assert all(speech.startswith(f"{path.name.split('.')[0]}-run0001-") for speech in speeches)
+
+
+def test_read_batch_results_reports_errors_by_custom_id(tmp_path: Path) -> None:
+    path = tmp_path / "out.jsonl"
+    path.write_bytes(
+        orjson.dumps({"custom_id": "a", "response": {"status_code": 500, "body": {}}, "error": None}) + b"\n"
+    )
+
+    result = read_batch_results(path)["a"]
+
+    assert result.content is None
+    assert result.error == "status_code=500"
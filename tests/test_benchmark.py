@@ -0,0 +1,107 @@
+"""ベンチマークのカセット記録と `--replay`。"""
+from __future__ import annotations
+
+import sys
+from dataclasses import asdict
+from pathlib import Path
+
+import orjson
+import pytest
+from langchain_core.messages import AIMessageChunk
+
+from experiments import benchmark
+from experiments.benchmark import CorpusEntry, Measurement, load_cassette, replay, run_live, save_corpus, summarize
+
+CORPUS = [
+    CorpusEntry("p-discuss", "sys", "話してください", False, "logfile_001.jsonl"),
+    CorpusEntry("p-vote", "sys", "投票してください", True, "logfile_001.jsonl"),
+]
+VALID = '{"thought": "-", "speech": "様子を見ます", "vote": "B"}'
+
+
+class FakeChatModel:
+    model_fields: dict = {}
+
+    def __init__(self, content: str) -> None:
+        self.content = content
+
+    def stream(self, messages, **kwargs):
+        middle = len(self.content) // 2
+        yield AIMessageChunk(content=self.content[:middle])
+        yield AIMessageChunk(
+            content=self.content[middle:],
+            usage_metadata={"input_tokens": 10, "output_tokens": 8, "total_tokens": 18},
+        )
+
+
+class FakeClient:
+    def __init__(self, content: str) -> None:
+        self.chat_model = FakeChatModel(content)
+
+
+def write_cassette(path: Path, measurements) -> Path:
+    path.write_bytes(b"".join(orjson.dumps(asdict(item)) + b"\n" for item in measurements))
+    return path
+
+
+def test_recorded_cassette_replays_to_the_same_summary(tmp_path: Path) -> None:
+    replies = {"good": VALID, "broken": "json ではありません"}
+    measurements = run_live(
+        CORPUS, ["good", "broken"], repeats=2, client_factory=lambda alias: FakeClient(replies[alias])
+    )
+    cassette = write_cassette(tmp_path / "cassette.jsonl", measurements)
+
+    replayed = replay(CORPUS, load_cassette(cassette), ["good", "broken"], repeats=2)
+
+    assert replayed == measurements
+    live = [item.to_record() for item in summarize(CORPUS, measurements)]
+    assert [item.to_record() for item in summarize(CORPUS, replayed)] == live
+    assert [(row["model"], row["requests"], row["valid_rate"]) for row in live] == [
+        ("good", 4, 1.0),
+        ("broken", 4, 0.0),
+    ]
+    assert live[0]["mean_tokens_per_second"] is not None
+
+
+def test_replay_cli_reads_only_the_cassette(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys) -> None:
+    corpus_path = tmp_path / "corpus.jsonl"
+    save_corpus(CORPUS, corpus_path)
+    cassette = write_cassette(
+        tmp_path / "cassette.jsonl",
+        [
+            Measurement("m", "p-discuss", 1, VALID, 0.1, 1.0, 10, 9),
+            Measurement("m", "p-vote", 1, '{"speech": "a",}', 0.2, 2.0, 10, 9),
+        ],
+    )
+    results = tmp_path / "results.jsonl"
+
+    def no_live_calls(*args, **kwargs):
+        raise AssertionError("--replay must not call models")
+
+    monkeypatch.setattr(benchmark, "run_live", no_live_calls)
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        ["benchmark", "run", str(corpus_path), "--replay", str(cassette), "--json", "--results", str(results)],
+    )
+    benchmark.main()
+
+    printed = orjson.loads(capsys.readouterr().out)
+    [model] = printed["models"]
+    assert printed["mode"] == "replay"
+    assert (model["model"], model["requests"], model["errors"]) == ("m", 2, 0)
+    # 投票プロンプトへの応答は vote がないので不正、議論の応答だけが妥当
+    assert model["valid_rate"] == 0.5
+    assert model["latency_p50_seconds"] == 1.0
+    assert orjson.loads(results.read_bytes())["models"] == printed["models"]
+
+
+def test_replay_reports_prompts_missing_from_the_cassette() -> None:
+    cassette = {("m", "p-discuss", 1): Measurement("m", "p-discuss", 1, VALID, 0.1, 1.0)}
+
+    [recorded, missing] = replay(CORPUS, cassette)
+
+    assert recorded.error is None
+    assert (missing.prompt_id, missing.error) == ("p-vote", "not recorded in cassette")
+    [summary] = summarize(CORPUS, [recorded, missing])
+    assert (summary.requests, summary.errors) == (2, 1)
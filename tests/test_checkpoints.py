@@ -0,0 +1,154 @@
+"""ターンごとのチェックポイントと `--resume`。"""
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import orjson
+
+from experiments.engine import GameEngine, LOG_FILE_BASE
+from experiments.match import checkpoint_lock_path, claim_checkpoint, find_resumable_checkpoints
+from experiments.runner import process_tag
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+REPLY = {"thought": "-", "speech": "様子を見ます", "vote": "B"}
+
+
+def play_turns(session, count: int) -> None:
+    for _ in range(count):
+        turn = session.pending_turns()[0]
+        session.record_success(turn, REPLY, orjson.dumps(REPLY).decode("utf-8"))
+
+
+def exited_process_tag() -> str:
+    child = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"], capture_output=True, text=True)
+    return f"{process_tag().rpartition('-')[0]}-{child.stdout.strip()}"
+
+
+def resume_with_main(engine: GameEngine, monkeypatch) -> list:
+    resumed: list = []
+    monkeypatch.setattr("sys.argv", ["run.py", "--resume", "--no-warmup"])
+    monkeypatch.setattr("experiments.engine.collect_ollama_connection_errors", lambda aliases: [])
+    monkeypatch.setattr(GameEngine, "_run_sessions", lambda self, sessions, options, spec: resumed.extend(sessions))
+    engine.main(description="test")
+    return resumed
+
+
+def test_checkpoint_restores_position(template_dir: Path) -> None:
+    engine = GameEngine(template_dir, quiet=True)
+    config, prompts = engine.load()
+    log_path = engine.logs_dir / "logfile_001.jsonl"
+    session = engine.create_session(config, prompts, log_path, 1, echo=False)
+    play_turns(session, 3)
+
+    [state] = find_resumable_checkpoints(engine.checkpoint_dir, LOG_FILE_BASE)
+    resumed = engine.create_session(config, prompts, log_path, 1, echo=False)
+    resumed.restore(state)
+
+    assert resumed.turn_counter == 3
+    assert resumed.pending_turns()[0].agent_id == session.pending_turns()[0].agent_id
+
+
+def test_finished_match_removes_its_checkpoint(template_dir: Path) -> None:
+    engine = GameEngine(template_dir, quiet=True)
+    config, prompts = engine.load()
+    session = engine.create_session(config, prompts, engine.logs_dir / "logfile_001.jsonl", 1, echo=False)
+    while session.active:
+        for turn in session.pending_turns():
+            session.record_success(turn, REPLY, None)
+
+    assert session.finished
+    assert not session.checkpoint_path.exists()
+
+
+def test_resume_filters_other_logs_and_skips_unreadable_checkpoints(template_dir: Path) -> None:
+    engine = GameEngine(template_dir, quiet=True)
+    config, prompts = engine.load()
+    for name in ("logfile_001.jsonl", "sweep_001.jsonl"):
+        play_turns(engine.create_session(config, prompts, engine.logs_dir / name, 1, echo=False), 1)
+    (engine.checkpoint_dir / "logfile_002_run0001.json").write_text("{broken")
+
+    states = find_resumable_checkpoints(engine.checkpoint_dir, LOG_FILE_BASE)
+
+    assert [state["log_file"] for state in states] == ["logfile_001.jsonl"]
+
+
+def test_resume_skips_checkpoint_that_does_not_match_config(template_dir: Path, monkeypatch, capsys) -> None:
+    engine = GameEngine(template_dir, quiet=True)
+    config, prompts = engine.load()
+    for run in (1, 2):
+        play_turns(engine.create_session(config, prompts, engine.logs_dir / "logfile_001.jsonl", run, echo=False), 2)
+    stale = engine.checkpoint_dir / "logfile_001_run0001.json"
+    state = orjson.loads(stale.read_bytes())
+    state["agents"] = {**state["agents"], "A": "some-other-model"}
+    stale.write_bytes(orjson.dumps(state))
+
+    resumed = resume_with_main(engine, monkeypatch)
+
+    assert [session.run_index for session in resumed] == [2]
+    assert "run 1 は再開できない" in capsys.readouterr().out
+
+
+def test_resume_skips_matches_of_a_running_process(template_dir: Path, monkeypatch, capsys) -> None:
+    engine = GameEngine(template_dir, quiet=True)
+    config, prompts = engine.load()
+    sessions = [
+        engine.create_session(config, prompts, engine.logs_dir / "logfile_001.jsonl", run, echo=False)
+        for run in (1, 2)
+    ]
+    for session in sessions:
+        play_turns(session, 2)
+    # run 1 は動いているプロセス（親プロセス）、run 2 は終了したプロセスが持っていることにする
+    live_owner = f"{process_tag().rpartition('-')[0]}-{os.getppid()}"
+    checkpoint_lock_path(sessions[0].checkpoint_path).write_text(live_owner)
+    checkpoint_lock_path(sessions[1].checkpoint_path).write_text(exited_process_tag())
+
+    resumed = resume_with_main(engine, monkeypatch)
+
+    assert [session.run_index for session in resumed] == [2]
+    assert "run 1 は別のプロセスが実行中" in capsys.readouterr().out
+    assert checkpoint_lock_path(sessions[1].checkpoint_path).read_text() == process_tag()
+    assert checkpoint_lock_path(sessions[0].checkpoint_path).read_text() == live_owner
+
+
+def test_checkpoint_claim_is_exclusive_across_processes(tmp_path: Path) -> None:
+    checkpoint = tmp_path / "logfile_001_run0001.json"
+    holder = subprocess.Popen(
+        [
+            sys.executable,
+            "-c",
+            "import sys, time\n"
+            "from pathlib import Path\n"
+            "from experiments.match import claim_checkpoint\n"
+            "print(claim_checkpoint(Path(sys.argv[1])), flush=True)\n"
+            "time.sleep(60)\n",
+            str(checkpoint),
+        ],
+        cwd=PROJECT_ROOT,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        assert holder.stdout.readline().strip() == "True"
+        assert not claim_checkpoint(checkpoint)
+    finally:
+        holder.kill()
+        holder.wait()
+
+    assert claim_checkpoint(checkpoint)
+    assert checkpoint_lock_path(checkpoint).read_text() == process_tag()
+
+
+def test_finished_match_releases_its_lock(template_dir: Path) -> None:
+    engine = GameEngine(template_dir, quiet=True)
+    config, prompts = engine.load()
+    session = engine.create_session(config, prompts, engine.logs_dir / "logfile_001.jsonl", 1, echo=False)
+    play_turns(session, 1)
+    assert checkpoint_lock_path(session.checkpoint_path).exists()
+    while session.active:
+        for turn in session.pending_turns():
+            session.record_success(turn, REPLY, None)
+
+    assert not checkpoint_lock_path(session.checkpoint_path).exists()
@@ -0,0 +1,77 @@
+"""ライブ進捗表示（`--live`）と `--quiet`。"""
+from __future__ import annotations
+
+import io
+import time
+from pathlib import Path
+
+import orjson
+
+from experiments.console import APPEND_INTERVAL, DEFAULT_INTERVAL, LiveConsole, format_duration, render_status
+from experiments.engine import GameEngine
+from experiments.telemetry import Telemetry
+
+REPLY = {"thought": "-", "speech": "様子を見ます", "vote": "B"}
+
+
+class TerminalStream(io.StringIO):
+    def isatty(self) -> bool:
+        return True
+
+
+def test_quiet_terminal_overwrites_a_single_status_line() -> None:
+    telemetry = Telemetry()
+    stream = TerminalStream()
+    console = LiveConsole(telemetry, 4, stream=stream, interval=0.01)
+
+    with console:
+        telemetry.observe_match("finished")
+        time.sleep(0.05)
+
+    output = stream.getvalue()
+    assert console.overwrite
+    assert output.startswith("\r\x1b[K[live] ")
+    assert output.count("\n") == 1 and output.endswith("\n")
+    assert output.rsplit("\r\x1b[K", 1)[1].startswith("[live] 1/4 done (0 failed)")
+
+
+def test_redirected_output_appends_one_line_per_update() -> None:
+    telemetry = Telemetry()
+    stream = io.StringIO()
+    console = LiveConsole(telemetry, 2, stream=stream)
+
+    assert not console.overwrite
+    assert console.interval == APPEND_INTERVAL
+    with console:
+        telemetry.observe_match("finished")
+        telemetry.observe_match("failed")
+
+    lines = stream.getvalue().splitlines()
+    assert "\r" not in stream.getvalue()
+    assert lines[-1].startswith("[live] 2/2 done (1 failed)")
+    assert lines[-1].endswith("ETA done")
+    assert LiveConsole(telemetry, 2, stream=TerminalStream()).interval == DEFAULT_INTERVAL
+
+
+def test_render_status_estimates_the_remaining_time() -> None:
+    telemetry = Telemetry()
+    for _ in range(3):
+        telemetry.observe_match("finished")
+
+    line = render_status(telemetry.snapshot(), total_matches=9, elapsed=180.0)
+
+    assert "3/9 done" in line
+    assert "1.0 match/min" in line
+    assert line.endswith(f"ETA {format_duration(360)}")
+    assert format_duration(3720) == "1h02m"
+
+
+def test_quiet_engine_does_not_echo_speeches(template_dir: Path, capsys) -> None:
+    engine = GameEngine(template_dir, quiet=True)
+    config, prompts = engine.load()
+    session = engine.create_session(config, prompts, engine.logs_dir / "logfile_001.jsonl", 1, echo=True)
+    turn = session.pending_turns()[0]
+    session.record_success(turn, REPLY, orjson.dumps(REPLY).decode("utf-8"))
+
+    assert not session.echo
+    assert REPLY["speech"] not in capsys.readouterr().out
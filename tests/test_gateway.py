@@ -0,0 +1,84 @@
+"""ゲートウェイの優先度とレート制限の順序。"""
+from __future__ import annotations
+
+import threading
+import time
+
+from langchain_core.messages import AIMessage
+
+from src.gateway.server import Gateway, RateLimiter
+
+
+class RecordingClient:
+    """呼ばれた順に名前を記録し、最初の呼び出しだけ gate が開くまで待つ代役。"""
+
+    def __init__(self, name, calls, gate=None):
+        self.name = name
+        self.calls = calls
+        self.gate = gate
+
+    def invoke(self, messages, **kwargs):
+        if self.gate is not None:
+            gate, self.gate = self.gate, None
+            gate.wait(5)
+        self.calls.append((self.name, messages[-1].content))
+        return AIMessage(content="ok")
+
+
+def make_gateway(clients, limiters=None):
+    gateway = Gateway(workers=1, cache_size=0)
+    for model, client in clients.items():
+        gateway._clients[model] = client
+        gateway._limiters[model] = (limiters or {}).get(model)
+    return gateway
+
+
+def exhausted_limiter(seconds_until_token: float) -> RateLimiter:
+    limiter = RateLimiter(60.0 / seconds_until_token)
+    while limiter.try_acquire() == 0:
+        pass
+    return limiter
+
+
+def test_queued_jobs_run_in_priority_order():
+    calls = []
+    gate = threading.Event()
+    gateway = make_gateway({"m": RecordingClient("m", calls, gate)})
+    first = gateway.submit("m", [("user", "first")])
+    time.sleep(0.05)  # 唯一のワーカーが first で塞がっている間に積む
+    futures = [
+        gateway.submit("m", [("user", "batch")], priority=10),
+        gateway.submit("m", [("user", "interactive")], priority=0),
+        gateway.submit("m", [("user", "later")], priority=5),
+    ]
+    gate.set()
+    for future in [first, *futures]:
+        future.result(timeout=5)
+    assert [content for _, content in calls] == ["first", "interactive", "later", "batch"]
+
+
+def test_rate_limited_job_does_not_block_other_models():
+    calls = []
+    gateway = make_gateway(
+        {"limited": RecordingClient("limited", calls), "free": RecordingClient("free", calls)},
+        {"limited": exhausted_limiter(0.5)},
+    )
+    limited = gateway.submit("limited", [("user", "a")], priority=0)
+    time.sleep(0.05)
+    started = time.monotonic()
+    free = gateway.submit("free", [("user", "b")], priority=10)
+    free.result(timeout=5)
+    # 制限中の高優先度ジョブにワーカーが塞がれていれば、トークンが貯まる 0.5 秒後まで待たされる
+    assert time.monotonic() - started < 0.3
+    limited.result(timeout=5)
+    assert [name for name, _ in calls] == ["free", "limited"]
+    assert gateway.stats()["deferred"] == 0
+
+
+def test_try_acquire_reports_wait_without_sleeping():
+    limiter = RateLimiter(60.0)
+    assert limiter.try_acquire() == 0.0
+    started = time.monotonic()
+    wait = limiter.try_acquire()
+    assert 0 < wait <= 1.0
+    assert time.monotonic() - started < 0.1
@@ -0,0 +1,140 @@
+"""ヘッジ（レプリカへの重複リクエスト）の勝敗・取り消し・計測の集計。"""
+from __future__ import annotations
+
+import asyncio
+from typing import Any, List, Tuple
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from experiments.hedging import HedgedClient, HedgePolicy, HedgeStats
+from experiments.latency import LatencyWindow
+
+# 窓の p95 は 0.01 秒なので、ヘッジは min_delay の 0.05 秒後に出る
+POLICY = HedgePolicy(min_samples=5, min_delay=0.05, probe_rate=0.0)
+
+
+class FakeAsyncClient:
+    """`delay` 秒後に応答する（`error` があれば送出する）非同期クライアント。"""
+
+    def __init__(self, name: str, delay: float, error: Exception | None = None) -> None:
+        self.name = name
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self.cancelled = 0
+        self.completed = 0
+
+    async def ainvoke(self, messages: Any, **kwargs) -> str:
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error is not None:
+            raise self.error
+        self.completed += 1
+        return self.name
+
+
+def hedged_client(primary: FakeAsyncClient, replica: FakeAsyncClient, *, policy: HedgePolicy = POLICY):
+    window = LatencyWindow(policy.window)
+    window.extend([0.01] * 10)
+    reports: List[Tuple[str, bool, float | None]] = []
+    client = HedgedClient(
+        "model",
+        primary,
+        [("model_replica", replica)],
+        policy=policy,
+        window=window,
+        stats=HedgeStats(),
+        on_hedge=lambda alias, won, saved: reports.append((alias, won, saved)),
+    )
+    return client, reports
+
+
+def invoke(client: HedgedClient, *, linger: float = 0.0) -> Any:
+    async def call() -> Any:
+        result = await client.ainvoke(["hi"])
+        # 計測用に残した primary が終わるのを待つ
+        await asyncio.sleep(linger)
+        return result
+
+    return asyncio.run(call())
+
+
+def test_no_hedge_until_the_window_has_enough_samples() -> None:
+    primary, replica = FakeAsyncClient("primary", 0.1), FakeAsyncClient("replica", 0.0)
+    client = HedgedClient("model", primary, [("model_replica", replica)], policy=POLICY)
+
+    assert invoke(client) == "primary"
+    assert (client.stats.requests, client.stats.hedged, replica.calls) == (1, 0, 0)
+    assert len(client.window) == 1
+
+
+def test_replica_win_cancels_the_primary() -> None:
+    primary, replica = FakeAsyncClient("primary", 1.0), FakeAsyncClient("replica", 0.01)
+    client, reports = hedged_client(primary, replica)
+
+    assert invoke(client) == "replica"
+    assert (client.stats.requests, client.stats.hedged, client.stats.hedge_wins, client.stats.rescued) == (1, 1, 1, 0)
+    assert client.stats.delays == [0.05]
+    assert primary.cancelled == 1
+    assert reports == [("model", True, None)]
+    # 取り消した primary の経過時間も窓に入る
+    assert len(client.window) == 11
+
+
+def test_primary_win_after_hedge_cancels_the_replica() -> None:
+    primary, replica = FakeAsyncClient("primary", 0.1), FakeAsyncClient("replica", 1.0)
+    client, reports = hedged_client(primary, replica)
+
+    assert invoke(client) == "primary"
+    assert (client.stats.hedged, client.stats.hedge_wins) == (1, 0)
+    assert replica.cancelled == 1
+    assert reports == [("model", False, None)]
+
+
+def test_replica_that_outlives_a_failed_primary_counts_as_rescued() -> None:
+    primary = FakeAsyncClient("primary", 0.08, RuntimeError("boom"))
+    replica = FakeAsyncClient("replica", 0.1)
+    client, reports = hedged_client(primary, replica)
+
+    assert invoke(client) == "replica"
+    assert (client.stats.hedge_wins, client.stats.rescued) == (1, 1)
+    assert client.stats.estimated_saved_seconds is None
+    assert reports == [("model", True, None)]
+
+
+def test_probe_keeps_the_primary_running_and_measures_the_saving() -> None:
+    primary, replica = FakeAsyncClient("primary", 0.3), FakeAsyncClient("replica", 0.01)
+    client, reports = hedged_client(primary, replica, policy=HedgePolicy(min_samples=5, min_delay=0.05, probe_rate=1.0))
+
+    assert invoke(client, linger=0.5) == "replica"
+    assert (primary.cancelled, primary.completed) == (0, 1)
+    assert client.stats.probes == 1
+    assert client.stats.probe_saved_seconds == pytest.approx(0.24, abs=0.1)
+    assert client.stats.estimated_saved_seconds == pytest.approx(client.stats.probe_saved_seconds)
+    [(alias, won, saved)] = reports
+    assert (alias, won) == ("model", True)
+    assert saved == pytest.approx(client.stats.probe_saved_seconds)
+
+
+def test_both_failures_raise_and_report_a_loss() -> None:
+    primary = FakeAsyncClient("primary", 0.08, RuntimeError("primary"))
+    replica = FakeAsyncClient("replica", 0.01, RuntimeError("replica"))
+    client, reports = hedged_client(primary, replica)
+
+    with pytest.raises(RuntimeError):
+        invoke(client)
+    assert (client.stats.hedged, client.stats.hedge_wins) == (1, 0)
+    assert reports == [("model", False, None)]
+
+
+def test_replica_win_is_tagged_with_the_serving_model() -> None:
+    primary, replica = FakeAsyncClient("primary", 1.0), FakeAsyncClient("replica", 0.01)
+    client, _ = hedged_client(primary, replica)
+    replica.ainvoke = lambda messages, **kwargs: asyncio.sleep(0.01, AIMessage(content="replica"))
+
+    assert invoke(client).response_metadata["served_by"] == "model_replica"
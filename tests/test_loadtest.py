@@ -0,0 +1,82 @@
+"""負荷試験の飽和点（knee）の判定と推奨並列数の保存。"""
+from __future__ import annotations
+
+import functools
+import sys
+from pathlib import Path
+
+import orjson
+import pytest
+
+from experiments import loadtest
+from experiments.loadtest import KneeThresholds, LevelResult, find_knee
+from experiments.runner import recommended_workers
+from experiments.stub_server import STUB_MODEL, StubServer
+
+
+def level(concurrency: int, throughput: float, p90: float, errors: int = 0) -> LevelResult:
+    result = LevelResult(concurrency, requests=10, errors=errors, elapsed_seconds=(10 - errors) / throughput)
+    result.latencies = [p90] * (10 - errors)
+    return result
+
+
+def test_knee_is_the_level_before_throughput_stops_growing() -> None:
+    levels = [level(1, 5.0, 0.2), level(2, 10.0, 0.2), level(4, 19.0, 0.2), level(8, 20.0, 0.4)]
+
+    recommended, saturated, reason = find_knee(levels, KneeThresholds())
+
+    assert (recommended.concurrency, saturated.concurrency) == (4, 8)
+    assert reason == "throughput gain below 10%"
+
+
+def test_knee_detects_latency_and_error_saturation() -> None:
+    by_queueing = find_knee([level(1, 5.0, 0.2), level(2, 10.0, 0.2), level(4, 12.0, 0.3)], KneeThresholds())
+    by_latency = find_knee([level(1, 5.0, 0.2), level(2, 10.0, 0.35), level(4, 19.0, 0.65)], KneeThresholds())
+    by_errors = find_knee([level(1, 5.0, 0.2), level(2, 10.0, 0.2, errors=2)], KneeThresholds())
+    unsaturated = find_knee([level(1, 5.0, 0.2), level(2, 10.0, 0.2)], KneeThresholds())
+
+    assert (by_queueing[0].concurrency, by_queueing[2]) == (2, "p90 latency grew faster than throughput")
+    assert (by_latency[0].concurrency, by_latency[2]) == (2, "p90 latency above 3x of concurrency 1")
+    assert (by_errors[0].concurrency, by_errors[2]) == (1, "error rate 20%")
+    assert (unsaturated[0].concurrency, unsaturated[1]) == (2, None)
+
+
+def test_stub_with_four_slots_recommends_four_workers(
+    template_dir: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys
+) -> None:
+    # 1件 0.1 秒・揺らぎなしのスタブにして、段ごとの差をはっきりさせる
+    monkeypatch.setattr(
+        loadtest,
+        "StubServer",
+        functools.partial(StubServer, prefill_seconds=0.1, seconds_per_token=0.0, jitter=0.0),
+    )
+    recommendations = tmp_path / "loadtest.json"
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        [
+            "loadtest",
+            "--stub",
+            "--stub-slots",
+            "4",
+            "--template",
+            str(template_dir),
+            "--turns",
+            "8",
+            "--max-concurrency",
+            "16",
+            "--no-warmup",
+            "--json",
+            "--results",
+            str(tmp_path / "loadtest.jsonl"),
+            "--recommendations",
+            str(recommendations),
+        ],
+    )
+    loadtest.main()
+
+    record = orjson.loads(capsys.readouterr().out)
+    assert record["recommended_workers"] == 4
+    assert record["saturated_at"] == 8
+    assert [item["concurrency"] for item in record["levels"]] == [1, 2, 4, 8]
+    assert recommended_workers([STUB_MODEL], recommendations) == 4
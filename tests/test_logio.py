@@ -0,0 +1,110 @@
+"""zstd 圧縮ログのバッファリングと、強制終了からの再開。"""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import orjson
+
+from experiments import logio
+from experiments.engine import GameEngine, LOG_FILE_BASE
+from experiments.logio import LogFormat, configure_log, iter_log_records, read_run_records
+from experiments.match import find_resumable_checkpoints
+
+REPLY = {"thought": "-", "speech": "様子を見ます", "vote": "B"}
+
+
+def simulate_crash(path: Path) -> None:
+    """書き込み器のバッファを書き出さずに捨てる（プロセスの強制終了に相当）。"""
+
+    with logio._writers_lock:
+        logio._writers.pop(path, None)
+
+
+def test_killed_zstd_match_resumes_without_losing_turns(template_dir: Path) -> None:
+    engine = GameEngine(template_dir, quiet=True)
+    config, prompts = engine.load()
+    log_path = engine.logs_dir / "logfile_001.jsonl.zst"
+    configure_log(log_path, LogFormat(compress=True))
+    session = engine.create_session(config, prompts, log_path, 1, echo=False)
+    for _ in range(6):
+        turn = session.pending_turns()[0]
+        session.record_success(turn, REPLY, orjson.dumps(REPLY).decode("utf-8"))
+    simulate_crash(log_path)
+
+    [state] = find_resumable_checkpoints(engine.checkpoint_dir, LOG_FILE_BASE)
+    assert not log_path.exists()
+    assert len(state["log_buffer"]["lines"]) == 6
+
+    configure_log(log_path, LogFormat(compress=True))
+    resumed = engine.create_session(config, prompts, log_path, 1, echo=False)
+    resumed.restore(state)
+    while resumed.active:
+        for turn in resumed.pending_turns():
+            resumed.record_success(turn, REPLY, None)
+    logio.flush_logs()
+
+    turns = [row["turn_index"] for row in iter_log_records(log_path) if "speech" in row]
+    assert turns == list(range(1, len(turns) + 1))
+    assert resumed.finished
+    assert [entry["run"] for entry in logio._read_index(log_path)] == [1]
+    simulate_crash(log_path)
+
+
+def test_restored_buffer_is_not_written_twice(template_dir: Path) -> None:
+    engine = GameEngine(template_dir, quiet=True)
+    config, prompts = engine.load()
+    log_path = engine.logs_dir / "logfile_001.jsonl.zst"
+    configure_log(log_path, LogFormat(compress=True))
+    session = engine.create_session(config, prompts, log_path, 1, echo=False)
+    turn = session.pending_turns()[0]
+    session.record_success(turn, REPLY, None)
+    [state] = find_resumable_checkpoints(engine.checkpoint_dir, LOG_FILE_BASE)
+    # チェックポイントの後に行が書き出されてから落ちた場合
+    logio.flush_logs()
+    simulate_crash(log_path)
+
+    configure_log(log_path, LogFormat(compress=True))
+    resumed = engine.create_session(config, prompts, log_path, 1, echo=False)
+    resumed.restore(state)
+    while resumed.active:
+        for turn in resumed.pending_turns():
+            resumed.record_success(turn, REPLY, None)
+    logio.flush_logs()
+
+    turns = [row["turn_index"] for row in iter_log_records(log_path) if "speech" in row]
+    assert turns == list(range(1, len(turns) + 1))
+    simulate_crash(log_path)
+
+
+def test_each_checkpointed_match_is_one_compressed_frame(template_dir: Path) -> None:
+    engine = GameEngine(template_dir, quiet=True)
+    config, prompts = engine.load()
+    log_path = engine.logs_dir / "logfile_001.jsonl.zst"
+    configure_log(log_path, LogFormat(compress=True))
+    for run_index in (1, 2):
+        session = engine.create_session(config, prompts, log_path, run_index, echo=False)
+        while session.active:
+            for turn in session.pending_turns():
+                session.record_success(turn, REPLY, orjson.dumps(REPLY).decode("utf-8"))
+    logio.flush_logs()
+
+    index = logio._read_index(log_path)
+    raw = sum(len(orjson.dumps(row)) + 1 for row in iter_log_records(log_path))
+    assert [entry["run"] for entry in index] == [1, 2]
+    assert raw / log_path.stat().st_size > 4
+    simulate_crash(log_path)
+
+
+def test_records_are_buffered_per_run_until_end_run(tmp_path: Path) -> None:
+    log_path = tmp_path / "logfile_001.jsonl.zst"
+    configure_log(log_path, LogFormat(compress=True))
+    logio.append_record(log_path, {"run": 1, "turn": 1})
+    logio.append_record(log_path, {"run": 2, "turn": 1})
+
+    assert not log_path.exists()
+
+    logio.end_run(log_path, 1)
+
+    assert [row["run"] for row in iter_log_records(log_path)] == [1]
+    simulate_crash(log_path)
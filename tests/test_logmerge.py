@@ -0,0 +1,85 @@
+"""失敗ログのシャード統合（`experiments.logmerge`）。"""
+from __future__ import annotations
+
+import subprocess
+import sys
+from pathlib import Path
+
+import orjson
+import pytest
+
+from experiments import logmerge
+from experiments.logmerge import merge_failure_logs
+from experiments.runner import FAILURE_LOG_FILENAME, failure_shard_path, process_tag
+
+
+def exited_process_tag() -> str:
+    child = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"], capture_output=True, text=True)
+    return f"{process_tag().rpartition('-')[0]}-{child.stdout.strip()}"
+
+
+def write_shard(path: Path, *timestamps: str) -> Path:
+    path.write_bytes(b"".join(orjson.dumps({"timestamp": ts, "shard": path.name}) + b"\n" for ts in timestamps))
+    return path
+
+
+def merged_timestamps(log_dir: Path) -> list:
+    return [orjson.loads(line)["timestamp"] for line in (log_dir / FAILURE_LOG_FILENAME).read_bytes().splitlines()]
+
+
+def test_only_shards_of_exited_processes_are_merged(tmp_path: Path) -> None:
+    dead = tmp_path / f"failed_responses.{exited_process_tag()}.jsonl"
+    write_shard(dead, "2025-01-01T00:00:02", "2025-01-01T00:00:00")
+    live = write_shard(failure_shard_path(tmp_path), "2025-01-01T00:00:01")
+    remote = write_shard(tmp_path / "failed_responses.other-host-123.jsonl", "2025-01-01T00:00:03")
+
+    assert merge_failure_logs(tmp_path) == {"shards": 1, "records": 2, "skipped": 2}
+    assert merged_timestamps(tmp_path) == ["2025-01-01T00:00:00", "2025-01-01T00:00:02"]
+    assert not dead.exists() and live.exists() and remote.exists()
+
+    assert merge_failure_logs(tmp_path, other_hosts=True) == {"shards": 1, "records": 1, "skipped": 1}
+    assert merged_timestamps(tmp_path)[-1] == "2025-01-01T00:00:03"
+    assert live.exists() and not remote.exists()
+
+
+def test_merge_interrupted_after_append_does_not_duplicate_records(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    write_shard(tmp_path / f"failed_responses.{exited_process_tag()}.jsonl", "2025-01-01T00:00:00")
+    write_shard(tmp_path / f"failed_responses.{exited_process_tag()}.jsonl", "2025-01-01T00:00:01")
+    original_unlink = Path.unlink
+
+    def crash_on_shard(self: Path, *args, **kwargs) -> None:
+        if self.name.endswith(logmerge.MERGING_SUFFIX):
+            raise KeyboardInterrupt
+        original_unlink(self, *args, **kwargs)
+
+    monkeypatch.setattr(Path, "unlink", crash_on_shard)
+    with pytest.raises(KeyboardInterrupt):
+        merge_failure_logs(tmp_path)
+    monkeypatch.setattr(Path, "unlink", original_unlink)
+
+    assert merge_failure_logs(tmp_path) == {"shards": 0, "records": 0, "skipped": 0}
+    assert merged_timestamps(tmp_path) == ["2025-01-01T00:00:00", "2025-01-01T00:00:01"]
+    assert sorted(path.name for path in tmp_path.iterdir()) == [FAILURE_LOG_FILENAME]
+
+
+def test_merge_interrupted_mid_append_is_rolled_back_and_redone(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    write_shard(tmp_path / FAILURE_LOG_FILENAME, "2024-12-31T00:00:00")
+    shard = tmp_path / f"failed_responses.{exited_process_tag()}.jsonl"
+    write_shard(shard, "2025-01-01T00:00:00", "2025-01-01T00:00:01")
+
+    def partial_append(main_log: Path, data: bytes) -> None:
+        with main_log.open("ab") as fh:
+            fh.write(data[: len(data) // 2])
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(logmerge, "_append", partial_append)
+    with pytest.raises(KeyboardInterrupt):
+        merge_failure_logs(tmp_path)
+    monkeypatch.undo()
+
+    assert merge_failure_logs(tmp_path) == {"shards": 1, "records": 2, "skipped": 0}
+    assert merged_timestamps(tmp_path) == ["2024-12-31T00:00:00", "2025-01-01T00:00:00", "2025-01-01T00:00:01"]
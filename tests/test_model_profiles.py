@@ -0,0 +1,91 @@
+"""モデル設定のプロファイル（`profiles` / `<モデル名>@<プロファイル名>`）。"""
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from src.config.models import ModelConfig, get_model_config, split_model_name
+
+MODELS_YAML = """\
+models:
+  local:
+    provider: ollama
+    model: gemma3:27b
+    base_url: http://localhost:11434
+    temperature: 0.7
+    profile: short_ctx
+    timeouts:
+      connect: 5
+      read: 300
+    profiles:
+      short_ctx:
+        num_ctx: 4096
+      long_ctx:
+        num_ctx: 16384
+        temperature: 0.2
+        timeouts:
+          read: 900
+  plain:
+    provider: openai
+    model: gpt-oss-20b
+    base_url: http://localhost:8000/v1
+"""
+
+
+@pytest.fixture
+def models_path(tmp_path: Path) -> Path:
+    path = tmp_path / "models.yaml"
+    path.write_text(MODELS_YAML, encoding="utf-8")
+    return path
+
+
+def test_split_model_name() -> None:
+    assert split_model_name("ollama_gemma3:27b") == ("ollama_gemma3:27b", None)
+    assert split_model_name("ollama_gemma3:27b@long_ctx") == ("ollama_gemma3:27b", "long_ctx")
+
+
+def test_with_profile_overrides_options_and_merges_timeouts() -> None:
+    config = ModelConfig.model_validate(
+        {
+            "provider": "ollama",
+            "model": "gemma3:27b",
+            "temperature": 0.7,
+            "timeouts": {"connect": 5, "read": 300},
+            "profiles": {"long_ctx": {"num_ctx": 16384, "temperature": 0.2, "timeouts": {"read": 900}}},
+        }
+    )
+
+    tuned = config.with_profile("long_ctx")
+
+    assert tuned.temperature == 0.2
+    assert tuned.model_extra["num_ctx"] == 16384
+    assert (tuned.timeouts.connect, tuned.timeouts.read) == (5, 900)
+    assert tuned.profile is None
+    assert config.with_profile(None) == config
+
+
+def test_with_profile_rejects_unknown_names(models_path: Path) -> None:
+    with pytest.raises(KeyError, match="long_ctx, short_ctx"):
+        get_model_config("local@huge_ctx", models_path)
+    with pytest.raises(KeyError, match="なし"):
+        get_model_config("plain@capped", models_path)
+
+
+def test_alias_without_profile_uses_the_default_profile(models_path: Path) -> None:
+    default = get_model_config("local", models_path)
+    explicit = get_model_config("local@long_ctx", models_path)
+
+    assert default.model_extra["num_ctx"] == 4096
+    assert default.temperature == 0.7
+    assert explicit.model_extra["num_ctx"] == 16384
+    assert get_model_config("plain", models_path).model_extra == {}
+
+
+def test_provider_kwargs_apply_the_profile(models_path: Path) -> None:
+    kwargs = get_model_config("local@long_ctx", models_path).to_provider_kwargs()
+
+    assert kwargs["num_ctx"] == 16384
+    assert kwargs["read_timeout"] == 900
+    assert kwargs["connect_timeout"] == 5
+    assert not {"profile", "profiles", "replicas", "timeouts"} & set(kwargs)
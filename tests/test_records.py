@@ -0,0 +1,104 @@
+"""ログ行の型と `schema` 列。"""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+
+import orjson
+
+from experiments.records import (
+    SCHEMA_VERSION,
+    FailureRecord,
+    HistoryEntry,
+    TurnRecord,
+    Vote,
+    VoteSummaryRecord,
+    encode_record,
+)
+
+TIMESTAMP = datetime(2025, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+
+TURN_COLUMNS = [
+    "timestamp",
+    "run",
+    "round",
+    "phase",
+    "turn_index",
+    "agent",
+    "model_name",
+    "vote",
+    "thought",
+    "speech",
+    "system_prompt",
+    "user_prompt",
+    "raw_response",
+    "visible_history",
+    "schema",
+]
+
+
+def turn_record(**overrides) -> TurnRecord:
+    values = dict(
+        timestamp=TIMESTAMP,
+        run=3,
+        round=1,
+        phase="day1",
+        turn_index=2,
+        agent="A",
+        model_name="openai_gpt-oss-20b",
+        vote="B",
+        thought="考え",
+        speech="様子を見ます",
+        system_prompt="sys",
+        user_prompt="user",
+        raw_response=None,
+        visible_history="（まだ発言はありません）",
+    )
+    values.update(overrides)
+    return TurnRecord(**values)
+
+
+def test_schema_version_is_pinned() -> None:
+    # 列の意味を変えたら SCHEMA_VERSION を上げ、この値も更新する
+    assert SCHEMA_VERSION == 1
+
+
+def test_turn_record_keeps_its_column_order_and_schema() -> None:
+    encoded = encode_record(turn_record())
+    row = orjson.loads(encoded.data)
+
+    assert encoded.run == 3
+    assert list(row) == TURN_COLUMNS
+    assert row["schema"] == SCHEMA_VERSION
+    assert row["timestamp"] == TIMESTAMP.isoformat()
+    assert row["raw_response"] is None
+
+
+def test_extras_are_flattened_after_the_record_columns() -> None:
+    encoded = encode_record(turn_record(), {"latency_seconds": 1.5}, None, {"template": "4player"})
+    row = orjson.loads(encoded.data)
+
+    assert list(row) == [*TURN_COLUMNS, "latency_seconds", "template"]
+    assert row["latency_seconds"] == 1.5
+    assert row["schema"] == SCHEMA_VERSION
+
+
+def test_failure_and_summary_records_carry_the_schema() -> None:
+    failure = orjson.loads(
+        encode_record(FailureRecord(TIMESTAMP, 1, 2, "vote1", 5, "C", "m", "timeout", "{")).data
+    )
+    votes = [Vote("A", "B"), Vote("B", "A")]
+    summary = orjson.loads(encode_record(VoteSummaryRecord(TIMESTAMP, 1, 2, "vote1_summary", votes, {"A": 1, "B": 1})).data)
+
+    assert failure["schema"] == summary["schema"] == SCHEMA_VERSION
+    assert failure["error"] == "timeout"
+    assert summary["votes"] == [{"agent": "A", "vote": "B"}, {"agent": "B", "vote": "A"}]
+    assert summary["tally"] == {"A": 1, "B": 1}
+
+
+def test_history_entry_and_vote_round_trip_through_json() -> None:
+    entry = HistoryEntry("A", "考え", "発言", ["A", "B"])
+    vote = Vote("B", "C")
+
+    assert HistoryEntry.from_dict(orjson.loads(orjson.dumps(entry))) == entry
+    assert Vote.from_dict(orjson.loads(orjson.dumps(vote))) == vote
+    assert HistoryEntry.from_dict({"agent": "A", "speech": "発言"}) == HistoryEntry("A", "", "発言", None)
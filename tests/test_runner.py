@@ -0,0 +1,106 @@
+"""同じ logs/ を共有するプロセス間でのログファイルの確保。"""
+from __future__ import annotations
+
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import orjson
+
+from experiments.runner import ExperimentRunner, load_next_run_index, setup_experiment_environment
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+CONVERSATIONS_PER_PROCESS = 5
+
+CONFIG_YAML = """\
+model_name: openai_gpt-oss-20b
+log_filename: shared.jsonl
+system_prompt: 短く答えてください。
+turns:
+  - speaker: User
+    prompt: こんにちは
+  - speaker: User
+    prompt: さようなら
+"""
+
+WORKER = """
+import os, sys, time
+from pathlib import Path
+
+import orjson
+from langchain_core.messages import AIMessage
+
+from experiments.runner import ExperimentRunner, setup_experiment_environment
+
+
+class EchoPid:
+    def invoke(self, messages, **kwargs):
+        return AIMessage(content=str(os.getpid()))
+
+
+work_dir = Path(sys.argv[1])
+while not (work_dir / "go").exists():
+    time.sleep(0.01)
+paths = []
+for _ in range({count}):
+    runner = ExperimentRunner(work_dir / "config.yaml", work_dir / "logs", echo=False)
+    runner.client = EchoPid()
+    runner.run()
+    paths.append(str(runner.log_path))
+    _, _, env_log, _ = setup_experiment_environment(
+        work_dir / "config.yaml", work_dir / "prompts.yaml", log_dir=work_dir / "env"
+    )
+    paths.append(str(env_log))
+print(orjson.dumps({{"pid": os.getpid(), "paths": paths}}).decode())
+""".format(count=CONVERSATIONS_PER_PROCESS)
+
+
+def test_concurrent_processes_never_share_a_log_file(tmp_path: Path) -> None:
+    (tmp_path / "config.yaml").write_text(CONFIG_YAML, encoding="utf-8")
+    (tmp_path / "prompts.yaml").write_text("{}\n", encoding="utf-8")
+    workers = [
+        subprocess.Popen(
+            [sys.executable, "-c", WORKER, str(tmp_path)], cwd=PROJECT_ROOT, stdout=subprocess.PIPE, text=True
+        )
+        for _ in range(2)
+    ]
+    time.sleep(0.5)
+    (tmp_path / "go").touch()
+    results = [orjson.loads(worker.communicate(timeout=60)[0]) for worker in workers]
+
+    claimed = [name for result in results for name in result["paths"]]
+    assert len(claimed) == len(set(claimed)) == 2 * 2 * CONVERSATIONS_PER_PROCESS
+    logs = sorted((tmp_path / "logs").iterdir())
+    assert [path.name for path in logs] == [f"shared_{index:03d}.jsonl" for index in range(1, 11)]
+    for path in logs:
+        rows = [orjson.loads(line) for line in path.read_bytes().splitlines()]
+        # 1ファイルには1つの会話（2ターン）だけが入り、別プロセスの行は混ざらない
+        assert [row["turn_index"] for row in rows] == [1, 2]
+        assert len({row["response"] for row in rows}) == 1
+        assert {row["log_file"] for row in rows} == {path.name}
+    assert len(list((tmp_path / "env").iterdir())) == 2 * CONVERSATIONS_PER_PROCESS
+
+
+def test_model_override_and_default_log_names(tmp_path: Path) -> None:
+    config_path = tmp_path / "config.yaml"
+    config_path.write_text(CONFIG_YAML.replace("log_filename: shared.jsonl\n", ""), encoding="utf-8")
+
+    first = ExperimentRunner(config_path, tmp_path, echo=False)
+    second = ExperimentRunner(config_path, tmp_path, echo=False, model_name="openai_gpt-oss-20b")
+
+    assert first.log_path.name == "experiment_001.jsonl"
+    assert second.log_path.name == "experiment_openai_gpt-oss-20b_001.jsonl"
+
+
+def test_setup_claims_a_fresh_log_starting_at_run_one(tmp_path: Path) -> None:
+    config_path = tmp_path / "config.yaml"
+    config_path.write_text("log_filename: logfile.jsonl.zst\n", encoding="utf-8")
+    (tmp_path / "prompts.yaml").write_text("{}\n", encoding="utf-8")
+
+    _, _, first, run_index = setup_experiment_environment(config_path, tmp_path / "prompts.yaml")
+    _, _, second, _ = setup_experiment_environment(config_path, tmp_path / "prompts.yaml")
+
+    assert (first.name, second.name, run_index) == ("logfile_001.jsonl.zst", "logfile_002.jsonl.zst", 1)
+    assert first.parent == tmp_path / "logs"
+    assert load_next_run_index(tmp_path / "logs" / "missing.jsonl") == 1
@@ -0,0 +1,139 @@
+"""試合の seed がプロバイダへ渡ることと、スイープでの seed の決め方・再開。"""
+from __future__ import annotations
+
+from pathlib import Path
+
+import orjson
+from langchain_core.messages import AIMessage, HumanMessage
+
+from experiments import sweep
+from experiments.agent_io import invoke_with_retries
+from experiments.engine import GameEngine
+from experiments.logio import iter_log_records, list_log_files
+from experiments.sweep import SweepSpec, resume_sweep, run_sweep
+from src.api import LLMClient
+
+REPLY = '{"thought": "-", "speech": "こんにちは"}'
+VOTE_REPLY = '{"thought": "-", "speech": "こんにちは", "vote": "B"}'
+MODEL = "openai_gpt-oss-20b"
+
+
+class RecordingClient:
+    def __init__(self) -> None:
+        self.kwargs = []
+
+    def invoke(self, messages, **kwargs):
+        self.kwargs.append(kwargs)
+        return AIMessage(content=REPLY)
+
+
+def test_invoke_with_retries_passes_seed_only_when_set() -> None:
+    client = RecordingClient()
+    common = dict(require_vote=False, max_retries=1, agent_id="A", model_alias="m")
+
+    invoke_with_retries(client, [HumanMessage("hi")], **common)
+    invoke_with_retries(client, [HumanMessage("hi")], seed=12, **common)
+
+    assert client.kwargs == [{}, {"seed": 12}]
+
+
+def test_openai_request_carries_seed() -> None:
+    client = LLMClient.from_openai_settings(model="m", base_url="http://127.0.0.1:9/v1", api_key="k")
+
+    seeded = client._model_with_seed(7)
+
+    assert seeded._get_request_payload([HumanMessage("hi")])["seed"] == 7
+    assert seeded.client is client.chat_model.client
+    assert client.chat_model.seed is None
+
+
+def test_ollama_request_carries_seed_with_other_options() -> None:
+    client = LLMClient.from_ollama_settings(model="m", temperature=0.4)
+
+    options = client._model_with_seed(5)._chat_params([HumanMessage("hi")])["options"]
+
+    assert options["seed"] == 5
+    assert options["temperature"] == 0.4
+
+
+class GameClient:
+    """seed を記録し、`fail_after` 回目より後の呼び出しを失敗させる代役。"""
+
+    def __init__(self, fail_after: int | None = None) -> None:
+        self.fail_after = fail_after
+        self.seeds = []
+
+    def invoke(self, messages, **kwargs):
+        if self.fail_after is not None and len(self.seeds) >= self.fail_after:
+            raise ConnectionError("endpoint went away")
+        self.seeds.append(kwargs.get("seed"))
+        return AIMessage(content=VOTE_REPLY)
+
+
+def sweep_spec(template_dir: Path, *, seeds, matches_per_job: int) -> SweepSpec:
+    return SweepSpec(
+        template_dir=template_dir,
+        agent_grid={agent: [MODEL] for agent in "ABCD"},
+        prompts_files=["prompts.yaml"],
+        seeds=list(seeds),
+        matches_per_job=matches_per_job,
+    )
+
+
+def offline_sweep(monkeypatch, client: GameClient) -> None:
+    monkeypatch.setattr(sweep, "collect_ollama_connection_errors", lambda aliases: [])
+    monkeypatch.setattr(sweep, "observe_swaps", lambda needs: 0)
+    monkeypatch.setattr(GameEngine, "client_for", lambda self, alias: client)
+
+
+def plan_rows(template_dir: Path) -> list:
+    [plan] = sorted((template_dir / "logs").glob("sweep_*_plan.jsonl"))
+    return [orjson.loads(line) for line in plan.read_bytes().splitlines()]
+
+
+def test_sweep_matches_never_share_a_seed_and_ignore_schedule_order(template_dir: Path, monkeypatch) -> None:
+    spec = sweep_spec(template_dir, seeds=[1, 2], matches_per_job=5)
+    passed = []
+    offline_sweep(monkeypatch, GameClient())
+    monkeypatch.setattr(GameEngine, "run", lambda self, *args, seed=None, **kwargs: passed.append(seed) or True)
+
+    run_sweep(spec, warmup=False)
+    rows = plan_rows(template_dir)
+
+    seeds = [row["match_seed"] for row in rows]
+    assert len(seeds) == 10
+    assert len(set(seeds)) == len(seeds)
+    assert passed == seeds
+
+    # ジョブを逆順に流しても、同じ (グリッドの seed, 試合番号) は同じ seed になる
+    for path in (template_dir / "logs").glob("sweep_*"):
+        path.unlink()
+    monkeypatch.setattr(sweep, "schedule_jobs", lambda spec, jobs: list(reversed(jobs)))
+    run_sweep(spec, warmup=False)
+    by_match = {(row["seed"], row["match"]): row["match_seed"] for row in rows}
+    assert {(row["seed"], row["match"]): row["match_seed"] for row in plan_rows(template_dir)} == by_match
+
+
+def test_interrupted_sweep_match_resumes_from_its_checkpoint(template_dir: Path, monkeypatch) -> None:
+    spec = sweep_spec(template_dir, seeds=[7], matches_per_job=1)
+    offline_sweep(monkeypatch, GameClient(fail_after=3))
+
+    report = run_sweep(spec, warmup=False)
+
+    assert report["succeeded"] == 0
+    [checkpoint] = (template_dir / "logs" / "checkpoints").glob("sweep_*_run0001.json")
+    state = orjson.loads(checkpoint.read_bytes())
+    assert state["job"] == {"index": 0, "prompts_file": "prompts.yaml", "seed": 7, "match": 1}
+    assert state["seed"] == 7001
+
+    client = GameClient()
+    offline_sweep(monkeypatch, client)
+    report = resume_sweep(spec, warmup=False)
+
+    assert report == {"resumed": 1, "succeeded": 1}
+    assert set(client.seeds) == {7001}
+    assert not checkpoint.exists()
+    [log] = list_log_files(template_dir / "logs", ["sweep"])
+    turns = [row["turn_index"] for row in iter_log_records(log) if "speech" in row and "error" not in row]
+    assert turns == list(range(1, len(turns) + 1))
+    assert len(turns) > 3
@@ -0,0 +1,123 @@
+"""適応タイムアウト・ヘッジのレイテンシ窓と、その初期値になる過去ログのレイテンシ。"""
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+
+import orjson
+import pytest
+
+from experiments import engine as engine_module
+from experiments.engine import GameEngine
+from experiments.hedging import HedgePolicy
+from experiments.latency import LatencyWindow, latency_samples, load_latency_history
+from experiments.timeouts import DeadlineClient, LLMTimeoutError
+from src.config import models as models_module
+from src.config.models import TimeoutConfig
+
+MODELS_YAML = """\
+models:
+  local:
+    provider: openai
+    model: gpt-oss-20b
+    base_url: http://box-a/v1
+    api_key: EMPTY
+    replicas: [local_b]
+  local_b:
+    provider: openai
+    model: gpt-oss-20b
+    base_url: http://box-b/v1
+    api_key: EMPTY
+"""
+
+HISTORY = [
+    # endpoint 列のない古い行
+    {"model_name": "local", "attempts": 1, "latency_seconds": 2.0},
+    {"model_name": "local", "endpoint": "http://box-a/v1", "attempts": 1, "latency_seconds": 1.0},
+    # ヘッジでレプリカが応答したターン
+    {
+        "model_name": "local",
+        "served_by": "local_b",
+        "endpoint": "http://box-b/v1",
+        "attempts": 1,
+        "latency_seconds": 0.2,
+    },
+    {"model_name": "local_b", "endpoint": "http://box-b/v1", "attempts": 1, "latency_seconds": 0.3},
+    # 以前の接続先と再試行したターンは使わない
+    {"model_name": "local", "endpoint": "http://old-box/v1", "attempts": 1, "latency_seconds": 9.0},
+    {"model_name": "local", "endpoint": "http://box-a/v1", "attempts": 2, "latency_seconds": 9.0},
+]
+
+
+def write_history(logs_dir: Path) -> None:
+    logs_dir.mkdir(parents=True, exist_ok=True)
+    (logs_dir / "logfile_001.jsonl").write_bytes(b"".join(orjson.dumps(row) + b"\n" for row in HISTORY))
+
+
+class SlowClient:
+    def __init__(self, seconds: float) -> None:
+        self.seconds = seconds
+
+    async def ainvoke(self, messages, **kwargs):
+        await asyncio.sleep(self.seconds)
+        return "ok"
+
+
+def test_timed_out_call_is_recorded_at_its_deadline():
+    config = TimeoutConfig(read=0.05, floor=0.01, min_samples=5)
+    window = LatencyWindow(10)
+    client = DeadlineClient("slow", SlowClient(1.0), config, window=window)
+    with pytest.raises(LLMTimeoutError):
+        client.invoke([])
+    assert len(window) == 1
+    assert window.quantile(50) == pytest.approx(0.05)
+
+
+def test_repeated_timeouts_do_not_shrink_the_deadline():
+    config = TimeoutConfig(read=0.2, floor=0.01, multiplier=1.0, percentile=90, min_samples=3)
+    window = LatencyWindow(10)
+    for _ in range(3):
+        window.add(0.01)
+    client = DeadlineClient("slow", SlowClient(1.0), config, window=window)
+    first = client.deadline()
+    for _ in range(3):
+        with pytest.raises(LLMTimeoutError):
+            client.invoke([])
+    # 打ち切った呼び出しが窓に入るので、分位点が速かった頃の値に留まらない
+    assert len(window) == 6
+    assert window.quantile(90) > first
+
+
+def test_latency_history_is_keyed_by_serving_model_and_endpoint(tmp_path: Path) -> None:
+    write_history(tmp_path)
+    history = load_latency_history(tmp_path)
+
+    assert latency_samples(history, "local", "http://box-a/v1") == [2.0, 1.0]
+    assert latency_samples(history, "local_b", "http://box-b/v1") == [0.2, 0.3]
+    assert latency_samples(history, "missing", "http://box-a/v1") == []
+    assert load_latency_history(tmp_path / "missing") == {}
+
+
+def test_engine_loads_history_once_and_seeds_each_endpoint_from_its_own_turns(
+    template_dir: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    models_path = tmp_path / "models.yaml"
+    models_path.write_text(MODELS_YAML, encoding="utf-8")
+    monkeypatch.setattr(models_module, "DEFAULT_MODELS_PATH", models_path)
+    loads = []
+
+    def counting_load(logs_dir, **kwargs):
+        loads.append(logs_dir)
+        return load_latency_history(logs_dir, **kwargs)
+
+    monkeypatch.setattr(engine_module, "load_latency_history", counting_load)
+    engine = GameEngine(template_dir, adaptive_timeouts=True, hedge_policy=HedgePolicy(), quiet=True)
+    write_history(engine.logs_dir)
+
+    hedged = engine.client_for("local")
+    engine.client_for("local_b")
+
+    assert len(loads) == 1
+    assert len(hedged.window) == 2 and hedged.window.quantile(0) == 1.0
+    [(_, replica)] = hedged.replicas
+    assert len(replica.window) == 2 and replica.window.quantile(100) == 0.3
@@ -0,0 +1,25 @@
+"""ウォームアップは失敗しても試合を止めないこと。"""
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+import pytest
+
+from experiments.warmup import warm_up_model, warm_up_models
+
+ALIAS = "openai_gpt-oss-20b"
+
+
+@pytest.mark.parametrize("client", [object(), SimpleNamespace(chat_model=SimpleNamespace())])
+def test_client_without_langchain_internals_is_reported_not_raised(client) -> None:
+    result = warm_up_model(ALIAS, client)
+
+    assert not result.ok
+    assert "unsupported client" in result.detail
+
+
+def test_failed_warm_up_does_not_stop_the_others(tmp_path) -> None:
+    results = warm_up_models([ALIAS], lambda alias: object(), log_dir=tmp_path)
+
+    assert [result.ok for result in results] == [False]
+    assert (tmp_path / "warmup.jsonl").exists()